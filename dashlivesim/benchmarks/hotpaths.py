@@ -0,0 +1,225 @@
+"""Micro-benchmarks for the serving hot paths.
+
+Times MPD generation, init segments, media segments and byte ranges with the bundled test content
+and reports ops/s and latency percentiles. The results are written as JSON with sorted keys,
+so that files from different commits can be diffed or compared with --compare.
+
+Every operation requests a new segment (or an MPD in a new time bucket), so the segment and MPD caches
+do not hide the generation time. Use --no-caches to turn them off completely.
+
+Run as: python -m dashlivesim.benchmarks.hotpaths [-n iterations] [-o results.json] [--compare old.json]
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import platform
+import subprocess
+import sys
+import time
+from os.path import abspath, dirname, join
+from timeit import default_timer
+
+from ..dashlib import dash_proxy
+from ..dashlib import byteranges
+from ..dashlib import mpdcache
+from ..dashlib import segmentcache
+
+TEST_CONTENT_DIR = join(dirname(dirname(abspath(__file__))), "tests")
+PERCENTILES = (50, 90, 99)
+
+# Segment numbers that map to the first VoD segment (which is available for all tracks)
+SEGMENT_NR_6S = 12000 # testpic has 600 segments of 6s in the loop
+SEGMENT_NR_2S = 36000 # testpic_stpp has 1800 segments of 2s in the loop
+
+
+def mpd_operation(url_parts, seg_dur):
+    "Make an operation that gets the MPD in a new time bucket for every call."
+    def operation(i):
+        "Get one MPD."
+        return get(url_parts, 72061 + i*seg_dur)
+    return operation
+
+
+def init_operation(url_parts):
+    "Make an operation that gets an init segment."
+    def operation(i):
+        "Get one init segment."
+        return get(url_parts, 72061 + i)
+    return operation
+
+
+def segment_operation(url_prefix, seg_dur, first_seg_nr, nr_segments_in_loop):
+    "Make an operation that gets a new media segment, mapping to the same VoD segment, for every call."
+    def operation(i):
+        "Get one media segment."
+        seg_nr = first_seg_nr + i*nr_segments_in_loop
+        return get(url_prefix + ["%d.m4s" % seg_nr], (seg_nr + 1)*seg_dur + 1)
+    return operation
+
+
+def range_operation(url_prefix, range_line):
+    "Make an operation that gets byte ranges of a new media segment for every call."
+    def operation(i):
+        "Get byte ranges of one media segment."
+        seg_nr = SEGMENT_NR_6S + i*600
+        payload = get(url_prefix + ["%d.m4s" % seg_nr], (seg_nr + 1)*6 + 1, streaming=True)
+        payload_out, _ = byteranges.get_range_response(payload, range_line, "video/mp4")
+        return "".join(payload_out)
+    return operation
+
+
+BENCHMARKS = (
+    ('mpd_plain', mpd_operation(['livesim', 'testpic', 'Manifest.mpd'], 6)),
+    ('mpd_plain_2s', mpd_operation(['livesim', 'testpic_2s', 'Manifest.mpd'], 2)),
+    ('mpd_multiperiod', mpd_operation(['livesim', 'periods_60', 'testpic', 'Manifest.mpd'], 6)),
+    ('mpd_segtimeline', mpd_operation(['livesim', 'segtimeline_1', 'testpic', 'Manifest.mpd'], 6)),
+    ('mpd_xlink', mpd_operation(['livesim', 'periods_60', 'xlink_30', 'testpic', 'Manifest.mpd'], 6)),
+    ('mpd_stpp', mpd_operation(['livesim', 'testpic_stpp', 'Manifest_stpp.mpd'], 2)),
+    ('init_plain', init_operation(['livesim', 'testpic', 'V1', 'init.mp4'])),
+    ('init_muxed', init_operation(['livesim', 'testpic', 'V1__A1', 'init.mp4'])),
+    ('segment_video', segment_operation(['livesim', 'testpic', 'V1'], 6, SEGMENT_NR_6S, 600)),
+    ('segment_audio', segment_operation(['livesim', 'testpic', 'A1'], 6, SEGMENT_NR_6S, 600)),
+    ('segment_muxed', segment_operation(['livesim', 'testpic', 'V1__A1'], 6, SEGMENT_NR_6S, 600)),
+    ('segment_ttml', segment_operation(['livesim', 'testpic_stpp', 'S1'], 2, SEGMENT_NR_2S, 1800)),
+    ('segment_scte35', segment_operation(['livesim', 'scte35_1', 'testpic', 'V1'], 6, SEGMENT_NR_6S, 600)),
+    ('range_single', range_operation(['livesim', 'testpic', 'V1'], "bytes=1000-10999")),
+    ('range_multi', range_operation(['livesim', 'testpic', 'V1'], "bytes=0-99,2000-2999,-500")),
+)
+
+
+def get(url_parts, now, streaming=False):
+    "Make a request to the DashProvider. Raise an error if it fails."
+    response = dash_proxy.handle_request("localhost", url_parts, None, TEST_CONTENT_DIR, TEST_CONTENT_DIR, now,
+                                         streaming=streaming)
+    if isinstance(response, dict):
+        raise RuntimeError("Request for %s failed: %s" % ("/".join(url_parts), response['pl']))
+    return response
+
+
+def percentile(sorted_values, percent):
+    "Nearest-rank percentile of a sorted list."
+    index = max(int(round(percent/100.0*len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def time_operation(operation, nr_iterations, nr_warmup):
+    "Call operation nr_warmup + nr_iterations times and return the statistics of the timed calls."
+    for i in range(nr_warmup):
+        operation(i)
+    latencies = []
+    for i in range(nr_warmup, nr_warmup + nr_iterations):
+        start = default_timer()
+        operation(i)
+        latencies.append(default_timer() - start)
+    total = sum(latencies)
+    latencies.sort()
+    result = {'iterations' : nr_iterations,
+              'ops_per_s' : round(nr_iterations/total, 1),
+              'mean_ms' : round(1000*total/nr_iterations, 4),
+              'max_ms' : round(1000*latencies[-1], 4)}
+    for percent in PERCENTILES:
+        result['p%d_ms' % percent] = round(1000*percentile(latencies, percent), 4)
+    return result
+
+
+def get_commit():
+    "Get the git commit of the source tree, or None if not available."
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=dirname(abspath(__file__)),
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(nr_iterations, nr_warmup=10, use_caches=True, name_filter=None):
+    "Run the benchmarks whose name contains name_filter. Return the results as a dict."
+    old_states = (segmentcache.SEGMENT_CACHE_ENABLED, mpdcache.MPD_CACHE_ENABLED)
+    segmentcache.SEGMENT_CACHE_ENABLED = use_caches
+    mpdcache.MPD_CACHE_ENABLED = use_caches
+    results = {}
+    try:
+        for name, operation in BENCHMARKS:
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = time_operation(operation, nr_iterations, nr_warmup)
+    finally:
+        segmentcache.SEGMENT_CACHE_ENABLED, mpdcache.MPD_CACHE_ENABLED = old_states
+        segmentcache.SEGMENT_CACHE.clear()
+        mpdcache.MPD_CACHE.clear()
+    return {'commit' : get_commit(),
+            'python' : platform.python_version(),
+            'platform' : platform.platform(),
+            'time' : time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            'caches' : use_caches,
+            'results' : results}
+
+
+def print_results(report, baseline=None):
+    "Print a table of the results, with the change in ops/s compared to baseline if given."
+    print "%-16s %10s %9s %9s %9s %9s" % ("benchmark", "ops/s", "p50 ms", "p90 ms", "p99 ms", "change")
+    for name in sorted(report['results']):
+        result = report['results'][name]
+        change = ""
+        if baseline is not None and name in baseline['results']:
+            change = "%+.1f%%" % (100.0*result['ops_per_s']/baseline['results'][name]['ops_per_s'] - 100)
+        print "%-16s %10.1f %9.3f %9.3f %9.3f %9s" % (name, result['ops_per_s'], result['p50_ms'],
+                                                       result['p90_ms'], result['p99_ms'], change)
+
+
+def main():
+    "Parse arguments and run benchmarks."
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Benchmark the serving hot paths with the bundled test content.")
+    parser.add_argument("-n", "--iterations", dest="iterations", type=int, default=200,
+                        help="number of timed operations per benchmark")
+    parser.add_argument("-w", "--warmup", dest="warmup", type=int, default=10,
+                        help="number of untimed operations before timing")
+    parser.add_argument("-o", "--output", dest="output", type=str, help="write results as JSON to this file")
+    parser.add_argument("-b", "--benchmark", dest="name_filter", type=str,
+                        help="only run benchmarks with names containing this string")
+    parser.add_argument("--compare", dest="compare", type=str, help="JSON results to compare with")
+    parser.add_argument("--no-caches", dest="use_caches", action="store_false",
+                        help="turn off the segment and MPD caches")
+    args = parser.parse_args()
+    report = run_benchmarks(args.iterations, args.warmup, args.use_caches, args.name_filter)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as ifh:
+            baseline = json.load(ifh)
+    print_results(report, baseline)
+    if args.output:
+        with open(args.output, "w") as ofh:
+            json.dump(report, ofh, indent=2, sort_keys=True, separators=(",", ": "))
+            ofh.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,479 @@
+"""Live load generator with virtual DASH clients.
+
+Each virtual client behaves like a simple live player. It fetches the MPD, then the init segments once,
+starts at the live edge and fetches every new segment when it becomes available. The MPD is fetched again
+every minimumUpdatePeriod. Clients start spread over a ramp-up time and can have a skewed clock, which
+gives requests that are too early or too late.
+
+The clients are run either in-process against mod_dashlivesim.application with a virtual clock
+(so an hour of live viewing takes as long as generating the responses), or in real time over HTTP
+against a running server. The report has throughput, latency percentiles per request type,
+the rates of too-early/too-late responses and the memory growth of the process (which includes the server
+only when run in-process).
+
+Run as: python -m dashlivesim.benchmarks.loadgen [-c clients] [-d seconds] [--http host:port] [-o report.json]
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import calendar
+import heapq
+import httplib
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from os.path import abspath, dirname, join
+from timeit import default_timer
+from urlparse import urlparse
+from xml.etree import ElementTree
+
+from ..dashlib.timeformatconversions import iso_duration_to_seconds, TimeFormatConversionError
+from ..mod_wsgi import mod_dashlivesim
+from ..mod_wsgi.asyncserver import ThreadPool
+from .hotpaths import percentile
+
+TEST_CONTENT_DIR = join(dirname(dirname(abspath(__file__))), "tests")
+DEFAULT_MPD_PATH = "/livesim/testpic/Manifest.mpd"
+MPD_RETRY_INTERVAL_IN_S = 1.0
+PERCENTILES = (50, 90, 99)
+NS = "{urn:mpeg:dash:schema:mpd:2011}"
+
+
+class LoadGeneratorError(Exception):
+    "Error in load generation."
+
+
+def parse_timestamp(timestamp):
+    "Parse an MPD timestamp like 1970-01-01T00:00:00Z into seconds since epoch."
+    return calendar.timegm(time.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def parse_duration(duration):
+    "Parse an MPD duration into seconds. Return None if not given or not in the PT format (e.g. P100Y)."
+    if duration is None:
+        return None
+    try:
+        return iso_duration_to_seconds(duration)
+    except TimeFormatConversionError:
+        return None
+
+
+class LiveManifest(object):
+    "The parts of a live MPD with SegmentTemplate@duration that a player needs to follow the live edge."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, mpd_path, xml, now):
+        mpd = ElementTree.fromstring(xml)
+        self.ast = parse_timestamp(mpd.get('availabilityStartTime', "1970-01-01T00:00:00Z"))
+        self.minimum_update_period = parse_duration(mpd.get('minimumUpdatePeriod'))
+        base_path = mpd_path.rsplit("/", 1)[0] + "/"
+        base_url = mpd.find(NS + "BaseURL")
+        if base_url is not None and base_url.text:
+            base_path = urlparse(base_url.text.strip()).path
+        periods = mpd.findall(NS + "Period")
+        if not periods:
+            raise LoadGeneratorError("No Period in MPD %s" % mpd_path)
+        period = periods[0]
+        for candidate in periods:
+            if self.ast + parse_duration(candidate.get('start', "PT0S")) <= now:
+                period = candidate
+        self.period_start = parse_duration(period.get('start', "PT0S"))
+        self.tracks = [] # (init_path, media_template, duration_in_s, start_number) per AdaptationSet
+        for adaptation_set in period.findall(NS + "AdaptationSet"):
+            template = adaptation_set.find(NS + "SegmentTemplate")
+            representation = adaptation_set.find(NS + "Representation")
+            if template is None or representation is None or template.get('duration') is None:
+                raise LoadGeneratorError("Only SegmentTemplate@duration is supported (%s)" % mpd_path)
+            rep_id = representation.get('id')
+            duration = float(template.get('duration'))/int(template.get('timescale', 1))
+            init_path = base_path + template.get('initialization').replace("$RepresentationID$", rep_id)
+            media = base_path + template.get('media').replace("$RepresentationID$", rep_id)
+            self.tracks.append((init_path, media, duration, int(template.get('startNumber', 1))))
+
+    def segment_availability_time(self, track, seg_nr):
+        "The time when segment seg_nr of track becomes available."
+        _, _, duration, start_number = track
+        return self.ast + self.period_start + (seg_nr - start_number + 1)*duration
+
+    def live_edge_segment(self, track, now):
+        "The number of the latest available segment of track at now."
+        _, _, duration, start_number = track
+        return start_number + int((now - self.ast - self.period_start)//duration) - 1
+
+
+class VirtualPlayer(object):
+    "A virtual live DASH client that makes one request at a time."
+
+    def __init__(self, client_nr, mpd_path, start_time, clock_offset=0.0, max_mpd_interval=None):
+        self.client_nr = client_nr
+        self.mpd_path = mpd_path
+        self.time = start_time
+        self.clock_offset = clock_offset # The player clock is ahead by this amount
+        self.max_mpd_interval = max_mpd_interval
+        self.manifest = None
+        self.pending = deque([('mpd', mpd_path)])
+        self.next_seg_nrs = None
+        self.next_mpd_time = None
+
+    def next_request(self):
+        "Get (time, kind, path) for the next request."
+        if not self.pending:
+            self.plan_next()
+        kind, path = self.pending.popleft()
+        return (self.time, kind, path)
+
+    def plan_next(self):
+        "Plan the next MPD or segment requests and advance the time of the player."
+        manifest = self.manifest
+        if manifest is None: # Retry failed MPD
+            self.time += MPD_RETRY_INTERVAL_IN_S
+            self.pending.append(('mpd', self.mpd_path))
+            return
+        seg_time = min(manifest.segment_availability_time(track, seg_nr)
+                       for (track, seg_nr) in zip(manifest.tracks, self.next_seg_nrs)) - self.clock_offset
+        if self.next_mpd_time is not None and self.next_mpd_time <= seg_time:
+            self.time = max(self.time, self.next_mpd_time)
+            self.next_mpd_time = None
+            self.pending.append(('mpd', self.mpd_path))
+            return
+        self.time = max(self.time, seg_time)
+        for i, track in enumerate(manifest.tracks):
+            seg_nr = self.next_seg_nrs[i]
+            if manifest.segment_availability_time(track, seg_nr) - self.clock_offset <= self.time:
+                self.pending.append(('segment', track[1].replace("$Number$", str(seg_nr))))
+                self.next_seg_nrs[i] += 1
+
+    def handle_response(self, kind, status, body, now):
+        "Update the player state from the response to a request made at now."
+        if kind != 'mpd':
+            return
+        if status == 200:
+            first_mpd = self.manifest is None
+            self.manifest = LiveManifest(self.mpd_path, body, now + self.clock_offset)
+            if first_mpd:
+                for track in self.manifest.tracks:
+                    self.pending.append(('init', track[0]))
+                self.next_seg_nrs = [self.manifest.live_edge_segment(track, now + self.clock_offset)
+                                     for track in self.manifest.tracks]
+        mpd_interval = self.manifest and self.manifest.minimum_update_period
+        if self.max_mpd_interval is not None and (mpd_interval is None or mpd_interval > self.max_mpd_interval):
+            mpd_interval = self.max_mpd_interval
+        if self.manifest is not None and mpd_interval is not None:
+            self.next_mpd_time = now + max(mpd_interval, MPD_RETRY_INTERVAL_IN_S)
+
+
+class InProcessTransport(object):
+    "Call mod_dashlivesim.application directly, with the time given by the virtual clock."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, vod_conf_dir, content_dir, host="localhost"):
+        self.vod_conf_dir = vod_conf_dir
+        self.content_dir = content_dir
+        self.host = host
+
+    def request(self, path, now, keep_body):
+        "Make a request and return (status, nr_bytes, body). body is only returned if keep_body."
+        environ = {'REQUEST_METHOD' : 'GET', 'REQUEST_URI' : path, 'PATH_INFO' : path, 'HTTP_HOST' : self.host,
+                   'VOD_CONF_DIR' : self.vod_conf_dir, 'CONTENT_ROOT' : self.content_dir, 'dashlivesim.now' : now}
+        response_status = []
+
+        def start_response(status, headers, exc_info=None): #pylint: disable=unused-argument
+            "Record the status."
+            response_status.append(int(status.split(" ", 1)[0]))
+
+        result = mod_dashlivesim.application(environ, start_response)
+        chunks = []
+        nr_bytes = 0
+        try:
+            for chunk in result:
+                nr_bytes += len(chunk)
+                if keep_body:
+                    chunks.append(chunk)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response_status[0], nr_bytes, "".join(chunks)
+
+
+class HttpTransport(object):
+    "Make requests over HTTP, with one keep-alive connection per thread."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, host, port, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, path, now, keep_body): #pylint: disable=unused-argument
+        "Make a request and return (status, nr_bytes, body). The server uses its own clock."
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                body = response.read()
+                return response.status, len(body), keep_body and body or ""
+            except (httplib.HTTPException, IOError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+
+
+class LoadStats(object):
+    "Collect latencies and outcomes per request type."
+
+    def __init__(self):
+        self.latencies = {} # kind -> list of latencies in s
+        self.outcomes = {} # kind -> {outcome: count}
+        self.nr_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind, status, nr_bytes, body, latency):
+        "Record one request."
+        if status == 200:
+            outcome = 'ok'
+        elif status == 404 and "too early" in body:
+            outcome = 'too_early'
+        elif status == 404 and "too late" in body:
+            outcome = 'too_late'
+        else:
+            outcome = 'error_%d' % status
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(latency)
+            outcomes = self.outcomes.setdefault(kind, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            self.nr_bytes += nr_bytes
+
+    def report(self):
+        "Make a report dict."
+        kinds = {}
+        nr_requests = 0
+        totals = {}
+        for kind, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            result = {'requests' : len(latencies), 'outcomes' : self.outcomes[kind],
+                      'mean_ms' : round(1000*sum(latencies)/len(latencies), 4),
+                      'max_ms' : round(1000*latencies[-1], 4)}
+            for percent in PERCENTILES:
+                result['p%d_ms' % percent] = round(1000*percentile(latencies, percent), 4)
+            kinds[kind] = result
+            nr_requests += len(latencies)
+            for outcome, count in self.outcomes[kind].items():
+                totals[outcome] = totals.get(outcome, 0) + count
+        rates = {}
+        for outcome in ('too_early', 'too_late'):
+            rates[outcome + '_rate'] = round(float(totals.get(outcome, 0))/max(nr_requests, 1), 6)
+        nr_errors = sum(count for (outcome, count) in totals.items() if outcome.startswith('error'))
+        rates['error_rate'] = round(float(nr_errors)/max(nr_requests, 1), 6)
+        busy_time = sum(sum(latencies) for latencies in self.latencies.values())
+        return {'requests' : nr_requests, 'bytes' : self.nr_bytes, 'kinds' : kinds, 'rates' : rates,
+                'busy_time_s' : round(busy_time, 4)}
+
+
+def get_rss_kb():
+    "Current resident set size in kB (from /proc on Linux), or the peak size if not available."
+    try:
+        with open("/proc/self/statm") as ifh:
+            return int(ifh.read().split()[1])*os.sysconf('SC_PAGE_SIZE')//1024
+    except (IOError, OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class LoadGenerator(object):
+    "Run virtual players against a transport until end_time."
+
+    def __init__(self, transport, players, end_time):
+        self.transport = transport
+        self.players = players
+        self.end_time = end_time
+        self.stats = LoadStats()
+        self._queue = []
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._nr_active = 0
+
+    def _schedule(self, player):
+        "Put the next request of player in the queue."
+        req_time, kind, path = player.next_request()
+        if req_time <= self.end_time:
+            self._seq += 1
+            heapq.heappush(self._queue, (req_time, self._seq, player, kind, path))
+
+    def _do_request(self, player, kind, path, now):
+        "Make one request, record it and let the player handle the response."
+        keep_body = True # Needed for MPDs and to classify errors
+        start = default_timer()
+        status, nr_bytes, body = self.transport.request(path, now, keep_body)
+        latency = default_timer() - start
+        self.stats.record(kind, status, nr_bytes, body if status != 200 else "", latency)
+        player.handle_response(kind, status, body, now)
+
+    def run_virtual(self):
+        "Run with a virtual clock. Each request is made at its planned time, one at a time."
+        for player in self.players:
+            self._schedule(player)
+        while self._queue:
+            now, _, player, kind, path = heapq.heappop(self._queue)
+            self._do_request(player, kind, path, now)
+            self._schedule(player)
+
+    def run_realtime(self, nr_threads):
+        "Run in real time with requests made in a thread pool. Times are seconds since epoch."
+        pool = ThreadPool(nr_threads)
+        with self._condition:
+            for player in self.players:
+                self._schedule(player)
+        try:
+            while True:
+                with self._condition:
+                    if not self._queue:
+                        if self._nr_active == 0:
+                            break
+                        self._condition.wait(0.1)
+                        continue
+                    wait_time = self._queue[0][0] - time.time()
+                    if wait_time > 0:
+                        self._condition.wait(min(wait_time, 0.1))
+                        continue
+                    _, _, player, kind, path = heapq.heappop(self._queue)
+                    self._nr_active += 1
+                pool.submit(self._do_request, (player, kind, path, time.time()),
+                            lambda result, player=player: self._request_done(player))
+        finally:
+            pool.shutdown()
+
+    def _request_done(self, player):
+        "Schedule the next request of a player (in a pool thread)."
+        with self._condition:
+            self._nr_active -= 1
+            self._schedule(player)
+            self._condition.notify()
+
+
+#pylint: disable=too-many-arguments, too-many-locals
+def run_load(nr_clients, duration, transport, start_time, realtime=False, mpd_path=DEFAULT_MPD_PATH, ramp_up=10.0,
+             clock_skew=0.0, max_mpd_interval=None, nr_threads=16, seed=1):
+    "Run nr_clients virtual players for duration seconds and return the report as a dict."
+    rand = random.Random(seed)
+    players = [VirtualPlayer(i, mpd_path, start_time + rand.uniform(0, ramp_up), rand.uniform(-clock_skew, clock_skew),
+                             max_mpd_interval) for i in range(nr_clients)]
+    generator = LoadGenerator(transport, players, start_time + duration)
+    rss_start = get_rss_kb()
+    wall_start = time.time()
+    if realtime:
+        generator.run_realtime(nr_threads)
+    else:
+        generator.run_virtual()
+    wall_time = time.time() - wall_start
+    report = generator.stats.report()
+    report.update({'mode' : realtime and 'http' or 'in-process',
+                   'clients' : nr_clients,
+                   'duration_s' : duration,
+                   'mpd_path' : mpd_path,
+                   'clock_skew_s' : clock_skew,
+                   'wall_time_s' : round(wall_time, 3),
+                   'requests_per_wall_s' : round(report['requests']/max(wall_time, 1e-9), 1),
+                   'requests_per_sim_s' : round(float(report['requests'])/duration, 3)})
+    if not realtime and report['busy_time_s'] > 0:
+        # The serving time per second of live viewing gives the number of such clients one core can serve
+        report['clients_per_core'] = round(nr_clients*duration/report['busy_time_s'], 1)
+    rss_end = get_rss_kb()
+    report['memory'] = {'rss_start_kb' : rss_start, 'rss_end_kb' : rss_end, 'rss_growth_kb' : rss_end - rss_start,
+                        'max_rss_kb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return report
+
+
+def print_report(report):
+    "Print a summary of the report."
+    print ("%(mode)s: %(clients)d clients, %(duration_s)ss, %(requests)d requests "
+           "in %(wall_time_s).1fs wall time" % report)
+    print "%.1f requests/s (wall), %.2f requests/s (simulated)" % (report['requests_per_wall_s'],
+                                                                  report['requests_per_sim_s'])
+    print "%-8s %9s %9s %9s %9s  %s" % ("kind", "requests", "p50 ms", "p90 ms", "p99 ms", "outcomes")
+    for kind in sorted(report['kinds']):
+        result = report['kinds'][kind]
+        print "%-8s %9d %9.3f %9.3f %9.3f  %s" % (kind, result['requests'], result['p50_ms'], result['p90_ms'],
+                                                  result['p99_ms'], result['outcomes'])
+    print "rates: %s" % report['rates']
+    if 'clients_per_core' in report:
+        print "clients per core: %.1f" % report['clients_per_core']
+    print "memory: %s" % report['memory']
+
+
+def main():
+    "Parse arguments and run load."
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Simulate live DASH clients against dashlivesim.")
+    parser.add_argument("-c", "--clients", dest="clients", type=int, default=100, help="number of virtual clients")
+    parser.add_argument("-d", "--duration", dest="duration", type=float, default=600,
+                        help="seconds of live viewing to simulate")
+    parser.add_argument("-u", "--url", dest="mpd_path", type=str, default=DEFAULT_MPD_PATH, help="MPD path")
+    parser.add_argument("--http", dest="http", type=str, help="host:port of a running server (real time)")
+    parser.add_argument("--threads", dest="threads", type=int, default=16, help="number of threads for --http")
+    parser.add_argument("--config_dir", dest="vod_conf_dir", type=str, default=TEST_CONTENT_DIR,
+                        help="configuration root directory (in-process)")
+    parser.add_argument("--content_dir", dest="content_dir", type=str, default=TEST_CONTENT_DIR,
+                        help="content root directory (in-process)")
+    parser.add_argument("--start", dest="start_time", type=float, help="virtual start time (default now)")
+    parser.add_argument("--ramp-up", dest="ramp_up", type=float, default=10.0, help="seconds to start all clients")
+    parser.add_argument("--skew", dest="skew", type=float, default=0.0, help="max clock skew of clients in seconds")
+    parser.add_argument("--mpd-interval", dest="mpd_interval", type=float,
+                        help="max time between MPD fetches (default minimumUpdatePeriod)")
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="random seed")
+    parser.add_argument("-o", "--output", dest="output", type=str, help="write report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.http:
+        host, port = args.http.rsplit(":", 1)
+        transport = HttpTransport(host, int(port))
+        start_time = time.time()
+    else:
+        transport = InProcessTransport(args.vod_conf_dir, args.content_dir)
+        start_time = args.start_time if args.start_time is not None else time.time()
+    report = run_load(args.clients, args.duration, transport, start_time, args.http is not None, args.mpd_path,
+                      args.ramp_up, args.skew, args.mpd_interval, args.threads, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as ofh:
+            json.dump(report, ofh, indent=2, sort_keys=True, separators=(",", ": "))
+            ofh.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
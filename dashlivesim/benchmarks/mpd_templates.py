@@ -0,0 +1,90 @@
+"""Benchmark of compiled MPD templates against the MpdProcessor.
+
+Generates MPDs for a set of URLs with the bundled test content in both modes, checks that
+the results are identical and reports the time per MPD.
+
+Run as: python -m dashlivesim.benchmarks.mpd_templates [-n iterations]
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import time
+from os.path import abspath, dirname, join
+
+from ..dashlib import dash_proxy
+from ..dashlib import mpdtemplate
+
+TEST_CONTENT_DIR = join(dirname(dirname(abspath(__file__))), "tests")
+
+BENCHMARK_URLS = (('plain', ['livesim', 'testpic', 'Manifest.mpd']),
+                  ('multiperiod', ['livesim', 'periods_60', 'testpic', 'Manifest.mpd']),
+                  ('segtimeline', ['livesim', 'segtimeline_1', 'testpic', 'Manifest.mpd']),
+                  ('utc_scte35', ['livesim', 'utc_head', 'scte35_1', 'testpic', 'Manifest.mpd']))
+
+
+def generate_mpds(url_parts, use_templates, nr_iterations, start_time):
+    "Generate nr_iterations MPDs one second apart. Return the MPDs and the time taken."
+    dash_proxy.USE_MPD_TEMPLATES = use_templates
+    mpds = []
+    start = time.time()
+    for i in range(nr_iterations):
+        dash_provider = dash_proxy.DashProvider("localhost", url_parts, None, TEST_CONTENT_DIR, TEST_CONTENT_DIR,
+                                                now=start_time + i)
+        mpds.append(dash_provider.handle_request())
+    return mpds, time.time() - start
+
+
+def run_benchmark(nr_iterations, start_time=1356998460):
+    "Run the benchmark for all URLs and print a result line for each."
+    old_state = dash_proxy.USE_MPD_TEMPLATES
+    try:
+        for name, url_parts in BENCHMARK_URLS:
+            mpdtemplate.clear_templates()
+            processed_mpds, processor_time = generate_mpds(url_parts, False, nr_iterations, start_time)
+            template_mpds, template_time = generate_mpds(url_parts, True, nr_iterations, start_time)
+            identical = processed_mpds == template_mpds
+            print "%-12s processor %7.3fms  template %7.3fms  speedup %5.1fx  identical=%s" % (
+                name, 1000*processor_time/nr_iterations, 1000*template_time/nr_iterations,
+                processor_time/template_time, identical)
+    finally:
+        dash_proxy.USE_MPD_TEMPLATES = old_state
+
+
+def main():
+    "Parse arguments and run benchmark."
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Compare MPD generation with MpdProcessor and compiled templates.")
+    parser.add_argument("-n", "--iterations", dest="iterations", type=int, default=200,
+                        help="number of MPDs to generate per URL and mode")
+    args = parser.parse_args()
+    run_benchmark(args.iterations)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Structured access log that does not block the request path.
+
+Requests are logged as dicts into an in-memory ring buffer with the last RING_SIZE records,
+which can be dumped for live debugging. If a log file is set, a background thread drains
+the records to a rotating file with one JSON object per line. If the writer falls behind,
+the oldest unwritten records are dropped and counted instead of blocking requests.
+
+Error messages for a request are put in the 'message' field of its record (see add_message),
+instead of being printed or written to the Apache error log in the request path.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import logging
+import logging.handlers
+import threading
+from collections import deque
+
+from .configprocessor import get_content_and_rep
+
+ACCESS_LOG_PATH = "/accesslog"
+RING_SIZE = 10000
+MAX_FILE_BYTES = 64*1024*1024
+NR_BACKUP_FILES = 5
+WRITE_INTERVAL_IN_S = 0.5
+
+
+class AccessLog(object):
+    "Ring buffer of access log records with an optional background writer."
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.records = deque(maxlen=ring_size) # The latest records
+        self._unwritten = deque(maxlen=ring_size)
+        self.nr_dropped = 0
+        self.nr_failed = 0 # Records that could not be written
+        self.filename = None
+        self._handler = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def log(self, record):
+        "Add a record. Only appends to deques, which is thread-safe and does no I/O."
+        self.records.append(record)
+        if self.filename is not None:
+            if len(self._unwritten) == self._unwritten.maxlen:
+                self.nr_dropped += 1
+            self._unwritten.append(record)
+
+    def last(self, nr_records):
+        "Get the last nr_records records, oldest first."
+        records = list(self.records)
+        return records[max(0, len(records) - nr_records):]
+
+    @property
+    def running(self):
+        "Is the writer running."
+        return self._thread is not None
+
+    def start(self, filename, max_bytes=MAX_FILE_BYTES, nr_backups=NR_BACKUP_FILES):
+        "Start writing records to filename as JSON lines, rotating at max_bytes."
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes,
+                                                                 backupCount=nr_backups)
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self.filename = filename
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="AccessLogWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        "Write the remaining records and stop the writer."
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.filename = None
+            self._handler.close()
+            self._handler = None
+
+    def _run(self):
+        "Drain unwritten records to the file until stopped."
+        while not self._stop_event.wait(WRITE_INTERVAL_IN_S):
+            self.write_pending()
+        self.write_pending()
+
+    def write_pending(self):
+        "Write all unwritten records."
+        handler = self._handler
+        while True:
+            try:
+                record = self._unwritten.popleft()
+            except IndexError:
+                break
+            try:
+                line = json.dumps(record, sort_keys=True)
+            except (TypeError, ValueError):
+                self.nr_failed += 1
+                continue
+            handler.emit(logging.LogRecord("dashlivesim.access", logging.INFO, None, 0, line, None, None))
+        handler.flush()
+
+
+def add_message(log_info, message):
+    "Add message to the 'message' field of the record that will be made from log_info."
+    if 'message' in log_info:
+        log_info['message'] += "; " + message
+    else:
+        log_info['message'] = message
+
+
+#pylint: disable=too-many-arguments
+def make_record(url, status, nr_bytes, now, url_parts, log_info, error_reason=None, timer=None):
+    """Make an access log record.
+
+    url_parts are the parts after the prefix, log_info is from dash_proxy.handle_request
+    and timer is the phasetimer.PhaseTimer of the request."""
+    content, rep = get_content_and_rep(url_parts)
+    record = {'time' : now, 'url' : url, 'status' : status, 'bytes' : nr_bytes, 'content' : content, 'rep' : rep}
+    record.update(log_info)
+    if error_reason is not None:
+        record['reason'] = error_reason
+    decode_strings(record)
+    if timer is not None:
+        record['total_ms'] = round(1000*timer.total, 3)
+        record['phases'] = dict((name, round(1000*duration, 3)) for (name, duration) in timer.durations.items())
+    return record
+
+
+def make_message_record(now, url, message):
+    "Make a record for a message that does not come from a request, e.g. a failed pregeneration."
+    record = {'time' : now, 'url' : url, 'message' : message}
+    decode_strings(record)
+    return record
+
+
+def decode_strings(record):
+    "Decode the str values of record, so that it can always be serialized."
+    for (key, value) in record.items():
+        if isinstance(value, str):
+            record[key] = value.decode('utf-8', 'replace') # URLs are passed on as unquoted bytes
+
+
+ACCESS_LOG = AccessLog()
+
+
+def start(filename):
+    "Start the writer of ACCESS_LOG if not already running."
+    ACCESS_LOG.start(filename)
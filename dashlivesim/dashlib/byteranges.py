@@ -0,0 +1,115 @@
+"""HTTP byte range handling shared by the mod_python and mod_wsgi handlers.
+
+Ranges are applied to strings or ChunkedPayloads by slicing, so for chunked payloads only the
+requested parts of the chunks are sent. Requests with several ranges get a multipart/byteranges
+response, which is also a ChunkedPayload of part headers and slices of the original payload.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+from uuid import uuid4
+
+from .payload import ChunkedPayload
+
+MAX_NR_RANGES = 32 # Requests with more ranges are answered with the full payload
+
+
+def parse_ranges(range_line, length):
+    """Parse a Range header value into a list of (first, last) byte positions (inclusive).
+
+    Ranges that cannot be satisfied are left out. Return None if the header cannot be parsed."""
+    range_parts = range_line.split("=")[-1]
+    ranges = []
+    try:
+        for range_interval in range_parts.split(","):
+            range_start, range_end = range_interval.strip().split("-")
+            if range_start == "" and range_end != "":
+                # This is the rangeStart lasts bytes
+                range_start = max(length - int(range_end), 0)
+                range_end = length - 1
+            elif range_start != "":
+                range_start = int(range_start)
+                if range_end != "":
+                    range_end = min(int(range_end), length-1)
+                else:
+                    range_end = length-1
+            else:
+                return None
+            if range_end >= range_start:
+                ranges.append((range_start, range_end))
+    except ValueError:
+        return None
+    return ranges
+
+
+def handle_byte_range(payload, range_line):
+    """Handle byte range and return data and range-header value.
+
+    If range is strange, return empty string. For multiple ranges, return (payload, None)."""
+    if len(range_line.split("=")[-1].split(",")) > 1:
+        return (payload, None)
+    ranges = parse_ranges(range_line, len(payload))
+    if not ranges:
+        return (payload, "")
+    range_start, range_end = ranges[0]
+    ranged_payload = payload[range_start: range_end+1]
+    range_response = "bytes %d-%d/%d" % (range_start, range_end, len(payload))
+    return (ranged_payload, range_response)
+
+
+def make_multipart_byteranges(payload, ranges, content_type):
+    "Make a multipart/byteranges ChunkedPayload. Return (payload, content_type of the response)."
+    if isinstance(payload, basestring):
+        payload = ChunkedPayload([payload])
+    boundary = uuid4().hex
+    length = len(payload)
+    chunks = []
+    for (range_start, range_end) in ranges:
+        chunks.append("\r\n--%s\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\n\r\n" %
+                      (boundary, content_type, range_start, range_end, length))
+        chunks.extend(payload.slice(range_start, range_end+1).chunks)
+    chunks.append("\r\n--%s--\r\n" % boundary)
+    return (ChunkedPayload(chunks), "multipart/byteranges; boundary=%s" % boundary)
+
+
+def get_range_response(payload, range_line, content_type):
+    """Apply the Range header to the payload.
+
+    Return (payload_out, headers), where headers are the Content-Range or Content-Type headers
+    for a 206 response, or None if the range was bad and the full payload should be sent."""
+    ranges = parse_ranges(range_line, len(payload))
+    if not ranges or len(ranges) > MAX_NR_RANGES:
+        return (payload, None)
+    if len(ranges) == 1:
+        range_start, range_end = ranges[0]
+        return (payload[range_start:range_end+1],
+                {'Content-Range' : "bytes %d-%d/%d" % (range_start, range_end, len(payload))})
+    multipart_payload, multipart_type = make_multipart_byteranges(payload, ranges, content_type)
+    return (multipart_payload, {'Content-Type' : multipart_type})
@@ -30,14 +30,18 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 
 import ConfigParser
+import os
+import time
 from os.path import join, splitext
 from collections import namedtuple
 from .moduloperiod import ModuloPeriod
+from . import phasetimer
 
 DEFAULT_AVAILABILITY_STARTTIME_IN_S = 0 # Jan 1 1970 00:00 UTC
 ALL_MEDIA_SEGMENTS_AVAILABLE = False # Set true to disable timing
 DEFAULT_TIMESHIFT_BUFFER_DEPTH_IN_SECS = 300
 DEFAULT_SHORT_MINIMUM_UPDATE_PERIOD_IN_S = 10
+VOD_CONFIG_REVALIDATE_INTERVAL_IN_S = 1.0 # How often a cached VoD config is checked against the file on disk
 
 MUX_DIVIDER = "__" # Multiplexed representations can be written as A__V
 
@@ -144,6 +148,7 @@ class Config(object):
 
     def update_with_modulo_period(self, modulo_period, seg_dur):
         "Update cfg data according to a modulo period."
+        self.modulo_period = modulo_period
         self.minimum_update_period_in_s = modulo_period.minimum_update_period
         self.availability_start_time_in_s = modulo_period.availability_start_time
         self.media_presentation_duration = modulo_period.media_presentation_duration
@@ -263,11 +268,216 @@ class VodConfig(object):
         return None
 
 
+class VodConfigCatalog(object):
+    """Process-wide catalog of VodConfig objects, so that each content config is only parsed once.
+
+    Entries are keyed by config file path and validated against the file's mtime and size.
+    The validation (a stat call) is done at most once per revalidate_interval seconds per file,
+    so a lookup is normally just a dictionary access."""
+
+    def __init__(self, revalidate_interval=VOD_CONFIG_REVALIDATE_INTERVAL_IN_S):
+        self.revalidate_interval = revalidate_interval
+        self._entries = {} # config_file -> [signature, last_check_time, vod_cfg]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, config_file):
+        "Get the VodConfig for config_file. Read the file if it is new or has changed on disk."
+        entry = self._entries.get(config_file)
+        now = time.time()
+        if entry is not None:
+            if now - entry[1] < self.revalidate_interval:
+                self.hits += 1
+                return entry[2]
+            if entry[0] == self._file_signature(config_file):
+                entry[1] = now
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        signature = self._file_signature(config_file)
+        vod_cfg = VodConfig()
+        vod_cfg.read_config(config_file)
+        self._entries[config_file] = [signature, now, vod_cfg]
+        return vod_cfg
+
+    def stats(self):
+        "Get hit/miss counters and number of cached configs."
+        return {'hits' : self.hits, 'misses' : self.misses, 'entries' : len(self._entries)}
+
+    def clear(self):
+        "Remove all cached configs and reset the counters."
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    #pylint: disable=no-self-use
+    def _file_signature(self, config_file):
+        "Get (mtime, size) for config_file."
+        stat = os.stat(config_file)
+        return (stat.st_mtime, stat.st_size)
+
+
+VOD_CONFIG_CATALOG = VodConfigCatalog()
+
+
+def interpret_start_nr(value):
+    "startNr should be 0 or greater. -1 means that it is put to 1, but absent in MPD (default value)"
+    error_msg = "startNr must be an integer >= 0. -1 means default value (=1)."
+    try:
+        start_nr = int(value)
+    except ValueError:
+        raise ConfigProcessorError(error_msg)
+    if start_nr < -1:
+        raise ConfigProcessorError(error_msg)
+    return start_nr
+
+
+def option_setter(name, convert=int):
+    "Make a parser which sets the option name to the converted value."
+    def parse(options, value):
+        "Set the option."
+        options[name] = convert(value)
+    return parse
+
+
+def flag_setter(name):
+    "Make a parser which sets the flag name if the value is 1."
+    def parse(options, value):
+        "Set the flag if value is 1."
+        if int(value) == 1:
+            options[name] = True
+    return parse
+
+
+def list_appender(name, convert=int):
+    "Make a parser which appends the converted value to the option list name."
+    def parse(options, value):
+        "Append to the list."
+        options[name] = options.get(name, ()) + (convert(value),)
+    return parse
+
+
+def parse_tfdt(options, value): #pylint: disable=unused-argument
+    "Use 32-bit tfdt (which means that AST must be more recent as well)."
+    options['tfdt32_flag'] = True
+
+
+def parse_cont(options, value): #pylint: disable=unused-argument
+    "Continuous update of MPD AST and seg_nr."
+    options['cont_update'] = True
+
+
+def parse_utc(options, value):
+    "Get hyphen-separated list of utc-timing methods."
+    options['utc_timing_methods'] = tuple(value.split("-"))
+
+
+# Parsers for the URL options, keyed by the part before the first underscore
+URL_OPTION_PARSERS = {
+    'start' : option_setter('start_time'), # Change availability start time in s.
+    'ast' : option_setter('start_time'),
+    'dur' : list_appender('durations'), # Add a presentation duration for multiple periods
+    'init' : option_setter('init_seg_avail_offset'), # Make the init segment available earlier
+    'tsbd' : option_setter('timeshift_buffer_depth_in_s'),
+    'mup' : option_setter('minimum_update_period_in_s'), # Set the minimum update period (in s)
+    'modulo' : option_setter('modulo_minutes'), # Make a number of time-limited sessions every hour
+    'all' : option_setter('all_segments_available_flag'), # Make segments available all time
+    'tfdt' : parse_tfdt,
+    'cont' : parse_cont,
+    'periods' : option_setter('periods_per_hour'), # Make multiple periods
+    'xlink' : option_setter('xlink_periods_per_hour'), # Make periods access via xlink.
+    'continuous' : flag_setter('cont_multiperiod'), # Only valid when periods_per_hour is set
+    'segtimeline' : flag_setter('seg_timeline'),
+    'baseurl' : list_appender('multi_url', str), # Use multiple URLs
+    'peroff' : option_setter('period_offset'), # Set the period offset
+    'scte35' : option_setter('scte35_per_minute'), # Add SCTE-35 ad messages every minute
+    'utc' : parse_utc,
+    'snr' : option_setter('start_nr', interpret_start_nr), # Segment startNumber
+}
+
+MAX_NR_URL_OPTIONS = 1024 # The cache of parsed URL options is cleared if it grows beyond this
+
+_url_options = {}
+
+
+class UrlOptions(object):
+    """Immutable snapshot of the options in a URL prefix (the parts before the content name).
+
+    settings are (Config attribute, value) pairs that are set directly. The other fields
+    are combined with the current time in ConfigProcessor.process_url."""
+
+    __slots__ = ('nr_parts', 'settings', 'start_time', 'durations', 'modulo_minutes', 'cont_update')
+
+    def __init__(self, nr_parts, options):
+        options = options.copy()
+        values = {'nr_parts' : nr_parts,
+                  'start_time' : options.pop('start_time', None),
+                  'durations' : options.pop('durations', ()),
+                  'modulo_minutes' : options.pop('modulo_minutes', None),
+                  'cont_update' : options.pop('cont_update', False),
+                  'settings' : tuple(sorted(options.items()))}
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UrlOptions is immutable")
+
+    def apply(self, cfg):
+        "Set the options in cfg. Tuples are set as lists, since Config has list attributes."
+        for name, value in self.settings:
+            if isinstance(value, tuple):
+                value = list(value)
+            setattr(cfg, name, value)
+
+
+def parse_url_options(option_parts):
+    "Parse the URL option parts into UrlOptions."
+    options = {}
+    for part in option_parts:
+        key, value = part.split("_", 1)
+        URL_OPTION_PARSERS[key](options, value)
+    url_options = UrlOptions(len(option_parts), options)
+    if url_options.start_time is not None and url_options.modulo_minutes is not None:
+        raise ConfigProcessorError("Cannot have both start_time and modulo_period set!")
+    if options.get('tfdt32_flag') and url_options.cont_update:
+        raise ConfigProcessorError("Cannot have continuous update with tfdt_32 (similar behavior)")
+    return url_options
+
+
+def get_url_options(url_parts):
+    "Get the UrlOptions for the options at the start of url_parts. Parsed options are reused."
+    nr_parts = 0
+    for part in url_parts: # Must handle content like testpic_2s
+        if part.split("_", 1)[0] not in URL_OPTION_PARSERS:
+            break
+        nr_parts += 1
+    prefix = tuple(url_parts[:nr_parts])
+    url_options = _url_options.get(prefix)
+    if url_options is None:
+        url_options = parse_url_options(prefix)
+        if len(_url_options) >= MAX_NR_URL_OPTIONS:
+            _url_options.clear()
+        _url_options[prefix] = url_options
+    return url_options
+
+
+def get_content_and_rep(url_parts):
+    """Get (content name, representation path) for the URL parts after the prefix.
+
+    Return (None, None) if the URL has bad options or no content."""
+    try:
+        nr_parts = get_url_options(url_parts).nr_parts
+    except (ConfigProcessorError, KeyError, ValueError):
+        return (None, None)
+    if nr_parts >= len(url_parts) - 1:
+        return (None, None)
+    return (url_parts[nr_parts], "/".join(url_parts[nr_parts+1:-1]))
+
+
 class ConfigProcessor(object):
     "Process the url and VoD config files and setup configuration."
 
-    url_cfg_keys = ("start", "ast", "dur", "init", "tsbd", "mup", "modulo", "all", "tfdt", "cont",
-                    "periods", "xlink", "continuous", "segtimeline", "baseurl", "peroff", "scte35", "utc", "snr")
+    url_cfg_keys = tuple(URL_OPTION_PARSERS)
 
     def __init__(self, vod_cfg_dir, base_url):
         self.vod_cfg_dir = vod_cfg_dir
@@ -296,91 +506,27 @@ class ConfigProcessor(object):
         return mpd
 
     def process_url(self, url_parts, now_int=0):
-        """Extract config and calculate availabilityStartTimeInS and availabilityEndTime from URL."""
-        #pylint: disable=too-many-branches, too-many-statements
-        start_time = None
-        durations = []
-        cont_update_flag = False
-        modulo_period = None
-        cfg = self.cfg
+        """Extract config and calculate availabilityStartTimeInS and availabilityEndTime from URL.
 
-        url_pos = 0
-        for part in url_parts: # Should be listed in self.configParts to make sure it works.
-            cfg_parts = part.split("_", 1)
-            if not cfg_parts[0] in self.url_cfg_keys: #Must handle content like testpic_2s
-                break
-            key, value = cfg_parts
-            if key == "start" or key == "ast": # Change availability start time in s.
-                start_time = int(value)
-            elif key == "dur": # Add a presentation duration for multiple periods
-                durations.append(int(value))
-            elif key == "init": # Make the init segment available earlier
-                cfg.init_seg_avail_offset = int(value)
-            elif key == "tsbd":
-                cfg.timeshift_buffer_depth_in_s = int(value)
-            elif key == "mup": # Set the minimum update period (in s)
-                cfg.minimum_update_period_in_s = int(value)
-            elif key == "modulo": # Make a number of time-limited sessions every hour
-                modulo_period = ModuloPeriod(int(value), now_int)
-            elif key == "all": # Make segments available all time (no timing restrictions)
-                cfg.all_segments_available_flag = int(value)
-            elif key == "tfdt": # Use 32-bit tfdt (which means that AST must be more recent as well)
-                cfg.tfdt32_flag = True
-            elif key == "cont": # Continuous update of MPD AST and seg_nr.
-                cont_update_flag = True
-            elif key == "periods": # Make multiple periods
-                cfg.periods_per_hour = int(value)
-            elif key == "xlink": # Make periods access via xlink.
-                cfg.xlink_periods_per_hour = int(value)
-            elif key == "continuous": # Only valid when it's set to 1 and periods_per_hour is set
-                if int(value) == 1:
-                    cfg.cont_multiperiod = True
-            elif key == "segtimeline": # Only valid when it's set to 1
-                if int(value) == 1:
-                    cfg.seg_timeline = True
-            elif key == "baseurl": # Use multiple URLs, put all the configuration strings in multi_url
-                cfg.multi_url.append(value)
-            elif key == "peroff": # Set the period offset
-                cfg.period_offset = int(value)
-            elif key == "scte35": # Add SCTE-35 ad messages every minute
-                cfg.scte35_per_minute = int(value)
-            elif key == "utc": # Get hyphen-separated list of utc-timing methods and make into list
-                cfg.utc_timing_methods = value.split("-")
-            elif key == "snr": # Segment startNumber
-                cfg.start_nr = self.interpret_start_nr(value)
-            else:
-                raise ConfigProcessorError("Cannot interpret option %s properly" % key)
-            url_pos += 1
+        The options are parsed once per URL prefix. Only the time-dependent values are calculated here."""
+        cfg = self.cfg
+        url_options = get_url_options(url_parts)
+        url_options.apply(cfg)
+        url_pos = url_options.nr_parts
 
         cfg.update_with_filedata(url_parts, url_pos)
         vod_cfg_file = join(self.vod_cfg_dir, cfg.content_name) + ".cfg"
-        vod_cfg = VodConfig()
-        vod_cfg.read_config(vod_cfg_file)
+        with phasetimer.phase('vodcfg'):
+            vod_cfg = VOD_CONFIG_CATALOG.get(vod_cfg_file)
         cfg.update_with_reps(vod_cfg, url_parts, url_pos)
         cfg.update_with_vodcfg(vod_cfg)
 
-        if start_time is not None:
-            if modulo_period is not None:
-                raise ConfigProcessorError("Cannot have both start_time and modulo_period set!")
-            cfg.process_start_time(start_time, durations, now_int)
+        if url_options.start_time is not None:
+            cfg.process_start_time(url_options.start_time, list(url_options.durations), now_int)
         if cfg.tfdt32_flag:
-            if cont_update_flag:
-                raise ConfigProcessorError("Cannot have continuous update with tfdt_32 (similar behavior)")
             cfg.update_for_tfdt32(now_int)
-        if cont_update_flag:
+        if url_options.cont_update:
             cfg.update_for_cont_update(now_int)
-        if modulo_period is not None:
-            cfg.update_with_modulo_period(modulo_period, cfg.seg_duration)
+        if url_options.modulo_minutes is not None:
+            cfg.update_with_modulo_period(ModuloPeriod(url_options.modulo_minutes, now_int), cfg.seg_duration)
         cfg.update_publish_time(now_int)
-
-    #pylint: disable=no-self-use
-    def interpret_start_nr(self, value):
-        "startNr should be 0 or greater. -1 means that it is put to 1, but absent in MPD (default value)"
-        error_msg = "startNr must be an integer >= 0. -1 means default value (=1)."
-        try:
-            start_nr = int(value)
-        except ValueError:
-            raise ConfigProcessorError(error_msg)
-        if start_nr < -1:
-            raise ConfigProcessorError(error_msg)
-        return start_nr
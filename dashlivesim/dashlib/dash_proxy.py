@@ -65,11 +65,22 @@ For infinite content, the default is startNumber = 0, availabilityStartTime = 19
 from os.path import splitext, join
 from math import ceil
 from re import findall
-from .initsegmentfilter import InitLiveFilter
 from .mediasegmentfilter import MediaSegmentFilter
 from . import segmentmuxer
+from . import accesslog
+from . import initcache
+from . import lateness
+from .payload import ChunkedPayload
+from .httpcaching import make_etag, mpd_max_age, INIT_SEGMENT_MAX_AGE_IN_S
+from . import segmentpatcher
+from . import segmentcache
+from . import pregenerator
 from . import mpdprocessor
-from .timeformatconversions import make_timestamp, seconds_to_iso_duration
+from . import mpdcache
+from . import mpdtemplate
+from . import phasetimer
+from . import profiler
+from .timeformatconversions import make_timestamp, seconds_to_iso_duration, iso_duration_to_seconds
 from .configprocessor import ConfigProcessor
 
 
@@ -81,11 +92,39 @@ EXTRA_TIME_AFTER_END_IN_S = 60
 UTC_HEAD_PATH = "dash/time.txt"
 
 PUBLISH_TIME = False
+USE_MPD_TEMPLATES = True # Generate MPDs from compiled templates instead of processing the VoD MPD every time
+USE_SEGMENT_PATCH_PLANS = True # Patch media segments from precomputed plans instead of filtering every box
+
+# Reasons for error responses
+TOO_EARLY = 'too_early'
+TOO_LATE = 'too_late'
+BEFORE_FIRST_SEGMENT = 'before_first_segment'
+BEYOND_LAST_SEGMENT = 'beyond_last_segment'
+BASEURL_DOWN = 'baseurl_down'
+OTHER_ERROR = 'other'
+ERROR_REASONS = (TOO_EARLY, TOO_LATE, BEFORE_FIRST_SEGMENT, BEYOND_LAST_SEGMENT, BASEURL_DOWN, OTHER_ERROR)
+
+#pylint: disable=too-many-arguments
+def handle_request(host_name, url_parts, args, vod_conf_dir, content_dir, now=None, req=None, is_https=0,
+                   streaming=False, log_info=None):
+    """Handle Apache request.
+
+    With streaming, media segments are returned as a payload.ChunkedPayload instead of a string.
+    If log_info is a dict, it is updated with information for the access log (see DashProvider.log_info)."""
+    dash_provider = DashProvider(host_name, url_parts, args, vod_conf_dir, content_dir, now, req, is_https, streaming)
+    response = dash_provider.handle_request()
+    if log_info is not None:
+        log_info.update(dash_provider.log_info)
+    return response
+
+
+def pregenerate_segment(host_name, url_parts, args, vod_conf_dir, content_dir, now, is_https=0, streaming=False):
+    """Generate a media segment into the segment cache, with now set to its availability time.
 
-def handle_request(host_name, url_parts, args, vod_conf_dir, content_dir, now=None, req=None, is_https=0):
-    "Handle Apache request."
-    dash_provider = DashProvider(host_name, url_parts, args, vod_conf_dir, content_dir, now, req, is_https)
-    return dash_provider.handle_request()
+    Used by the pregenerator.PregenerationScheduler. Return False if the segment could not be generated."""
+    dash_provider = DashProvider(host_name, url_parts, args, vod_conf_dir, content_dir, now, None, is_https, streaming)
+    dash_provider.pregenerating = True
+    return not isinstance(dash_provider.handle_request(), dict)
 
 
 class DashProxyError(Exception):
@@ -134,6 +173,13 @@ def generate_period_data(mpd_data, now):
             period_data.append(data)
     return period_data
 
+def get_minimum_update_period_in_s(mpd_data):
+    "Get the minimumUpdatePeriod of mpd_data in seconds, or None if it is the default (not set)."
+    minimum_update_period = mpd_data['minimumUpdatePeriod']
+    if minimum_update_period == DEFAULT_MINIMUM_UPDATE_PERIOD:
+        return None
+    return iso_duration_to_seconds(minimum_update_period)
+
 def generate_response_with_xlink(response, cfg, filename, nr_periods_per_hour, nr_xlink_periods_per_hour):
     "Convert the normally created response into a response which has xlinks"
     # This functions has two functionality : 1.For MPD and 2.For PERIOD.
@@ -180,10 +226,14 @@ class DashProvider(object):
     "Provide DASH manifest and segments."
     #pylint: disable=too-many-instance-attributes,too-many-arguments
 
-    def __init__(self, host_name, url_parts, url_args, vod_conf_dir, content_dir, now=None, req=None, is_https=0):
+    def __init__(self, host_name, url_parts, url_args, vod_conf_dir, content_dir, now=None, req=None, is_https=0,
+                 streaming=False):
         protocol = is_https and "https" or "http"
         self.base_url = "%s://%s/%s/" % (protocol, host_name, url_parts[0])  # The start. Adding other parts later.
         self.utc_head_url = "%s://%s/%s" % (protocol, host_name, UTC_HEAD_PATH)
+        self.host_name = host_name
+        self.is_https = is_https
+        self.url_prefix = url_parts[0]
         self.url_parts = url_parts[1:]
         self.url_args = url_args
         self.vod_conf_dir = vod_conf_dir
@@ -192,23 +242,36 @@ class DashProvider(object):
         self.now = int(now)
         self.req = req
         self.new_tfdt_value = None
+        self.streaming = streaming
+        self.etag = None # HTTP caching info for the response
+        self.last_modified = None
+        self.max_age = None
+        self.mpd_max_age = None # max-age of the MPD generated by generate_dynamic_mpd
+        self.pregenerating = False # Set when generating a segment ahead of its availability
+        self.log_info = {} # seg_nr, lateness (s after availability) and cache status ('hit' or 'miss')
 
     def handle_request(self):
-        "Handle the Apache request."
-        return self.parse_url()
+        "Handle the Apache request. A sample of the requests is profiled if profiler.SAMPLER is enabled."
+        if not profiler.SAMPLER.enabled or self.pregenerating:
+            return self.parse_url()
+        return profiler.SAMPLER.run(splitext(self.url_parts[-1])[1], self.parse_url)
+
+    def error_response(self, msg, reason=OTHER_ERROR):
+        """Return a mod_python error response. reason is one of the ERROR_REASONS.
 
-    def error_response(self, msg):
-        "Return a mod_python error response."
-        if self.req:
+        The message goes to the access log record, or to the Apache error log if the access log is not running."""
+        accesslog.add_message(self.log_info, msg)
+        if self.req and not accesslog.ACCESS_LOG.running:
             self.req.log_error("dash_proxy: [%s] %s" % ("/".join(self.url_parts[-3:]), msg))
-        return {'ok' : False, 'pl' : msg + "\n"}
+        return {'ok' : False, 'pl' : msg + "\n", 'reason' : reason}
 
     #pylint:disable = too-many-locals, too-many-branches
     def parse_url(self):
         "Parse the absolute URL that is received in mod_python."
-        cfg_processor = ConfigProcessor(self.vod_conf_dir, self.base_url)
-        cfg_processor.process_url(self.url_parts, self.now)
-        cfg = cfg_processor.getconfig()
+        with phasetimer.phase('cfg'):
+            cfg_processor = ConfigProcessor(self.vod_conf_dir, self.base_url)
+            cfg_processor.process_url(self.url_parts, self.now)
+            cfg = cfg_processor.getconfig()
         if cfg.ext == ".mpd" or cfg.ext == ".period":
             if cfg.ext == ".period":
                 mpd_filename = "%s/%s/%s" % (self.content_dir, cfg.content_name, cfg.filename.split('+')[0])
@@ -216,7 +279,12 @@ class DashProvider(object):
             else:
                 mpd_filename = "%s/%s/%s" % (self.content_dir, cfg.content_name, cfg.filename)
             mpd_input_data = cfg_processor.get_mpd_data()
-            response = self.generate_dynamic_mpd(cfg, mpd_filename, mpd_input_data, self.now)
+            with phasetimer.phase('mpd'):
+                cached_mpd = self.get_dynamic_mpd(cfg, mpd_filename, mpd_input_data, self.now)
+            response = cached_mpd.mpd
+            self.etag = cached_mpd.etag
+            self.last_modified = cached_mpd.publish_time
+            self.max_age = cached_mpd.max_age
             nr_xlink_periods_per_hour = min(mpd_input_data['xlinkPeriodsPerHour'], 60)
             if nr_xlink_periods_per_hour > 0:
                 # -1 is the default value, which means no xlink are created.
@@ -230,12 +298,13 @@ class DashProvider(object):
                     response = self.error_response("(Number of periods per hour/ Number of xlinks per hour) "
                                                    "should be an integer.")
                 else:
-                    response = generate_response_with_xlink(response, cfg.ext, cfg.filename, nr_periods_per_hour,
-                                                            nr_xlink_periods_per_hour)
+                    with phasetimer.phase('mpd'):
+                        response = generate_response_with_xlink(response, cfg.ext, cfg.filename, nr_periods_per_hour,
+                                                                nr_xlink_periods_per_hour)
         elif cfg.ext == ".mp4":
             if self.now < cfg.availability_start_time_in_s - cfg.init_seg_avail_offset:
                 diff = (cfg.availability_start_time_in_s - cfg.init_seg_avail_offset) - self.now_float
-                response = self.error_response("Request for %s was %.1fs too early" % (cfg.filename, diff))
+                response = self.error_response("Request for %s was %.1fs too early" % (cfg.filename, diff), TOO_EARLY)
             else:
                 response = self.process_init_segment(cfg)
         elif cfg.ext == ".m4s":
@@ -243,11 +312,12 @@ class DashProvider(object):
             if self.now_float < first_segment_ast:
                 diff = first_segment_ast - self.now_float
                 response = self.error_response("Request %s before first seg AST. %.1fs too early" %
-                                               (cfg.filename, diff))
+                                               (cfg.filename, diff), BEFORE_FIRST_SEGMENT)
             elif cfg.availability_end_time is not None and \
                             self.now > cfg.availability_end_time + EXTRA_TIME_AFTER_END_IN_S:
                 diff = self.now_float - (cfg.availability_end_time + EXTRA_TIME_AFTER_END_IN_S)
-                response = self.error_response("Request for %s after AET. %.1fs too late" % (cfg.filename, diff))
+                response = self.error_response("Request for %s after AET. %.1fs too late" % (cfg.filename, diff),
+                                               TOO_LATE)
             else:
                 response = self.process_media_segment(cfg, self.now_float)
                 if len(cfg.multi_url) == 1: # There is one specific baseURL with losses specified
@@ -260,20 +330,48 @@ class DashProvider(object):
                     if a_var[0] == 'u' and b_var[0] == 'd': #parse server up or down information
                         for i in range(num_loop):
                             if i*total_dur + dur1 < now_mod_60 <= (i+1)*total_dur:
-                                response = self.error_response("BaseURL server down at %d" % (self.now))
+                                response = self.error_response("BaseURL server down at %d" % (self.now), BASEURL_DOWN)
                                 break
                     elif a_var[0] == 'd' and b_var[0] == 'u':
                         for i in range(num_loop):
                             if i*(total_dur) < now_mod_60 <= i*(total_dur)+dur1:
-                                response = self.error_response("BaseURL server down at %d" % (self.now))
+                                response = self.error_response("BaseURL server down at %d" % (self.now), BASEURL_DOWN)
                                 break
         else:
             response = "Unknown file extension: %s" % cfg.ext
+        if self.streaming and not isinstance(response, dict):
+            response = self.make_payload(response)
         return response
 
+    def make_payload(self, response):
+        "Make a ChunkedPayload with the HTTP caching info for the response."
+        if isinstance(response, ChunkedPayload):
+            chunks = response.chunks
+        else:
+            chunks = [response]
+        return ChunkedPayload(chunks, self.etag, self.last_modified, self.max_age)
+
     #pylint: disable=no-self-use
+    def get_dynamic_mpd(self, cfg, mpd_filename, in_data, now):
+        """Get the dynamic MPD as a mpdcache.CachedMpd.
+
+        The MPD is generated for the start of the time bucket of now, and reused for all requests in the bucket."""
+        if not mpdcache.MPD_CACHE_ENABLED or 'direct' in cfg.utc_timing_methods:
+            # The direct UTCTiming method has the current time in the MPD
+            mpd = self.generate_dynamic_mpd(cfg, mpd_filename, in_data, now)
+            return mpdcache.CachedMpd(None, mpd, now, self.mpd_max_age)
+        key = (self.base_url, tuple(self.url_parts), self.vod_conf_dir, self.content_dir, mpdprocessor.SET_BASEURL)
+        bucket = mpdcache.time_bucket(cfg, now)
+        cached_mpd = mpdcache.MPD_CACHE.get(key, bucket)
+        self.log_info['cache'] = cached_mpd is None and 'miss' or 'hit'
+        if cached_mpd is None:
+            bucket_start = bucket[-1]
+            mpd = self.generate_dynamic_mpd(cfg, mpd_filename, in_data, bucket_start)
+            cached_mpd = mpdcache.MPD_CACHE.put(key, bucket, mpd, bucket_start, self.mpd_max_age)
+        return cached_mpd
+
     def generate_dynamic_mpd(self, cfg, mpd_filename, in_data, now):
-        "Generate the dynamic MPD."
+        "Generate the dynamic MPD. Set mpd_max_age from the minimumUpdatePeriod in the MPD."
         mpd_data = in_data.copy()
         if cfg.minimum_update_period_in_s is not None:
             mpd_data['minimumUpdatePeriod'] = seconds_to_iso_duration(cfg.minimum_update_period_in_s)
@@ -297,28 +395,35 @@ class DashProvider(object):
                         'utc_timing_methods' : cfg.utc_timing_methods,
                         'utc_head_url' : self.utc_head_url,
                         'now' : now}
-        mpmod = mpdprocessor.MpdProcessor(mpd_filename, mpd_proc_cfg, cfg)
         period_data = generate_period_data(mpd_data, now)
+        if in_data['segtimeline']:
+            mpd_data['minimumUpdatePeriod'] = "PT0S" # Also set by the MpdProcessor
+        self.mpd_max_age = mpd_max_age(get_minimum_update_period_in_s(mpd_data))
+        if USE_MPD_TEMPLATES:
+            return mpdtemplate.generate_mpd(mpd_filename, mpd_data, period_data, mpd_proc_cfg, cfg)
+        mpmod = mpdprocessor.MpdProcessor(mpd_filename, mpd_proc_cfg, cfg)
         mpmod.process(mpd_data, period_data)
         return mpmod.get_full_xml()
 
     def process_init_segment(self, cfg):
-        "Read non-multiplexed or create muxed init segments."
+        "Get non-multiplexed or muxed init segments."
 
         nr_reps = len(cfg.reps)
         if nr_reps == 1: # Not muxed
-            init_file = "%s/%s/%s/%s" % (self.content_dir, cfg.content_name, cfg.rel_path, cfg.filename)
-            ilf = InitLiveFilter(init_file)
-            data = ilf.filter()
+            init_files = ("%s/%s/%s/%s" % (self.content_dir, cfg.content_name, cfg.rel_path, cfg.filename),)
         elif nr_reps == 2: # Something that can be muxed
             com_path = "/".join(cfg.rel_path.split("/")[:-1])
             init1 = "%s/%s/%s/%s/%s" % (self.content_dir, cfg.content_name, com_path, cfg.reps[0]['id'], cfg.filename)
             init2 = "%s/%s/%s/%s/%s" % (self.content_dir, cfg.content_name, com_path, cfg.reps[1]['id'], cfg.filename)
-            muxed_inits = segmentmuxer.MultiplexInits(init1, init2)
-            data = muxed_inits.construct_muxed()
+            init_files = (init1, init2)
         else:
-            data = self.error_response("Bad nr of representations: %d" % nr_reps)
-        return data
+            return self.error_response("Bad nr of representations: %d" % nr_reps)
+        with phasetimer.phase('filter'):
+            init_segment = initcache.get_init_segment(init_files)
+        self.etag = init_segment.etag
+        self.last_modified = init_segment.last_modified
+        self.max_age = INIT_SEGMENT_MAX_AGE_IN_S
+        return init_segment.data
 
     def process_media_segment(self, cfg, now_float):
         """Process media segment. Return error response if timing is not OK.
@@ -347,22 +452,29 @@ class DashProvider(object):
             seg_nr = int(seg_base)
         seg_start_nr = cfg.start_nr == -1 and 1 or cfg.start_nr
         if seg_nr < seg_start_nr:
-            return self.error_response("Request for segment %d before first %d" % (seg_nr, seg_start_nr))
+            return self.error_response("Request for segment %d before first %d" % (seg_nr, seg_start_nr),
+                                       BEFORE_FIRST_SEGMENT)
         if len(cfg.last_segment_numbers) > 0:
             very_last_segment = cfg.last_segment_numbers[-1]
             if seg_nr > very_last_segment:
-                return self.error_response("Request for segment %d beyond last (%d)" % (seg_nr, very_last_segment))
+                return self.error_response("Request for segment %d beyond last (%d)" % (seg_nr, very_last_segment),
+                                           BEYOND_LAST_SEGMENT)
         lmsg = seg_nr in cfg.last_segment_numbers
         #print cfg.last_segment_numbers
         seg_time = (seg_nr - seg_start_nr) * seg_dur + cfg.availability_start_time_in_s
         seg_ast = seg_time + seg_dur
+        self.log_info['seg_nr'] = seg_nr
+        self.log_info['lateness'] = now_float - seg_ast
+        if lateness.LATENESS_ENABLED and not self.pregenerating:
+            lateness.LATENESS.record(cfg.content_name, cfg.rel_path, now_float - seg_ast)
 
         if not cfg.all_segments_available_flag:
             if now_float < seg_ast:
-                return self.error_response("Request for %s was %.1fs too early" % (seg_name, seg_ast - now_float))
+                return self.error_response("Request for %s was %.1fs too early" % (seg_name, seg_ast - now_float),
+                                           TOO_EARLY)
             if now_float > seg_ast + seg_dur + cfg.timeshift_buffer_depth_in_s:
                 diff = now_float - (seg_ast + seg_dur + cfg.timeshift_buffer_depth_in_s)
-                return self.error_response("Request for %s was %.1fs too late" % (seg_name, diff))
+                return self.error_response("Request for %s was %.1fs too late" % (seg_name, diff), TOO_LATE)
 
         time_since_ast = seg_time - cfg.availability_start_time_in_s
         loop_duration = cfg.seg_duration * cfg.vod_nr_segments_in_loop
@@ -371,34 +483,95 @@ class DashProvider(object):
         seg_nr_in_loop = time_in_loop//seg_dur
         vod_nr = seg_nr_in_loop + cfg.vod_first_segment_in_loop
         assert 0 <= vod_nr - cfg.vod_first_segment_in_loop < cfg.vod_nr_segments_in_loop
+        segment_key = segmentcache.make_segment_key(self.content_dir, cfg, vod_nr, seg_nr, seg_ext,
+                                                    offset_at_loop_start, lmsg)
+        self.etag = segmentcache.make_segment_etag(segment_key)
+        self.last_modified = seg_ast
+        if cfg.all_segments_available_flag:
+            expires = None
+            self.max_age = cfg.timeshift_buffer_depth_in_s
+        else:
+            expires = seg_ast + seg_dur + cfg.timeshift_buffer_depth_in_s
+            self.max_age = expires - now_float
+        if not segmentcache.SEGMENT_CACHE_ENABLED:
+            return self.generate_media_segment(cfg, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg)
+        key = (segment_key, self.streaming)
+        cached = segmentcache.SEGMENT_CACHE.get(key, now_float)
+        self.log_info['cache'] = cached is None and 'miss' or 'hit'
+        if cached is not None:
+            seg_content, self.new_tfdt_value = cached
+        else:
+            seg_content = self.generate_media_segment(cfg, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg)
+            segmentcache.SEGMENT_CACHE.put(key, seg_content, self.new_tfdt_value, expires)
+        if pregenerator.SCHEDULER.running and not self.pregenerating and not cfg.all_segments_available_flag:
+            self.register_pregeneration(cfg, seg_nr, seg_ast, seg_base, seg_ext, timescale, now_float)
+        return seg_content
+
+    def register_pregeneration(self, cfg, seg_nr, seg_ast, seg_base, seg_ext, timescale, now_float):
+        "Register that the segments after seg_nr should be generated ahead of their availability."
+        if seg_base[0] == 't':
+            name_format, name_value, name_step = "t%d" + seg_ext, int(seg_base[1:]), cfg.seg_duration*timescale
+        else:
+            name_format, name_value, name_step = "%d" + seg_ext, seg_nr, 1
+        url_parts = [self.url_prefix] + self.url_parts[:-1]
+        request = (self.host_name, self.url_args, self.vod_conf_dir, self.content_dir, self.is_https, self.streaming)
+        key = (tuple(url_parts), name_format, repr(self.url_args), self.vod_conf_dir, self.content_dir,
+               self.streaming)
+        pregenerator.SCHEDULER.register(key, request, url_parts, name_format, name_value, name_step, seg_nr, seg_ast,
+                                        cfg.seg_duration, now_float)
+
+    #pylint: disable=too-many-arguments
+    def generate_media_segment(self, cfg, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg):
+        "Generate a (possibly muxed) live media segment from the VoD segment vod_nr."
         rel_path = cfg.rel_path
         nr_reps = len(cfg.reps)
         if nr_reps == 1: # Not muxed
-            seg_content = self.filter_media_segment(cfg, cfg.reps[0], rel_path, vod_nr, seg_nr, seg_ext,
-                                                    offset_at_loop_start, lmsg)
+            with phasetimer.phase('filter'):
+                seg_content = self.filter_media_segment(cfg, cfg.reps[0], rel_path, vod_nr, seg_nr, seg_ext,
+                                                        offset_at_loop_start, lmsg, self.streaming)
         else:
             rel_path_parts = rel_path.split("/")
             common_path_parts = rel_path_parts[:-1]
             rel_path1 = "/".join(common_path_parts + [cfg.reps[0]['id']])
             rel_path2 = "/".join(common_path_parts + [cfg.reps[1]['id']])
-            seg1 = self.filter_media_segment(cfg, cfg.reps[0], rel_path1, vod_nr, seg_nr, seg_ext,
-                                             offset_at_loop_start, lmsg)
-            seg2 = self.filter_media_segment(cfg, cfg.reps[1], rel_path2, vod_nr, seg_nr, seg_ext,
-                                             offset_at_loop_start, lmsg)
-            muxed = segmentmuxer.MultiplexMediaSegments(data1=seg1, data2=seg2)
-            seg_content = muxed.mux_on_sample_level()
+            with phasetimer.phase('filter'):
+                seg1 = self.filter_media_segment(cfg, cfg.reps[0], rel_path1, vod_nr, seg_nr, seg_ext,
+                                                 offset_at_loop_start, lmsg)
+                seg2 = self.filter_media_segment(cfg, cfg.reps[1], rel_path2, vod_nr, seg_nr, seg_ext,
+                                                 offset_at_loop_start, lmsg)
+            with phasetimer.phase('mux'):
+                muxed = segmentmuxer.MultiplexMediaSegments(data1=seg1, data2=seg2)
+                seg_content = muxed.mux_on_sample_level()
+            if self.streaming:
+                seg_content = ChunkedPayload([seg_content])
         return seg_content
 
     #pylint: disable=too-many-arguments
-    def filter_media_segment(self, cfg, rep, rel_path, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg):
-        "Filter an actual media segment by using time-scale from init segment."
+    def filter_media_segment(self, cfg, rep, rel_path, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg,
+                             chunked=False):
+        """Filter an actual media segment by using time-scale from init segment.
+
+        Return a ChunkedPayload if chunked, otherwise a string."""
         media_seg_file = join(self.content_dir, cfg.content_name, rel_path, "%d%s" % (vod_nr, seg_ext))
         timescale = rep['timescale']
         scte35_per_minute = (rep['content_type'] == 'video') and cfg.scte35_per_minute or 0
         is_ttml = rep['content_type'] == 'subtitles'
+        if USE_SEGMENT_PATCH_PLANS and not is_ttml:
+            if chunked:
+                patch = segmentpatcher.patch_media_segment_chunks
+            else:
+                patch = segmentpatcher.patch_media_segment
+            result = patch(media_seg_file, seg_nr, cfg.seg_duration, offset_at_loop_start, lmsg, timescale,
+                           scte35_per_minute)
+            if result is not None:
+                seg_content, self.new_tfdt_value = result
+                return seg_content
         seg_filter = MediaSegmentFilter(media_seg_file, seg_nr, cfg.seg_duration, offset_at_loop_start, lmsg, timescale,
                                         scte35_per_minute, rel_path, is_ttml)
-        seg_content = seg_filter.filter()
+        if chunked:
+            seg_content = ChunkedPayload(seg_filter.filter_chunks())
+        else:
+            seg_content = seg_filter.filter()
         self.new_tfdt_value = seg_filter.get_tfdt_value()
         return seg_content
 
@@ -0,0 +1,103 @@
+"""HTTP caching support: validators, conditional requests and Cache-Control.
+
+Payloads carry an ETag, a Last-Modified time and a max-age set by the DashProvider.
+Media segments never change once available, so they can be cached until they leave the
+timeshift window. Init segments do not change at all, and MPDs can be cached for a fraction of
+the minimumUpdatePeriod.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+from email.utils import formatdate, parsedate_tz, mktime_tz
+from hashlib import md5
+
+INIT_SEGMENT_MAX_AGE_IN_S = 24*3600
+MPD_MAX_AGE_FRACTION = 0.5 # Fraction of minimumUpdatePeriod that an MPD may be cached
+MPD_MAX_MAX_AGE_IN_S = 60 # Upper limit on the max-age for MPDs
+
+NO_CACHE_HEADERS = {'Pragma' : 'no-cache', 'Cache-Control' : 'no-cache', 'Expires' : '-1'}
+
+
+def make_etag(data):
+    "Make a strong ETag from a string."
+    return '"%s"' % md5(data).hexdigest()
+
+
+def make_http_date(secs):
+    "Format seconds since epoch as an HTTP date."
+    return formatdate(secs, usegmt=True)
+
+
+def parse_http_date(date_string):
+    "Parse an HTTP date to seconds since epoch. Return None if not parseable."
+    parsed = parsedate_tz(date_string)
+    if parsed is None:
+        return None
+    try:
+        return mktime_tz(parsed)
+    except (OverflowError, ValueError):
+        return None
+
+
+def mpd_max_age(minimum_update_period_in_s):
+    "Get max-age for an MPD with the given minimumUpdatePeriod (None if not set)."
+    if minimum_update_period_in_s is None:
+        return 0
+    return int(min(minimum_update_period_in_s*MPD_MAX_AGE_FRACTION, MPD_MAX_MAX_AGE_IN_S))
+
+
+def cache_headers(payload):
+    "Get ETag, Last-Modified, and Cache-Control headers for a payload. No-cache headers if no max_age."
+    max_age = getattr(payload, 'max_age', None)
+    if max_age is None:
+        return NO_CACHE_HEADERS.copy()
+    headers = {'Cache-Control' : 'public, max-age=%d' % max(int(max_age), 0)}
+    if payload.etag is not None:
+        headers['ETag'] = payload.etag
+    if payload.last_modified is not None:
+        headers['Last-Modified'] = make_http_date(payload.last_modified)
+    return headers
+
+
+def is_not_modified(payload, if_none_match, if_modified_since):
+    """Check the conditional request headers (which may be None) against the payload.
+
+    If-None-Match takes precedence over If-Modified-Since as in RFC 7232."""
+    etag = getattr(payload, 'etag', None)
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or ("W/" + etag) in tags
+    last_modified = getattr(payload, 'last_modified', None)
+    if if_modified_since is not None and last_modified is not None:
+        since = parse_http_date(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
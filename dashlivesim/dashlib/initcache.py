@@ -0,0 +1,134 @@
+"""Precomputed init segments.
+
+Live init segments do not depend on time, so each plain or muxed init segment is generated once
+and then served as immutable bytes together with an ETag. preload() generates all plain init segments
+of the configured contents at startup. Muxed combinations are added the first time they are requested.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import threading
+
+from .httpcaching import make_etag
+from .initsegmentfilter import InitLiveFilter
+from .segmentmuxer import MultiplexInits
+from .sourcecache import read_file
+
+INIT_CACHE_ENABLED = True
+
+
+class InitSegment(object):
+    "A generated init segment with its ETag and last modification time (of the source files)."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, data, last_modified=None):
+        self.data = data
+        self.etag = make_etag(data)
+        self.last_modified = last_modified
+
+
+def make_init_segment(init_files):
+    "Generate the InitSegment for init_files."
+    last_modified = max(int(os.path.getmtime(init_file)) for init_file in init_files)
+    return InitSegment(generate_init_segment(init_files), last_modified)
+
+
+def generate_init_segment(init_files):
+    "Generate the live init segment for one file or the muxed init segment for two files."
+    if len(init_files) == 1:
+        return InitLiveFilter(init_files[0]).filter()
+    return MultiplexInits(init_files[0], init_files[1]).construct_muxed()
+
+
+class InitSegmentCache(object):
+    """Generated init segments keyed by the tuple of source files.
+
+    An entry is valid as long as the source cache returns the same data objects for the files."""
+
+    def __init__(self):
+        self._entries = {} # init_files -> (source data tuple, InitSegment)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, init_files):
+        "Get the InitSegment for a tuple of one (plain) or two (muxed) init files."
+        sources = tuple(read_file(init_file) for init_file in init_files)
+        entry = self._entries.get(init_files)
+        if entry is not None and all(old is new for (old, new) in zip(entry[0], sources)):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        init_segment = make_init_segment(init_files)
+        with self._lock:
+            self._entries[init_files] = (sources, init_segment)
+        return init_segment
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        "Remove all init segments and reset counters."
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        "Get counters and number of entries."
+        return {'hits' : self.hits, 'misses' : self.misses, 'entries' : len(self._entries)}
+
+
+INIT_SEGMENT_CACHE = InitSegmentCache()
+
+
+def get_init_segment(init_files):
+    "Get the live init segment for init_files (a tuple of one or two paths)."
+    if INIT_CACHE_ENABLED:
+        return INIT_SEGMENT_CACHE.get(init_files)
+    return make_init_segment(init_files)
+
+
+def preload(vod_conf_dir, content_dir):
+    """Generate the plain init segments for all contents with a config file in vod_conf_dir.
+
+    Return the number of init segments."""
+    nr_init_segments = 0
+    for cfg_name in sorted(os.listdir(vod_conf_dir)):
+        content_name, ext = os.path.splitext(cfg_name)
+        content_path = os.path.join(content_dir, content_name)
+        if ext != ".cfg" or not os.path.isdir(content_path):
+            continue
+        for (dir_path, _, file_names) in os.walk(content_path):
+            for file_name in sorted(file_names):
+                if os.path.splitext(file_name)[1] == ".mp4":
+                    INIT_SEGMENT_CACHE.get((os.path.join(dir_path, file_name),))
+                    nr_init_segments += 1
+    return nr_init_segments
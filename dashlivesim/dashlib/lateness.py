@@ -0,0 +1,177 @@
+"""Histograms of how early or late segment requests are relative to the segment availability time.
+
+Every live media segment request records now - segment availability time for its content and
+representation. A positive value means that the segment was requested after it became available
+(the latency of the player to the live edge), a negative value that it was requested too early.
+
+The histograms have fixed memory, with buckets like HdrHistogram: values in ms are exact below
+SUB_BUCKET_COUNT, and above that each power of two is split into SUB_BUCKET_COUNT/2 buckets,
+which gives a relative precision of about 3%.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+
+LATENESS_ENABLED = True
+LATENESS_PATH = "/lateness"
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+MAX_VALUE_BITS = 27 # Values from 2**27 ms (about 37 hours) go into the last bucket
+NR_BUCKETS = SUB_BUCKET_COUNT + (MAX_VALUE_BITS - SUB_BUCKET_BITS)*SUB_BUCKET_HALF_COUNT
+MAX_NR_HISTOGRAMS = 1024 # Content/representation pairs beyond this are recorded as OTHER
+OTHER = "other"
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def bucket_index(value_in_ms):
+    "Get the bucket index for a non-negative integer value."
+    if value_in_ms < SUB_BUCKET_COUNT:
+        return value_in_ms
+    shift = value_in_ms.bit_length() - SUB_BUCKET_BITS
+    if shift > MAX_VALUE_BITS - SUB_BUCKET_BITS:
+        return NR_BUCKETS - 1
+    return SUB_BUCKET_COUNT + (shift - 1)*SUB_BUCKET_HALF_COUNT + (value_in_ms >> shift) - SUB_BUCKET_HALF_COUNT
+
+
+def bucket_range(index):
+    "Get the (lowest, highest) value in ms in the bucket with index."
+    if index < SUB_BUCKET_COUNT:
+        return (index, index)
+    shift, sub_index = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF_COUNT)
+    shift += 1
+    lowest = (sub_index + SUB_BUCKET_HALF_COUNT) << shift
+    return (lowest, lowest + (1 << shift) - 1)
+
+
+class LatenessHistogram(object):
+    "Fixed-memory histogram of signed offsets from availability time."
+
+    def __init__(self):
+        self.late = [0]*NR_BUCKETS # Offsets >= 0
+        self.early = [0]*NR_BUCKETS # Offsets < 0, by magnitude
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, offset):
+        "Record an offset in seconds."
+        value_in_ms = int(abs(offset)*1000)
+        if offset < 0:
+            self.early[bucket_index(value_in_ms)] += 1
+        else:
+            self.late[bucket_index(value_in_ms)] += 1
+        self.count += 1
+        self.sum += offset
+        if self.min is None or offset < self.min:
+            self.min = offset
+        if self.max is None or offset > self.max:
+            self.max = offset
+
+    def buckets(self):
+        "Get the non-empty buckets as (lowest, highest, count) in seconds, in increasing order."
+        result = []
+        for index in range(NR_BUCKETS - 1, -1, -1):
+            if self.early[index]:
+                lowest, highest = bucket_range(index)
+                result.append((-(highest + 1)/1000.0, -lowest/1000.0, self.early[index]))
+        for index in range(NR_BUCKETS):
+            if self.late[index]:
+                lowest, highest = bucket_range(index)
+                result.append((lowest/1000.0, (highest + 1)/1000.0, self.late[index]))
+        return result
+
+    def value_at_percentile(self, percent, buckets=None):
+        "Get the value in s at percent, as the middle of the bucket that has it."
+        if self.count == 0:
+            return None
+        if buckets is None:
+            buckets = self.buckets()
+        rank = max(1, int(round(percent*self.count/100.0)))
+        accumulated = 0
+        for lowest, highest, count in buckets:
+            accumulated += count
+            if accumulated >= rank:
+                return (lowest + highest)/2
+        return self.max
+
+    def summary(self, with_buckets=False):
+        "Get a dict with count, early count, min, mean, max and percentiles in seconds."
+        buckets = self.buckets()
+        result = {'count' : self.count, 'too_early' : sum(self.early), 'min' : self.min, 'max' : self.max,
+                  'mean' : self.count and self.sum/self.count or None}
+        for percent in PERCENTILES:
+            result['p%d' % percent] = self.value_at_percentile(percent, buckets)
+        if with_buckets:
+            result['buckets'] = buckets
+        return result
+
+
+class LatenessHistograms(object):
+    "Lateness histograms per content and representation."
+
+    def __init__(self):
+        self._histograms = {} # (content, rep) -> LatenessHistogram
+        self._lock = threading.Lock()
+
+    def record(self, content, rep, offset):
+        "Record offset (now - availability time in s) for a request for a segment of content and rep."
+        with self._lock:
+            histogram = self._histograms.get((content, rep))
+            if histogram is None:
+                if len(self._histograms) >= MAX_NR_HISTOGRAMS:
+                    content, rep = OTHER, OTHER
+                    histogram = self._histograms.get((content, rep))
+                if histogram is None:
+                    histogram = self._histograms[(content, rep)] = LatenessHistogram()
+            histogram.record(offset)
+
+    def get(self, content, rep):
+        "Get the histogram for content and rep, or None."
+        return self._histograms.get((content, rep))
+
+    def report(self, with_buckets=False):
+        "Get {content: {rep: summary}}."
+        with self._lock:
+            items = self._histograms.items()
+            result = {}
+            for (content, rep), histogram in items:
+                result.setdefault(content, {})[rep] = histogram.summary(with_buckets)
+        return result
+
+    def clear(self):
+        "Remove all histograms."
+        with self._lock:
+            self._histograms.clear()
+
+
+LATENESS = LatenessHistograms()
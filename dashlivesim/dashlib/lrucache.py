@@ -0,0 +1,120 @@
+"""Thread-safe LRU cache with a byte budget."""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Least-recently-used cache limited by the total size in bytes of its values.
+
+    Each value is stored with its size and an optional expiry time (seconds since epoch).
+    Expired entries are never returned and are removed when found."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (value, size, expires)
+        self._lock = threading.Lock()
+        self.nr_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, now=None):
+        "Get value for key and mark it as recently used. Return None if absent or expired."
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires = entry[2]
+            if expires is not None and (now if now is not None else time.time()) > expires:
+                self.nr_bytes -= entry[1]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, expires=None):
+        "Insert value and evict the least recently used entries until within budget."
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.nr_bytes -= old_entry[1]
+            self._entries[key] = (value, size, expires)
+            self.nr_bytes += size
+            while self.nr_bytes > self.max_bytes:
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self.nr_bytes -= old_size
+                self.evictions += 1
+
+    def remove(self, key):
+        "Remove key if present."
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nr_bytes -= entry[1]
+
+    def remove_expired(self, now=None):
+        "Remove all expired entries."
+        if now is None:
+            now = time.time()
+        with self._lock:
+            expired_keys = [key for (key, entry) in self._entries.iteritems()
+                            if entry[2] is not None and now > entry[2]]
+            for key in expired_keys:
+                self.nr_bytes -= self._entries.pop(key)[1]
+            self.expirations += len(expired_keys)
+
+    def clear(self):
+        "Remove all entries and reset the counters."
+        with self._lock:
+            self._entries.clear()
+            self.nr_bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        "Get counters and current size."
+        return {'hits' : self.hits, 'misses' : self.misses, 'evictions' : self.evictions,
+                'expirations' : self.expirations, 'entries' : len(self._entries), 'bytes' : self.nr_bytes,
+                'max_bytes' : self.max_bytes}
@@ -37,6 +37,69 @@ from .ttml_timing_offset import adjust_ttml_content
 KEEP_SIDX = False
 
 
+def get_styp_brands(data):
+    "Get the brands of a styp box, except lmsg."
+    size = str_to_uint32(data[:4])
+    pos = 8
+    brands = []
+    while pos < size:
+        brand = data[pos:pos+4]
+        if brand != "lmsg":
+            brands.append(brand)
+        pos += 4
+    return brands
+
+def make_styp(brands, lmsg):
+    "Make a styp box with brands, and lmsg added at the end if lmsg is True."
+    if lmsg:
+        brands = brands + ["lmsg"]
+    new_size = 8 + 4*len(brands)
+    return uint32_to_str(new_size) + "styp" + "".join(brands)
+
+def create_scte35box(seg_nr, seg_duration, scte35_per_minute):
+    """Create an Scte35 emsg box if at the right instance.
+
+    Depending on scte35_per_minute, the splice inserts are as follows::
+    1: 10s after full minute
+    2: 10s and 40s after full minute
+    3: 10, 30, 50s after full minute
+    The SCTE35 message are coming in a segment that covers the time 8-6 s in advance.
+    """
+    ad_duration = 10
+    if scte35_per_minute < 1 or scte35_per_minute > 8:
+        return ""
+    seg_starttime = seg_nr*seg_duration # StartTime in seconds
+    sec_modulo_minute = seg_starttime % 60
+    minute_start = seg_starttime - sec_modulo_minute
+    splice_insert_times = [minute_start + 10]
+    if scte35_per_minute == 2:
+        splice_insert_times.append(minute_start+40)
+    elif scte35_per_minute == 3:
+        splice_insert_times.append(minute_start+36)
+        splice_insert_times.append(minute_start+46)
+    elif scte35_per_minute == 8:
+        splice_insert_times.append(minute_start+30)
+        ad_duration = 20
+    found_splice_time = -1
+    splice_time = None
+    seg_endtime = seg_starttime + seg_duration
+    for splice_time in splice_insert_times: # Assume that there are events 8s and 6s before the actual splice
+        for pre_warning_time in (splice_time - 6, splice_time-8):
+            if seg_starttime <= pre_warning_time <= seg_endtime:
+                found_splice_time = splice_time
+                break
+        if found_splice_time >= 0:
+            break
+    if found_splice_time < 0:
+        return "" # Nothing for this segment
+    timescale = 90000 # Timescale
+    emsg_id = splice_id = splice_time//10
+    emsg = scte35.create_scte35_emsg(timescale, seg_starttime*timescale, found_splice_time*timescale,
+                                     ad_duration*timescale, emsg_id, splice_id)
+    #print "Made scte35 emsg %d" % len(emsg)
+    return emsg
+
+
 class MediaSegmentFilterError(Exception):
     "Error in MediaSegmentFilter."
 
@@ -49,7 +112,7 @@ class MediaSegmentFilter(MP4Filter):
     def __init__(self, file_name, seg_nr=None, seg_duration=1, offset=0, lmsg=False, track_timescale=None,
                  scte35_per_minute=0, rel_path=None, is_ttml=False):
         MP4Filter.__init__(self, file_name)
-        self.top_level_boxes_to_parse = ["styp", "sidx", "moof", "mdat"]
+        self.top_level_boxes_to_parse = ["styp", "sidx", "moof"] # mdat is passed on without copying
         self.composite_boxes_to_parse = ['moof', 'traf']
         self.seg_nr = seg_nr
         self.seg_duration = seg_duration
@@ -70,23 +133,7 @@ class MediaSegmentFilter(MP4Filter):
     #pylint: disable=no-self-use
     def process_styp(self, data):
         "Process styp and make sure lmsg presence follows the lmsg flag parameter. Add scte35 box if appropriate"
-        lmsg = self.lmsg
-        output = ""
-        size = str_to_uint32(data[:4])
-        pos = 8
-        brands = []
-        while pos < size:
-            brand = data[pos:pos+4]
-            if brand != "lmsg":
-                brands.append(brand)
-            pos += 4
-        if lmsg:
-            brands.append("lmsg")
-        new_size = 8 + 4*len(brands)
-        output += uint32_to_str(new_size)
-        output += "styp"
-        for brand in brands:
-            output += brand
+        output = make_styp(get_styp_brands(data), self.lmsg)
         scte35box = self.create_scte35box()
         output += scte35box
         return output
@@ -255,61 +302,22 @@ class MediaSegmentFilter(MP4Filter):
         return self.duration
 
     def create_scte35box(self):
-        """Create an Scte35 emsg box if at the right instance.
-
-        Depending on scte35_per_minute, the splice inserts are as follows::
-        1: 10s after full minute
-        2: 10s and 40s after full minute
-        3: 10, 30, 50s after full minute
-        The SCTE35 message are coming in a segment that covers the time 8-6 s in advance.
-        """
-        ad_duration = 10
-        if self.scte35_per_minute < 1 or self.scte35_per_minute > 8:
-            return ""
-        seg_starttime = self.seg_nr*self.seg_duration # StartTime in seconds
-        sec_modulo_minute = seg_starttime % 60
-        minute_start = seg_starttime - sec_modulo_minute
-        splice_insert_times = [minute_start + 10]
-        if self.scte35_per_minute == 2:
-            splice_insert_times.append(minute_start+40)
-        elif self.scte35_per_minute == 3:
-            splice_insert_times.append(minute_start+36)
-            splice_insert_times.append(minute_start+46)
-        elif self.scte35_per_minute == 8:
-            splice_insert_times.append(minute_start+30)
-            ad_duration = 20
-        found_splice_time = -1
-        splice_time = None
-        seg_endtime = seg_starttime + self.seg_duration
-        for splice_time in splice_insert_times: # Assume that there are events 8s and 6s before the actual splice
-            for pre_warning_time in (splice_time - 6, splice_time-8):
-                if seg_starttime <= pre_warning_time <= seg_endtime:
-                    found_splice_time = splice_time
-                    break
-            if found_splice_time >= 0:
-                break
-        if found_splice_time < 0:
-            return "" # Nothing for this segment
-        timescale = 90000 # Timescale
-        emsg_id = splice_id = splice_time//10
-        emsg = scte35.create_scte35_emsg(timescale, seg_starttime*timescale, found_splice_time*timescale,
-                                         ad_duration*timescale, emsg_id, splice_id)
-        #print "Made scte35 emsg %d" % len(emsg)
-        return emsg
+        "Create an Scte35 emsg box if at the right instance."
+        return create_scte35box(self.seg_nr, self.seg_duration, self.scte35_per_minute)
 
     def find_and_process_mdat(self, data):
         "Change the ttml part of mdat and update mdat size. Return full new data."
         pos = 0
-        output = ""
+        output = []
         while pos < len(data):
             size = str_to_uint32(data[pos:pos+4])
             boxtype = data[pos+4:pos+8]
             if boxtype != 'mdat':
-                output += data[pos:pos+size]
+                output.append(data[pos:pos+size])
             else:
-                output += self.update_ttml_mdat(data[pos:pos+size])
+                output.append(self.update_ttml_mdat(data[pos:pos+size]))
             pos += size
-        return output
+        return "".join(output)
 
     def update_ttml_mdat(self, data):
         "Update the ttml payload of mdat and its size."
@@ -0,0 +1,220 @@
+"""Process metrics in the Prometheus text exposition format.
+
+The counters are updated for every request, so they are sharded per thread: each thread
+increments its own dictionary without taking a lock, and the shards are summed when the
+metrics are rendered. Cache counters and the phase duration histograms are read from
+the caches and phasetimer.PHASE_STATS at render time.
+
+Note that the metrics are per process. With pre-forked workers, each worker has its own.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+
+from . import configprocessor
+from . import initcache
+from . import mpdcache
+from . import phasetimer
+from . import pregenerator
+from . import segmentcache
+from . import segmentpatcher
+from . import sourcecache
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+MAX_NR_LABEL_SETS = 4096 # Content/representation pairs beyond this are counted as OTHER
+OTHER = "other"
+UNKNOWN = "unknown"
+
+
+class ShardedCounter(object):
+    "Counter with labels where each thread increments its own shard, so that no lock is needed."
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock() # Only taken when a thread makes its shard
+
+    def inc(self, labels, amount=1):
+        "Increment the counter for the tuple of label values."
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        "Get the sum of all shards as a dict from label values to count."
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for labels, count in shard.items():
+                totals[labels] = totals.get(labels, 0) + count
+        return totals
+
+    def clear(self):
+        "Reset the counter in all shards."
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+def escape_label_value(value):
+    "Escape a label value for the text format."
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(label_names, label_values):
+    "Format labels as {name=\"value\",...}."
+    if not label_names:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, escape_label_value(value))
+                             for (name, value) in zip(label_names, label_values))
+
+
+def format_number(value):
+    "Format a sample value."
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Metrics(object):
+    "The metrics of the simulator."
+
+    def __init__(self):
+        self.requests = ShardedCounter("dashlivesim_requests_total", "Requests by extension, content and "
+                                       "representation.", ('ext', 'content', 'rep'))
+        self.not_found = ShardedCounter("dashlivesim_not_found_total", "404 responses by reason.", ('reason',))
+        self.response_bytes = ShardedCounter("dashlivesim_response_bytes_total", "Bytes in response bodies.",
+                                             ('ext',))
+        self.counters = (self.requests, self.not_found, self.response_bytes)
+        self._label_sets = set()
+
+    def request_labels(self, url_parts):
+        "Get (content, rep) for the URL parts after the prefix."
+        labels = configprocessor.get_content_and_rep(url_parts)
+        if labels[0] is None:
+            return (UNKNOWN, UNKNOWN)
+        if labels not in self._label_sets:
+            if len(self._label_sets) >= MAX_NR_LABEL_SETS:
+                return (OTHER, OTHER)
+            self._label_sets.add(labels)
+        return labels
+
+    def record_request(self, url_parts, ext, nr_bytes, error_reason=None):
+        "Count a request. error_reason is set for 404 responses. Unknown extensions are counted as other."
+        ext = phasetimer.get_ext_label(ext)
+        self.requests.inc((ext,) + self.request_labels(url_parts))
+        if error_reason is not None:
+            self.not_found.inc((error_reason,))
+        if nr_bytes:
+            self.response_bytes.inc((ext,), nr_bytes)
+
+    def render(self):
+        "Render all metrics in the text exposition format."
+        lines = []
+        for counter in self.counters:
+            lines.append("# HELP %s %s" % (counter.name, counter.help_text))
+            lines.append("# TYPE %s counter" % counter.name)
+            for labels, count in sorted(counter.values().items()):
+                lines.append("%s%s %s" % (counter.name, format_labels(counter.label_names, labels), count))
+        lines.extend(render_cache_stats())
+        lines.extend(render_pregeneration_stats())
+        lines.extend(render_phase_histograms(phasetimer.PHASE_STATS.snapshot()))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        "Reset all counters."
+        for counter in self.counters:
+            counter.clear()
+        self._label_sets.clear()
+
+
+def get_cache_stats():
+    "Get the stats dicts of the caches by name."
+    return [('segment', segmentcache.SEGMENT_CACHE.stats()),
+            ('mpd', mpdcache.MPD_CACHE.stats()),
+            ('init', initcache.INIT_SEGMENT_CACHE.stats()),
+            ('source', sourcecache.SOURCE_FILE_CACHE.stats()),
+            ('patch_plan', segmentpatcher.PATCH_PLAN_CACHE.stats()),
+            ('vod_config', configprocessor.VOD_CONFIG_CATALOG.stats())]
+
+
+def render_cache_stats():
+    "Render the hit and miss counters and number of entries of the caches."
+    cache_stats = get_cache_stats()
+    lines = []
+    for key, metric_type, help_text in (('hits', 'counter', "Cache hits."), ('misses', 'counter', "Cache misses."),
+                                        ('entries', 'gauge', "Entries in cache.")):
+        name = "dashlivesim_cache_%s%s" % (key, metric_type == 'counter' and "_total" or "")
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, metric_type))
+        for cache_name, stats in cache_stats:
+            lines.append('%s{cache="%s"} %d' % (name, cache_name, stats[key]))
+    return lines
+
+
+def render_pregeneration_stats():
+    "Render the counters of the segment pregenerator."
+    lines = []
+    for name, help_text, count in (("dashlivesim_pregenerated_segments_total", "Segments generated ahead of time.",
+                                    pregenerator.SCHEDULER.nr_generated),
+                                   ("dashlivesim_pregeneration_failures_total", "Failed segment pregenerations.",
+                                    pregenerator.SCHEDULER.nr_failed)):
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s counter" % name)
+        lines.append("%s %d" % (name, count))
+    return lines
+
+
+def render_phase_histograms(phase_stats):
+    "Render phasetimer.PhaseStats.snapshot() as a histogram in seconds."
+    name = "dashlivesim_phase_duration_seconds"
+    lines = ["# HELP %s Time spent in request phases by extension." % name, "# TYPE %s histogram" % name]
+    for ext in sorted(phase_stats):
+        for phase in sorted(phase_stats[ext]):
+            histogram = phase_stats[ext][phase]
+            labels = 'ext="%s",phase="%s"' % (escape_label_value(ext), escape_label_value(phase))
+            for bound, count in histogram['buckets']:
+                upper = bound is None and "+Inf" or format_number(bound/1000.0)
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, upper, count))
+            lines.append('%s_sum{%s} %s' % (name, labels, format_number(histogram['sum_ms']/1000.0)))
+            lines.append('%s_count{%s} %d' % (name, labels, histogram['count']))
+    return lines
+
+
+METRICS = Metrics()
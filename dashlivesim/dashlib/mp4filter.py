@@ -33,6 +33,12 @@ The filter is streamlined for DASH or other content with one track per file.
 #  POSSIBILITY OF SUCH DAMAGE.
 
 from .structops import str_to_uint32, uint32_to_str
+from .sourcecache import read_file
+
+
+def join_chunks(chunks):
+    "Join a list of strings and memoryviews into one string."
+    return "".join([chunk if isinstance(chunk, str) else chunk.tobytes() for chunk in chunks])
 
 
 class MP4FilterError(BaseException):
@@ -49,7 +55,7 @@ class MP4Filter(object):
     def __init__(self, filename=None, data=None):
         self.filename = filename
         if filename is not None:
-            self.data = open(filename, "rb").read()
+            self.data = read_file(filename)
         else:
             self.data = data
         self.emsg = None
@@ -68,16 +74,7 @@ class MP4Filter(object):
 
     def filter(self):
         "Top level box parsing. The lower-level parsing is done in self.filter_box(). "
-        self.output = ""
-        pos = 0
-        while pos < len(self.data):
-            size, boxtype = self.check_box(self.data[pos:pos+8])
-            boxdata = self.data[pos:pos+size]
-            if boxtype in self.top_level_boxes_to_parse:
-                self.output += self.filter_box(boxtype, boxdata, len(self.output))
-            else:
-                self.output += boxdata
-            pos += size
+        self.output = join_chunks(self.filter_chunks())
         if self.next_phase_data:
             self.nr_iterations_done += 1
             self.data = self.output
@@ -85,6 +82,27 @@ class MP4Filter(object):
         self.finalize()
         return self.output
 
+    def filter_chunks(self):
+        """Top level box parsing, returning the output as a list of chunks.
+
+        Filtered boxes are strings, while boxes that are not filtered (like mdat) are
+        memoryview slices of the input data, so that they are never copied."""
+        chunks = []
+        output_size = 0
+        data_view = memoryview(self.data)
+        pos = 0
+        while pos < len(self.data):
+            size, boxtype = self.check_box(self.data[pos:pos+8])
+            if boxtype in self.top_level_boxes_to_parse:
+                chunk = self.filter_box(boxtype, self.data[pos:pos+size], output_size)
+            else:
+                chunk = data_view[pos:pos+size]
+            if len(chunk) > 0:
+                chunks.append(chunk)
+                output_size += len(chunk)
+            pos += size
+        return chunks
+
     def filter_box(self, boxtype, data, file_pos, path=""):
         "Filter box or tree of boxes recursively."
 
@@ -100,16 +118,21 @@ class MP4Filter(object):
 
         if boxtype in self.composite_boxes_to_parse:
             #print "Parsing %s" % path
-            output = data[:8]
+            children = []
+            output_size = 8
             pos = 8
             while pos < len(data):
                 child_size, child_box_type = self.check_box(data[pos:pos+8])
                 output_child_box = self.filter_box(child_box_type, data[pos:pos+child_size], file_pos+pos, path)
-                output += output_child_box
+                children.append(output_child_box)
+                output_size += len(output_child_box)
                 pos += child_size
-            if len(output) != len(data):
-                #print "Rewriting size of %s from %d to %d" % (boxtype, str_to_uint32(output[0:4]), len(output))
-                output = uint32_to_str(len(output)) + output[4:]
+            if output_size != len(data):
+                #print "Rewriting size of %s from %d to %d" % (boxtype, str_to_uint32(data[0:4]), output_size)
+                header = uint32_to_str(output_size) + data[4:8]
+            else:
+                header = data[:8]
+            output = header + "".join(children)
         else:
             method_name = "process_%s" % boxtype
             method = getattr(self, method_name, None)
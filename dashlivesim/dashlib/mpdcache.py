@@ -0,0 +1,115 @@
+"""Time-quantized cache of generated MPDs.
+
+A live MPD with SegmentTemplate essentially changes when a new segment becomes available (or for modulo
+periods, when the minimumUpdatePeriod has passed). The time is therefore divided into buckets aligned with the
+availabilityStartTime. With SegmentTimeline, the S entries of the different tracks change at different times,
+so the buckets are one second (the resolution of the time used for the MPD).
+The MPD is generated as it is at the start of the bucket, and reused for all requests with the same URL
+in the same bucket. The bytes are thus the same, independent of which request (or process) generated them.
+When a new bucket starts, the new MPD is compared to the previous one.
+If nothing but the publishTime differs, the previous MPD is kept, so that publishTime, ETag and
+Last-Modified only change when the content of the MPD changes.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+from .lrucache import LRUCache
+from .httpcaching import make_etag
+from .timeformatconversions import make_timestamp
+
+MPD_CACHE_ENABLED = True
+MPD_CACHE_MAX_BYTES = 16*1024*1024
+
+
+def time_bucket(cfg, now):
+    """The time interval in which the same MPD is used for cfg.
+
+    The last element is the start of the interval, the others are the values that change the MPD at other times."""
+    if cfg.seg_timeline:
+        bucket_duration = 1
+    elif cfg.modulo_period is not None:
+        bucket_duration = cfg.minimum_update_period_in_s
+    else:
+        bucket_duration = cfg.seg_duration
+    ast = cfg.availability_start_time_in_s
+    start = ast + (int(now) - ast)//bucket_duration*bucket_duration
+    return (ast, cfg.availability_end_time, cfg.media_presentation_duration, start)
+
+
+class CachedMpd(object):
+    "A generated MPD with the time it was published and its max-age (from the minimumUpdatePeriod)."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, bucket, mpd, publish_time, max_age=None):
+        self.bucket = bucket
+        self.mpd = mpd
+        self.publish_time = publish_time
+        self.max_age = max_age
+        self.etag = make_etag(mpd)
+
+
+class MpdCache(object):
+    "Byte-bounded cache of the latest generated MPD per URL."
+
+    def __init__(self, max_bytes=MPD_CACHE_MAX_BYTES):
+        self.lru = LRUCache(max_bytes)
+
+    def get(self, key, bucket):
+        "Get the CachedMpd for key if it was generated in bucket, otherwise None."
+        cached = self.lru.get(key)
+        if cached is not None and cached.bucket == bucket:
+            return cached
+        return None
+
+    def put(self, key, bucket, mpd, now, max_age=None):
+        """Store the MPD generated for bucket with publishTime now, and return the CachedMpd to use.
+
+        If the MPD only differs from the previous one in publishTime, the previous MPD is kept."""
+        previous = self.lru.get(key)
+        if previous is not None:
+            new_publish_time = 'publishTime="%s"' % make_timestamp(now)
+            old_publish_time = 'publishTime="%s"' % make_timestamp(previous.publish_time)
+            if mpd.replace(new_publish_time, old_publish_time, 1) == previous.mpd:
+                previous.bucket = bucket
+                return previous
+        cached = CachedMpd(bucket, mpd, now, max_age)
+        self.lru.put(key, cached, len(mpd))
+        return cached
+
+    def clear(self):
+        "Remove all MPDs and reset counters."
+        self.lru.clear()
+
+    def stats(self):
+        "Get counters and size for the cache."
+        return self.lru.stats()
+
+
+MPD_CACHE = MpdCache()
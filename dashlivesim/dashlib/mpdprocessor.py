@@ -30,16 +30,15 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 
 import copy
-import bisect
 from xml.etree import ElementTree
 import cStringIO
 import time
 import re
 import os
-from struct import unpack
-from .configprocessor import SEGTIMEFORMAT, SegTimeEntry
+from .segmenttimeline import get_timeline_index
 from .timeformatconversions import make_timestamp
 
+from . import phasetimer
 from . import scte35
 
 SET_BASEURL = True
@@ -64,6 +63,50 @@ def set_values_from_dict(element, keys, data):
             element.set(key, str(data[key]))
 
 
+def make_baseurls(data):
+    "Make the list of BaseURLs to insert. There is more than one if multiple URLs are configured."
+    if not (data.has_key('urls') and data['urls']): # check if we have to set multiple URLs
+        return [data['BaseURL']]
+    base_urls = []
+    url_header, url_body = data['BaseURL'].split('//')
+    url_parts = url_body.split('/')
+    i = -1
+    for part in url_parts:
+        i += 1
+        if part.find("_") < 0: #Not a configuration
+            continue
+        cfg_parts = part.split("_", 1)
+        key, _ = cfg_parts
+        if key == "baseurl":
+            url_parts[i] = "" #Remove all the baseurl elements
+    url_parts = filter(None, url_parts)
+    for url in data['urls']:
+        url_parts.insert(-1, "baseurl_" + url)
+        base_urls.append(url_header + "//" + "/".join(url_parts) + "/")
+        del url_parts[-2]
+    return base_urls
+
+def make_direct_utc_time():
+    "Make the value for a direct UTCTiming element."
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time()))
+
+def segment_timeline_entries(cfg, content_type, now):
+    """Get the S entries for the SegmentTimeline covering the interval [now-tsbd, now].
+
+    Returns a list of (start_time, duration, repeat) tuples, where start_time is None except for the first entry."""
+    media_data = cfg.media_data[content_type]
+    dat_file_path = os.path.join(cfg.vod_cfg_dir, media_data['dat_file'])
+    index = get_timeline_index(dat_file_path)
+    return index.timeline_entries(now, cfg.timeshift_buffer_depth_in_s, media_data['timescale'])
+
+def segment_timeline_text(cfg, content_type, now):
+    "Get the S elements for the SegmentTimeline covering the interval [now-tsbd, now] as serialized text."
+    media_data = cfg.media_data[content_type]
+    dat_file_path = os.path.join(cfg.vod_cfg_dir, media_data['dat_file'])
+    index = get_timeline_index(dat_file_path)
+    return index.render_timeline(now, cfg.timeshift_buffer_depth_in_s, media_data['timescale'])
+
+
 class MpdModifierError(Exception):
     "Generic MpdModifier error."
     pass
@@ -104,7 +147,7 @@ class MpdProcessor(object):
         set_values_from_dict(mpd, key_list, data)
         if mpd.attrib.has_key('mediaPresentationDuration') and not data.has_key('mediaPresentationDuration'):
             del mpd.attrib['mediaPresentationDuration']
-        mpd.set('publishTime', make_timestamp(self.mpd_proc_cfg['now'])) #TODO Correlate time with change in MPD
+        mpd.set('publishTime', self.make_publish_time()) #TODO Correlate time with change in MPD
         mpd.set('id', 'Config part of url maybe?')
         if self.segtimeline:
             if mpd.attrib.has_key('maxSegmentDuration'):
@@ -132,26 +175,8 @@ class MpdProcessor(object):
                 self.modify_baseurl(next_child, data['BaseURL'])
                 pos += 1
         elif data.has_key('BaseURL') and SET_BASEURL:
-            if data.has_key('urls') and data['urls']: # check if we have to set multiple URLs
-                url_header, url_body = data['BaseURL'].split('//')
-                url_parts = url_body.split('/')
-                i = -1
-                for part in url_parts:
-                    i += 1
-                    if part.find("_") < 0: #Not a configuration
-                        continue
-                    cfg_parts = part.split("_", 1)
-                    key, _ = cfg_parts
-                    if key == "baseurl":
-                        url_parts[i] = "" #Remove all the baseurl elements
-                url_parts = filter(None, url_parts)
-                for url in data['urls']:
-                    url_parts.insert(-1, "baseurl_" + url)
-                    self.insert_baseurl(mpd, pos, url_header + "//" + "/".join(url_parts) + "/")
-                    del url_parts[-2]
-                    pos += 1
-            else:
-                self.insert_baseurl(mpd, pos, data['BaseURL'])
+            for base_url in self.make_baseurls(data):
+                self.insert_baseurl(mpd, pos, base_url)
                 pos += 1
         children = mpd.getchildren()
         for ch_nr in range(pos, len(children)):
@@ -222,115 +247,7 @@ class MpdProcessor(object):
             seg_timeline.text = "\n"
             seg_timeline.tail = "\n"
             seg_template.insert(pos, seg_timeline)
-            now = self.mpd_proc_cfg['now']
-            tsbd = self.cfg.timeshift_buffer_depth_in_s
-
-            #Interval start = max(now-timeshift_buffer_depth_in_s, period_start)
-            #Interval end = min(now, period_end)
-
-            start = (now - tsbd)*timescale
-            end = now*timescale
-
-            wrap_duration = 3600*timescale
-            wrap_offset = 0*timescale #AST
-
-            # The start segment is the latest one that starts before or at start
-            # The end segment is the latest one that ends before now.
-
-            dat_file = media_data['dat_file']
-            dat_file_path = os.path.join(self.cfg.vod_cfg_dir, dat_file)
-            segtimedata = [] # Tuples corresponding to SegTimeEntry
-            with open(dat_file_path, "rb") as ifh:
-                data = ifh.read(12)
-                while data:
-                    ste = SegTimeEntry(*unpack(SEGTIMEFORMAT, data))
-                    segtimedata.append(ste)
-                    data = ifh.read(12)
-
-            interval_starts = [std[2] for std in segtimedata]
-
-            def get_seg_starttime(nr_wraps, seg_data, repeats):
-                "Get the segment starttime given repeats."
-                return wrap_offset + nr_wraps*wrap_duration + seg_data.start_time + repeats*seg_data.duration
-
-            def find_latest_starting_before(act_time):
-                "Fint the latest segment starting before act_time."
-                nr_wraps = (act_time - wrap_offset) // wrap_duration
-                if nr_wraps < 0:
-                    return (None, None, None)# This is before AST
-                wrap_start_time = wrap_offset + nr_wraps * wrap_duration
-                rel_time = act_time - wrap_start_time
-                index = bisect.bisect(interval_starts, rel_time) - 1
-                seg_data = segtimedata[index]
-                repeats = 0
-                accumulated_end_time = seg_data.start_time + seg_data.duration
-                while accumulated_end_time < rel_time:
-                    accumulated_end_time += seg_data.duration
-                    repeats += 1
-                return (index, repeats, nr_wraps)
-
-            def find_repeats_ending_before(act_time, index, nr_wraps):
-                "Find the repeats given values of act_time, index, nr_wrapts."
-                wrap_start_time = wrap_offset + nr_wraps * wrap_duration
-                seg_data = segtimedata[index]
-                rel_time = act_time - wrap_start_time
-                repeats = 0
-                accumulated_end_time = seg_data.start_time + seg_data.duration
-                while True:
-                    accumulated_end_time += seg_data.duration
-                    if accumulated_end_time > rel_time:
-                        break
-                    repeats += 1
-                    if repeats > seg_data.repeats:
-                        print "Inconsistent table of segment durations. repeats = %d" % repeats
-                        return
-                return repeats
-
-            (end_index, end_repeats, end_wraps) = find_latest_starting_before(end)
-            if end_index is None:
-                return
-            if end_repeats > 0:
-                end_repeats -= 1  # Just move one segment back in the repeat
-            elif end_index > 0:
-                end_index -= 1
-                end_repeats = find_repeats_ending_before(end, end_index, end_wraps)
-            else:
-                end_wraps -= 1
-                if end_wraps < 0:
-                    return
-                end_index = len(segtimedata) - 1
-                end_repeats = find_repeats_ending_before(end, end_index, end_wraps)
-
-            (start_index, start_repeats, start_wraps) = find_latest_starting_before(start)
-
-            def generate_s_elem(start_time, duration, repeat):
-                "Generate the S elements for the SegmentTimeline."
-                s_elem = ElementTree.Element(add_ns('S'))
-                if start_time is not None:
-                    s_elem.set("t", str(start_time))
-                s_elem.set("d", str(duration))
-                if repeat > 0:
-                    s_elem.set('r', str(repeat))
-                s_elem.tail = "\n"
-                seg_template.insert = seg_timeline.insert(0, s_elem)
-
-            repeat_index = end_index
-            nr_wraps = end_wraps
-            while repeat_index != start_index or nr_wraps != start_wraps:
-                seg_data = segtimedata[repeat_index]
-                if repeat_index == end_index:
-                    generate_s_elem(None, seg_data.duration, end_repeats)
-                else:
-                    generate_s_elem(None, seg_data.duration, seg_data.repeats)
-                repeat_index -= 1
-                if repeat_index < 0:
-                    nr_wraps -= 1
-                    repeat_index = len(segtimedata) - 1
-                end_repeats = segtimedata[repeat_index].repeats
-            # Now at first entry corresponding to start_index and start_wraps
-            seg_data = segtimedata[start_index]
-            generate_s_elem(get_seg_starttime(nr_wraps, seg_data, start_repeats), seg_data.duration,
-                            end_repeats - start_repeats)
+            self.insert_segment_timeline_entries(seg_timeline, content_type)
 
         periods = mpd.findall(add_ns('Period'))
         last_period_id = '-1'
@@ -366,6 +283,31 @@ class MpdProcessor(object):
                         create_segment_timeline(seg_template, content_type, 0)
             last_period_id = pdata.get('id')
 
+    def insert_segment_timeline_entries(self, seg_timeline, content_type):
+        "Insert the S elements into seg_timeline."
+        entries = segment_timeline_entries(self.cfg, content_type, self.mpd_proc_cfg['now'])
+        for (start_time, duration, repeat) in entries:
+            s_elem = ElementTree.Element(add_ns('S'))
+            if start_time is not None:
+                s_elem.set("t", str(start_time))
+            s_elem.set("d", str(duration))
+            if repeat > 0:
+                s_elem.set('r', str(repeat))
+            s_elem.tail = "\n"
+            seg_timeline.append(s_elem)
+
+    def make_publish_time(self):
+        "Make the publishTime value."
+        return make_timestamp(self.mpd_proc_cfg['now'])
+
+    def make_direct_utc_time(self):
+        "Make the value for a direct UTCTiming element."
+        return make_direct_utc_time()
+
+    def make_baseurls(self, data):
+        "Make the list of BaseURLs to insert."
+        return make_baseurls(data)
+
     def create_descriptor_elem(self, name, scheme_id_uri, value=None, elem_id=None):
         "Create an element of DescriptorType."
         elem = ElementTree.Element(add_ns(name))
@@ -385,8 +327,8 @@ class MpdProcessor(object):
         pos = start_pos
         for utc_method in self.utc_timing_methods:
             if utc_method == "direct":
-                direct_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time()))
-                time_elem = self.create_descriptor_elem('UTCTiming', 'urn:mpeg:dash:utc:direct:2014', direct_time)
+                time_elem = self.create_descriptor_elem('UTCTiming', 'urn:mpeg:dash:utc:direct:2014',
+                                                        self.make_direct_utc_time())
             elif utc_method == "head":
                 time_elem = self.create_descriptor_elem('UTCTiming', 'urn:mpeg:dash:utc:http-head:2014',
                                                         self.utc_head_url)
@@ -398,10 +340,11 @@ class MpdProcessor(object):
 
     def get_full_xml(self, clean=True):
         "Get a string of all XML cleaned (no ns0 namespace)"
-        ofh = cStringIO.StringIO()
-        self.tree.write(ofh, encoding="utf-8")#, default_namespace=NAMESPACE)
-        value = ofh.getvalue()
-        if clean:
-            value = value.replace("ns0:", "").replace("xmlns:ns0=", "xmlns=")
+        with phasetimer.phase('serialize'):
+            ofh = cStringIO.StringIO()
+            self.tree.write(ofh, encoding="utf-8")#, default_namespace=NAMESPACE)
+            value = ofh.getvalue()
+            if clean:
+                value = value.replace("ns0:", "").replace("xmlns:ns0=", "xmlns=")
         xml_intro = '<?xml version="1.0" encoding="utf-8"?>\n'
         return xml_intro + value
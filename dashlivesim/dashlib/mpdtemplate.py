@@ -0,0 +1,227 @@
+"""Compiled MPD templates.
+
+Parsing the VoD MPD and rewriting the ElementTree for every manifest request is expensive.
+Instead, the MpdProcessor is run once with slot markers in place of all time- and request-dependent
+values, and the serialized result is split into a list of literal strings and named slots.
+Requests with the same structure (same VoD MPD and same set of structural options)
+then only need to compute the slot values and join the parts.
+
+The output is byte-identical to the output of the MpdProcessor.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import re
+from xml.etree import ElementTree
+
+from . import mpdprocessor
+from . import phasetimer
+from .mpdprocessor import MpdProcessor, make_baseurls, make_direct_utc_time, segment_timeline_text
+from .segmenttimeline import render_s_element
+from .timeformatconversions import make_timestamp
+
+MAX_NR_TEMPLATES = 256 # The template cache is cleared if it grows beyond this
+
+MPD_ATTRIBUTE_KEYS = ('availabilityStartTime', 'availabilityEndTime', 'timeShiftBufferDepth',
+                      'minimumUpdatePeriod', 'maxSegmentDuration', 'mediaPresentationDuration')
+PERIOD_KEYS = ('id', 'start', 'startNumber', 'presentationTimeOffset')
+
+SLOT_MARKER = "\x1d%d\x1d"
+RE_SLOT_MARKER = re.compile("\x1d(\\d+)\x1d")
+
+ATTRIB = 0
+TEXT = 1
+
+_templates = {}
+
+
+class MpdTemplateError(Exception):
+    "Error in MPD template handling."
+
+
+def render_s_elements(entries):
+    "Render SegmentTimeline entries exactly as the ElementTree serialization of the S elements."
+    return "".join([render_s_element(*entry) for entry in entries])
+
+
+class MpdTemplate(object):
+    "A VoD MPD compiled into literal parts and slots that are filled in for each request."
+
+    def __init__(self, xml, slots):
+        self.slots = slots # List of (slot_id, kind)
+        self.parts = RE_SLOT_MARKER.split(xml) # Literal strings at even positions, slot numbers at odd
+        for i in range(1, len(self.parts), 2):
+            self.parts[i] = int(self.parts[i])
+
+    def render(self, data, period_data, mpd_proc_cfg, cfg):
+        "Fill in the slots with values for this request and return the full MPD."
+        values = [self.slot_value(slot_id, kind, data, period_data, mpd_proc_cfg, cfg)
+                  for (slot_id, kind) in self.slots]
+        with phasetimer.phase('serialize'):
+            parts = self.parts[:]
+            for i in range(1, len(parts), 2):
+                parts[i] = values[parts[i]]
+            return "".join(parts)
+
+    #pylint: disable=no-self-use, too-many-arguments
+    def slot_value(self, slot_id, kind, data, period_data, mpd_proc_cfg, cfg):
+        "Calculate and escape the value of one slot."
+        slot_type = slot_id[0]
+        if slot_type == 'data':
+            value = str(data[slot_id[1]])
+        elif slot_type == 'period':
+            value = str(period_data[slot_id[1]][slot_id[2]])
+        elif slot_type == 'baseurl':
+            value = make_baseurls(data)[slot_id[1]]
+        elif slot_type == 'publishTime':
+            value = make_timestamp(mpd_proc_cfg['now'])
+        elif slot_type == 'utc_head_url':
+            value = mpd_proc_cfg['utc_head_url']
+        elif slot_type == 'utc_direct':
+            value = make_direct_utc_time()
+        elif slot_type == 'timeline':
+            return "\n" + segment_timeline_text(cfg, slot_id[1], mpd_proc_cfg['now'])
+        else:
+            raise MpdTemplateError("Unknown slot %s" % (slot_id,))
+        if kind == ATTRIB:
+            value = ElementTree._escape_attrib(value, "utf-8") #pylint: disable=protected-access
+        else:
+            value = ElementTree._escape_cdata(value, "utf-8") #pylint: disable=protected-access
+        return value.replace("ns0:", "").replace("xmlns:ns0=", "xmlns=")
+
+
+class MpdTemplateCompiler(MpdProcessor):
+    "Run the MpdProcessor with slot markers instead of values and turn the result into an MpdTemplate."
+
+    def __init__(self, infile, mpd_proc_cfg, cfg=None):
+        MpdProcessor.__init__(self, infile, mpd_proc_cfg, cfg)
+        self.slots = []
+        self._slot_nrs = {}
+        self.utc_head_url = self.slot(('utc_head_url',), ATTRIB)
+
+    def slot(self, slot_id, kind):
+        "Get the marker for a slot. The same slot_id always gives the same marker."
+        if slot_id not in self._slot_nrs:
+            self._slot_nrs[slot_id] = len(self.slots)
+            self.slots.append((slot_id, kind))
+        return SLOT_MARKER % self._slot_nrs[slot_id]
+
+    def mark_data(self, data):
+        "Return a copy of data with markers for all values that end up as MPD attributes."
+        marked_data = data.copy()
+        for key in MPD_ATTRIBUTE_KEYS:
+            if key in data:
+                marked_data[key] = self.slot(('data', key), ATTRIB)
+        return marked_data
+
+    def mark_period_data(self, period_data):
+        "Return a copy of period_data with markers for the values which do not change the structure."
+        marked_period_data = []
+        for (i, pdata) in enumerate(period_data):
+            marked = pdata.copy()
+            for key in PERIOD_KEYS:
+                if key not in pdata:
+                    continue
+                if key == 'presentationTimeOffset' and (not pdata[key] or str(pdata[key]) == "0"):
+                    continue
+                if key == 'startNumber' and str(pdata[key]) == '-1':
+                    continue
+                marked[key] = self.slot(('period', i, key), ATTRIB)
+            marked_period_data.append(marked)
+        return marked_period_data
+
+    def compile(self, data, period_data):
+        "Process the MPD with markers and return the template."
+        self.process(self.mark_data(data), self.mark_period_data(period_data))
+        return MpdTemplate(self.get_full_xml(), self.slots)
+
+    def modify_baseurl(self, baseurl_elem, new_baseurl):
+        "Modify the text of an existing BaseURL"
+        baseurl_elem.text = self.slot(('data', 'BaseURL'), TEXT)
+
+    def make_baseurls(self, data):
+        "Make markers for the BaseURLs."
+        return [self.slot(('baseurl', i), TEXT) for i in range(len(make_baseurls(data)))]
+
+    def make_publish_time(self):
+        "Make a marker for the publishTime."
+        return self.slot(('publishTime',), ATTRIB)
+
+    def make_direct_utc_time(self):
+        "Make a marker for the direct UTCTiming value."
+        return self.slot(('utc_direct',), ATTRIB)
+
+    def insert_segment_timeline_entries(self, seg_timeline, content_type):
+        "Insert a marker for the S elements."
+        seg_timeline.text = self.slot(('timeline', content_type), TEXT)
+
+
+def template_key(mpd_filename, data, period_data, mpd_proc_cfg, cfg):
+    "Key with everything that influences the structure of the generated MPD."
+    stat = os.stat(mpd_filename)
+    period_structure = tuple((bool(pdata['presentationTimeOffset']), str(pdata['presentationTimeOffset']) == "0",
+                              str(pdata.get('startNumber')) == '-1') for pdata in period_data)
+    data_keys = tuple(key for key in MPD_ATTRIBUTE_KEYS if key in data)
+    nr_baseurls = 0
+    if 'BaseURL' in data and mpdprocessor.SET_BASEURL:
+        nr_baseurls = len(make_baseurls(data))
+    timescales = None
+    if mpd_proc_cfg['segtimeline']:
+        timescales = tuple(sorted((content_type, media['timescale'], media.get('dat_file'))
+                                  for (content_type, media) in cfg.media_data.items()))
+    return (mpd_filename, stat.st_mtime, stat.st_size, mpdprocessor.SET_BASEURL, 'BaseURL' in data, nr_baseurls,
+            data_keys, data['periodOffset'] >= 0, period_structure, mpd_proc_cfg['scte35Present'],
+            mpd_proc_cfg['continuous'], mpd_proc_cfg['segtimeline'], tuple(mpd_proc_cfg['utc_timing_methods']),
+            timescales, cfg.vod_cfg_dir)
+
+
+def get_template(mpd_filename, data, period_data, mpd_proc_cfg, cfg):
+    "Get a compiled template for this MPD structure. Compile it if not already done."
+    key = template_key(mpd_filename, data, period_data, mpd_proc_cfg, cfg)
+    template = _templates.get(key)
+    if template is None:
+        compiler = MpdTemplateCompiler(mpd_filename, mpd_proc_cfg, cfg)
+        template = compiler.compile(data, period_data)
+        if len(_templates) >= MAX_NR_TEMPLATES:
+            _templates.clear()
+        _templates[key] = template
+    return template
+
+
+def generate_mpd(mpd_filename, data, period_data, mpd_proc_cfg, cfg):
+    "Generate the same MPD as the MpdProcessor would, but using a compiled template."
+    template = get_template(mpd_filename, data, period_data, mpd_proc_cfg, cfg)
+    return template.render(data, period_data, mpd_proc_cfg, cfg)
+
+
+def clear_templates():
+    "Remove all compiled templates."
+    _templates.clear()
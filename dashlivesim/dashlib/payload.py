@@ -0,0 +1,167 @@
+"""Response payloads made of chunks.
+
+A ChunkedPayload is a sequence of strings, memoryviews into source buffers and FileRegions.
+Its length is known without joining the chunks, and it is written to the client chunk by chunk,
+so that a media segment is never assembled into one string on its way out.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+BLOCK_SIZE = 65536 # Max size of the strings produced when iterating over memoryviews and file regions
+
+
+class FileRegion(object):
+    "A region of a file which is read only when the payload is written."
+
+    def __init__(self, path, offset, length):
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def open(self):
+        "Open the file positioned at the region start and return a reader limited to the region."
+        return FileRegionReader(self)
+
+    def sub_region(self, start, end):
+        "Get the region for bytes start to end (exclusive) relative to this region."
+        return FileRegion(self.path, self.offset + start, end - start)
+
+    def read_all(self):
+        "Read the whole region."
+        reader = self.open()
+        try:
+            return reader.read()
+        finally:
+            reader.close()
+
+
+class FileRegionReader(object):
+    """File-like object for a FileRegion, suitable for wsgi.file_wrapper.
+
+    fileno() is provided so that servers can use sendfile() from the current position,
+    limited by the Content-Length of the response."""
+
+    def __init__(self, region):
+        self.ifh = open(region.path, "rb")
+        self.ifh.seek(region.offset)
+        self.remaining = region.length
+
+    def read(self, size=-1):
+        "Read at most size bytes (all remaining if size < 0) without passing the region end."
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.ifh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        "File number of the underlying file."
+        return self.ifh.fileno()
+
+    def close(self):
+        "Close the underlying file."
+        self.ifh.close()
+
+
+class ChunkedPayload(object):
+    """Payload consisting of strings, memoryviews and FileRegions.
+
+    etag, last_modified (seconds since epoch) and max_age (seconds) are used for the HTTP caching
+    headers. A max_age of None means that the response must not be cached."""
+
+    def __init__(self, chunks, etag=None, last_modified=None, max_age=None):
+        self.chunks = [chunk for chunk in chunks if len(chunk) > 0]
+        self.length = sum(len(chunk) for chunk in self.chunks)
+        self.etag = etag
+        self.last_modified = last_modified
+        self.max_age = max_age
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        "Iterate over the payload as strings of at most BLOCK_SIZE bytes (except for string chunks)."
+        for chunk in self.chunks:
+            if isinstance(chunk, str):
+                yield chunk
+            elif isinstance(chunk, FileRegion):
+                reader = chunk.open()
+                try:
+                    while True:
+                        block = reader.read(BLOCK_SIZE)
+                        if not block:
+                            break
+                        yield block
+                finally:
+                    reader.close()
+            else:
+                for pos in xrange(0, len(chunk), BLOCK_SIZE):
+                    yield chunk[pos:pos+BLOCK_SIZE].tobytes()
+
+    def __getitem__(self, index):
+        "Slicing gives a ChunkedPayload with only the parts of the chunks that overlap the slice."
+        if not isinstance(index, slice):
+            raise TypeError("ChunkedPayload only supports slicing")
+        start, end, step = index.indices(self.length)
+        if step != 1:
+            raise ValueError("ChunkedPayload slices must be contiguous")
+        return self.slice(start, end)
+
+    def slice(self, start, end):
+        "Get a ChunkedPayload for bytes start to end (exclusive) without copying memoryviews or reading files."
+        chunks = []
+        chunk_start = 0
+        for chunk in self.chunks:
+            chunk_end = chunk_start + len(chunk)
+            if chunk_end > start and chunk_start < end:
+                first = max(start, chunk_start) - chunk_start
+                last = min(end, chunk_end) - chunk_start
+                if isinstance(chunk, FileRegion):
+                    chunks.append(chunk.sub_region(first, last))
+                else:
+                    chunks.append(chunk[first:last])
+            if chunk_end >= end:
+                break
+            chunk_start = chunk_end
+        return ChunkedPayload(chunks)
+
+    def join(self):
+        "Get the full payload as one string."
+        return "".join(self)
+
+    def file_region(self):
+        "Return the FileRegion if the payload is just one, otherwise None."
+        if len(self.chunks) == 1 and isinstance(self.chunks[0], FileRegion):
+            return self.chunks[0]
+        return None
+
@@ -0,0 +1,204 @@
+"""Per-request phase timing.
+
+A PhaseTimer is bound to the thread handling a request. Code in the request path marks phases with
+
+    with phasetimer.phase('read'):
+        ...
+
+which is a no-op if no timer is active (e.g. for pregeneration or direct calls to dash_proxy).
+Phases can be nested, and the time is exclusive: time spent in an inner phase is not counted
+in the outer one. The result is sent as a Server-Timing header and aggregated into
+per-extension histograms in PHASE_STATS.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+
+PHASE_TIMING_ENABLED = True
+HISTOGRAM_BUCKETS_IN_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000) # Upper bounds
+TOTAL = 'total'
+KNOWN_EXTENSIONS = ('.mpd', '.m4s', '.mp4', '.jpg') # Stats for other extensions are kept as OTHER_EXT
+OTHER_EXT = 'other'
+
+_local = threading.local()
+
+
+def get_ext_label(ext):
+    "Get ext if it is a known extension, otherwise OTHER_EXT, so that clients cannot add any number of labels."
+    if ext in KNOWN_EXTENSIONS:
+        return ext
+    return OTHER_EXT
+
+
+class PhaseTimer(object):
+    "Exclusive time spent in named phases of one request."
+
+    __slots__ = ('start', 'total', 'durations', 'order', '_stack', '_current', '_next', '_mark')
+
+    def __init__(self):
+        self.start = self._mark = default_timer()
+        self.total = None
+        self.durations = {} # phase -> seconds
+        self.order = [] # Phases in the order they were first entered
+        self._stack = []
+        self._current = None
+        self._next = None
+
+    def phase(self, name):
+        "Use as: with timer.phase(name)."
+        self._next = name
+        return self
+
+    def __enter__(self):
+        now = default_timer()
+        self._charge(now)
+        self._stack.append(self._current)
+        self._current = self._next
+        self._mark = now
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        now = default_timer()
+        self._charge(now)
+        self._current = self._stack.pop()
+        self._mark = now
+        return False
+
+    def _charge(self, now):
+        "Add the time since the last mark to the current phase."
+        name = self._current
+        if name is None:
+            return
+        if name in self.durations:
+            self.durations[name] += now - self._mark
+        else:
+            self.durations[name] = now - self._mark
+            self.order.append(name)
+
+    def finish(self):
+        "Set the total time of the request."
+        self.total = default_timer() - self.start
+
+    def server_timing(self):
+        "The value of a Server-Timing header with the durations in ms."
+        entries = ["%s;dur=%.3f" % (name, 1000*self.durations[name]) for name in self.order]
+        if self.total is not None:
+            entries.append("%s;dur=%.3f" % (TOTAL, 1000*self.total))
+        return ", ".join(entries)
+
+
+class NoPhase(object):
+    "Context manager that does nothing, used when no timer is active."
+    #pylint: disable=too-few-public-methods
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NO_PHASE = NoPhase()
+
+
+def phase(name):
+    "Time a phase of the request handled by this thread, if any."
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        return NO_PHASE
+    return timer.phase(name)
+
+
+def begin_request():
+    "Start a timer for the request handled by this thread and return it."
+    timer = _local.timer = PhaseTimer()
+    return timer
+
+
+def end_request(ext):
+    "Stop the timer for this thread, add it to PHASE_STATS and return it (None if no timer)."
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        return None
+    _local.timer = None
+    timer.finish()
+    PHASE_STATS.record(ext, timer)
+    return timer
+
+
+class PhaseStats(object):
+    "Histograms of phase durations per file extension."
+
+    def __init__(self, bucket_bounds=HISTOGRAM_BUCKETS_IN_MS):
+        self.bucket_bounds = bucket_bounds
+        self._histograms = {} # (ext, phase) -> [count, sum_in_ms, bucket_counts]
+        self._lock = threading.Lock()
+
+    def record(self, ext, timer):
+        "Add the durations of a finished timer. Unknown extensions are recorded as OTHER_EXT."
+        ext = get_ext_label(ext)
+        durations = timer.durations.items()
+        if timer.total is not None:
+            durations.append((TOTAL, timer.total))
+        with self._lock:
+            for name, duration in durations:
+                histogram = self._histograms.get((ext, name))
+                if histogram is None:
+                    histogram = self._histograms[(ext, name)] = [0, 0.0, [0]*(len(self.bucket_bounds) + 1)]
+                duration_in_ms = 1000*duration
+                histogram[0] += 1
+                histogram[1] += duration_in_ms
+                histogram[2][bisect_left(self.bucket_bounds, duration_in_ms)] += 1
+
+    def snapshot(self):
+        """Get {ext: {phase: {'count', 'sum_ms', 'buckets'}}}.
+
+        buckets is a list of (upper bound in ms, count) with cumulative counts, ending with (None, count)."""
+        result = {}
+        with self._lock:
+            items = [(key, (count, sum_in_ms, list(buckets)))
+                     for (key, (count, sum_in_ms, buckets)) in self._histograms.items()]
+        for (ext, name), (count, sum_in_ms, buckets) in items:
+            cumulative = []
+            accumulated = 0
+            for bound, bucket_count in zip(self.bucket_bounds + (None,), buckets):
+                accumulated += bucket_count
+                cumulative.append((bound, accumulated))
+            result.setdefault(ext, {})[name] = {'count' : count, 'sum_ms' : sum_in_ms, 'buckets' : cumulative}
+        return result
+
+    def clear(self):
+        "Remove all recorded durations."
+        with self._lock:
+            self._histograms.clear()
+
+
+PHASE_STATS = PhaseStats()
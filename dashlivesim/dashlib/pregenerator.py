@@ -0,0 +1,209 @@
+"""Generate live media segments into the segment cache ahead of their availability.
+
+Clients at the live edge all ask for a new segment in the same second that it becomes available,
+so the generation time would otherwise be added to those requests. Every served live segment request
+registers a job for its content, representation and URL options. The scheduler thread then generates
+the following segments shortly before they become available and puts them into the segment cache.
+
+Only the generation is moved earlier. The segments are generated with the time set to their
+availability time, and requests that are too early still get an error response since the timing
+checks in the DashProvider are done before the segment cache is looked up.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+
+from . import accesslog
+
+PREGENERATION_LEAD_IN_S = 1.0 # Generate segments this long before their availability time
+JOB_IDLE_TIMEOUT_IN_S = 30 # Stop pregenerating for jobs which have not been requested for this long
+MAX_SEGMENTS_AHEAD = 1 # Number of segments to generate beyond the last requested one
+MAX_WAIT_IN_S = 1.0
+
+
+class PregenerationJob(object):
+    "The next segment to generate for one content/representation/URL-option combination."
+    #pylint: disable=too-many-instance-attributes, too-few-public-methods
+
+    def __init__(self, request, url_parts, name_format, name_value, name_step, seg_nr, seg_ast, seg_dur,
+                 time_offset):
+        self.request = request # (host_name, url_args, vod_conf_dir, content_dir, is_https, streaming)
+        self.url_parts = url_parts # URL parts without the segment file name
+        self.name_format = name_format # Format for the segment file name with one %d
+        self.name_value = name_value # Value in the name of the next segment
+        self.name_step = name_step # Increment of the value in the name per segment
+        self.seg_nr = seg_nr # Number of next segment to generate
+        self.seg_ast = seg_ast # Availability time of next segment in the time of the requests
+        self.seg_dur = seg_dur
+        self.time_offset = time_offset # Time of the requests minus wall-clock time
+        self.last_request = time.time()
+        self.last_requested_nr = seg_nr - 1
+
+    def due_time(self):
+        "Wall-clock time when the next segment should be generated."
+        lead = min(PREGENERATION_LEAD_IN_S, self.seg_dur/2.0)
+        return self.seg_ast - self.time_offset - lead
+
+    def next_url_parts(self):
+        "URL parts for the next segment."
+        return self.url_parts + [self.name_format % self.name_value]
+
+    def is_pending(self):
+        "Check if the next segment should be generated (when due), or if the clients must catch up first."
+        return self.seg_nr <= self.last_requested_nr + MAX_SEGMENTS_AHEAD
+
+    def advance(self):
+        "Move on to the segment after the next one."
+        self.seg_nr += 1
+        self.seg_ast += self.seg_dur
+        self.name_value += self.name_step
+
+    def is_idle(self, wall_now):
+        "Check if no client has requested this combination for a while."
+        return wall_now - self.last_request > max(JOB_IDLE_TIMEOUT_IN_S, 3*self.seg_dur)
+
+
+class PregenerationScheduler(object):
+    """Keep track of the active jobs and generate their next segments ahead of time.
+
+    generate(host_name, url_parts, url_args, vod_conf_dir, content_dir, now, is_https, streaming) must
+    generate the segment into the segment cache and return False if the segment could not be generated."""
+
+    def __init__(self, generate=None):
+        self.generate = generate
+        self.jobs = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.nr_generated = 0
+        self.nr_failed = 0 # Generations that raised an exception
+
+    @property
+    def running(self):
+        "Check if the scheduler thread is running."
+        return self._thread is not None
+
+    #pylint: disable=too-many-arguments
+    def register(self, key, request, url_parts, name_format, name_value, name_step, seg_nr, seg_ast, seg_dur,
+                 now):
+        """Register that segment seg_nr was served for the combination key at the (possibly simulated) time now.
+
+        The segment after it will then be generated ahead of its availability."""
+        time_offset = now - time.time()
+        with self._condition:
+            job = self.jobs.get(key)
+            if job is None or seg_nr >= job.seg_nr or abs(time_offset - job.time_offset) > job.seg_dur:
+                job = PregenerationJob(request, url_parts, name_format, name_value + name_step, name_step,
+                                       seg_nr + 1, seg_ast + seg_dur, seg_dur, time_offset)
+                self.jobs[key] = job
+                self._condition.notify()
+            else:
+                job.last_request = time.time()
+                if seg_nr > job.last_requested_nr:
+                    job.last_requested_nr = seg_nr
+                    self._condition.notify()
+
+    def run_due_jobs(self, wall_now=None):
+        "Generate the segments which are due at wall_now. Return the wall-clock time of the next due job or None."
+        if wall_now is None:
+            wall_now = time.time()
+        with self._condition:
+            for key, job in self.jobs.items():
+                if job.is_idle(wall_now):
+                    del self.jobs[key]
+            due_jobs = [(key, job) for (key, job) in self.jobs.items()
+                        if job.is_pending() and job.due_time() <= wall_now]
+        for key, job in due_jobs:
+            host_name, url_args, vod_conf_dir, content_dir, is_https, streaming = job.request
+            url_parts = job.next_url_parts()
+            try:
+                ok = self.generate(host_name, url_parts, url_args, vod_conf_dir, content_dir, job.seg_ast,
+                                   is_https, streaming)
+            except Exception, exc: #pylint: disable=broad-except
+                with self._condition:
+                    self.nr_failed += 1
+                accesslog.ACCESS_LOG.log(accesslog.make_message_record(
+                    time.time(), "/".join(url_parts), "Pregeneration failed: %s: %s" % (exc.__class__.__name__, exc)))
+                ok = False
+            with self._condition:
+                if ok:
+                    self.nr_generated += 1
+                    job.advance()
+                elif self.jobs.get(key) is job:
+                    del self.jobs[key] # For example beyond the last segment. Let new requests register again.
+        with self._condition:
+            due_times = [job.due_time() for job in self.jobs.values() if job.is_pending()]
+            return due_times and min(due_times) or None
+
+    def start(self):
+        "Start the scheduler thread."
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="SegmentPregenerator")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        "Stop the scheduler thread and wait for it."
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._thread = None
+            self.jobs.clear()
+
+    def _run(self):
+        "Main loop of the scheduler thread."
+        while True:
+            next_due = self.run_due_jobs()
+            with self._condition:
+                if self._stopping:
+                    return
+                wait_time = MAX_WAIT_IN_S
+                if next_due is not None:
+                    wait_time = min(max(next_due - time.time(), 0), MAX_WAIT_IN_S)
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+
+
+SCHEDULER = PregenerationScheduler()
+
+
+def start(generate):
+    "Start the scheduler of this process with the generate function (dash_proxy.pregenerate_segment)."
+    SCHEDULER.generate = generate
+    SCHEDULER.start()
@@ -0,0 +1,75 @@
+"""Preload shared state before serving.
+
+Loading the content configs, compiling the MPD templates, reading the segment timelines and
+generating the init segments up front moves that work out of the first requests. In the pre-fork
+server it is done in the parent process, so the loaded state is shared copy-on-write by the workers.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import time
+
+from . import dash_proxy
+from . import initcache
+from .configprocessor import VOD_CONFIG_CATALOG
+from .segmenttimeline import get_timeline_index
+
+
+def preload(vod_conf_dir, content_dir, now=None):
+    "Preload configs, segment timelines, MPD templates and init segments. Return a dict with counts."
+    if now is None:
+        now = time.time()
+    counts = {'configs' : 0, 'timelines' : 0, 'mpds' : 0, 'init_segments' : 0}
+    for cfg_name in sorted(os.listdir(vod_conf_dir)):
+        content_name, ext = os.path.splitext(cfg_name)
+        if ext != ".cfg":
+            continue
+        vod_cfg = VOD_CONFIG_CATALOG.get(os.path.join(vod_conf_dir, cfg_name))
+        counts['configs'] += 1
+        for media_data in vod_cfg.media_data.values():
+            dat_file = media_data.get('dat_file')
+            if dat_file and os.path.exists(os.path.join(vod_conf_dir, dat_file)):
+                get_timeline_index(os.path.join(vod_conf_dir, dat_file))
+                counts['timelines'] += 1
+        content_path = os.path.join(content_dir, content_name)
+        if not os.path.isdir(content_path):
+            continue
+        for file_name in sorted(os.listdir(content_path)):
+            if os.path.splitext(file_name)[1] != ".mpd":
+                continue
+            url_parts = ['preload', content_name, file_name]
+            try:
+                dash_proxy.handle_request("localhost", url_parts, None, vod_conf_dir, content_dir, now)
+                counts['mpds'] += 1
+            except Exception: #pylint: disable=broad-except
+                pass # Some MPDs need URL options to be served. They are compiled on first request instead.
+    counts['init_segments'] = initcache.preload(vod_conf_dir, content_dir)
+    return counts
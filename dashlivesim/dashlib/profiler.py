@@ -0,0 +1,177 @@
+"""Sampling profiler for production requests.
+
+When enabled, DashProvider.handle_request runs every Nth request under cProfile. If a slow
+threshold is set, a request that is slower than the threshold makes the next request with the
+same extension be profiled. A request cannot be profiled after the fact, and a profile of a request
+of the same type is a good proxy for it.
+
+The profiles are aggregated into pstats.Stats per extension over a rolling window. Extensions other
+than those in phasetimer.KNOWN_EXTENSIONS share one window. The current window
+is written to a pstats file per extension in the profile directory (at most every DUMP_INTERVAL_IN_S),
+so it can be loaded with pstats or snakeviz, and the top functions can be viewed with top().
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+from cStringIO import StringIO
+from timeit import default_timer
+
+from .phasetimer import get_ext_label
+
+PROFILE_PATH = "/profile"
+WINDOW_IN_S = 600 # The stats are restarted after this time
+DUMP_INTERVAL_IN_S = 10
+DEFAULT_SORT = 'cumulative'
+MAX_TOP_FUNCTIONS = 200 # Upper limit on the number of functions listed by top()
+SORT_KEYS = ('calls', 'cumulative', 'tottime', 'ncalls', 'time')
+
+
+class ProfileWindow(object):
+    "Aggregated stats for one extension during one window."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, profile, now):
+        self.start = now
+        self.stats = pstats.Stats(profile)
+        self.nr_samples = 1
+        self.last_dump = None
+
+
+class SamplingProfiler(object):
+    "Profile a sample of the requests and aggregate the results per extension."
+
+    def __init__(self):
+        self.every_n = 0
+        self.slower_than = None # In seconds
+        self.directory = None
+        self.nr_requests = 0
+        self._profile_next = set() # Extensions for which the next request is profiled
+        self._windows = {} # ext -> ProfileWindow
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        "Is any sampling configured."
+        return self.every_n > 0 or self.slower_than is not None
+
+    def configure(self, every_n=0, slower_than_in_ms=None, directory=None):
+        "Profile every every_n request and the request after one slower than slower_than_in_ms."
+        self.every_n = every_n
+        self.slower_than = None
+        if slower_than_in_ms is not None:
+            self.slower_than = slower_than_in_ms/1000.0
+        self.directory = directory
+        if directory is not None and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def run(self, ext, func):
+        "Run func(), profiled if this request is sampled, and return its result. Can be called from any thread."
+        ext = get_ext_label(ext)
+        with self._lock:
+            self.nr_requests += 1
+            sampled = self.every_n > 0 and self.nr_requests % self.every_n == 0
+            if not sampled and ext in self._profile_next:
+                self._profile_next.discard(ext)
+                sampled = True
+        if not sampled:
+            if self.slower_than is None:
+                return func()
+            start = default_timer()
+            result = func()
+            if default_timer() - start > self.slower_than:
+                with self._lock:
+                    self._profile_next.add(ext)
+            return result
+        profile = cProfile.Profile()
+        result = profile.runcall(func)
+        self.add(ext, profile)
+        return result
+
+    def add(self, ext, profile):
+        "Add a finished profile to the window of ext. The stats file is written outside the lock."
+        ext = get_ext_label(ext)
+        profile.create_stats()
+        now = time.time()
+        snapshot = None
+        with self._lock:
+            window = self._windows.get(ext)
+            if window is None or now - window.start > WINDOW_IN_S:
+                window = self._windows[ext] = ProfileWindow(profile, now)
+            else:
+                window.stats.add(profile)
+                window.nr_samples += 1
+            if self.directory is not None and (window.last_dump is None or
+                                               now - window.last_dump > DUMP_INTERVAL_IN_S):
+                snapshot = marshal.dumps(window.stats.stats) # What pstats.Stats.dump_stats writes
+                window.last_dump = now
+        if snapshot is not None:
+            with open(self.stats_file(ext), "wb") as ofh:
+                ofh.write(snapshot)
+
+    def stats_file(self, ext):
+        "The pstats file for ext."
+        return os.path.join(self.directory, "profile%s.pstats" % (ext.replace(".", "_") or "_none"))
+
+    def nr_samples(self, ext):
+        "Number of profiled requests with ext in the current window."
+        window = self._windows.get(get_ext_label(ext))
+        return window and window.nr_samples or 0
+
+    def top(self, ext, nr_functions=20, sort=DEFAULT_SORT):
+        "Get the top functions for ext as pstats text."
+        if sort not in SORT_KEYS:
+            sort = DEFAULT_SORT
+        ext = get_ext_label(ext)
+        with self._lock:
+            window = self._windows.get(ext)
+            if window is None:
+                return "No profiled requests for '%s'\n" % ext
+            output = StringIO()
+            output.write("%d profiled requests for '%s' since %s\n" %
+                         (window.nr_samples, ext, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(window.start))))
+            window.stats.stream = output
+            window.stats.sort_stats(sort).print_stats(nr_functions)
+        return output.getvalue()
+
+    def clear(self):
+        "Remove all aggregated stats and reset the request counter."
+        with self._lock:
+            self._windows.clear()
+            self._profile_next.clear()
+            self.nr_requests = 0
+
+
+SAMPLER = SamplingProfiler()
@@ -0,0 +1,89 @@
+"""Cache of generated live media segments.
+
+For a given source segment and the URL options that affect the bytes, the generated live segment is
+always the same. The cache keeps the finished segments so that many clients requesting the segment
+at the live edge only cost one generation. Entries expire when the segment has left the
+timeShiftBufferDepth window, and the total size of the cached segments is bounded.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+from .lrucache import LRUCache
+from . import mediasegmentfilter
+from .httpcaching import make_etag
+
+SEGMENT_CACHE_ENABLED = True
+SEGMENT_CACHE_MAX_BYTES = 128*1024*1024
+
+
+# pylint: disable=too-many-arguments
+def make_segment_key(content_dir, cfg, vod_nr, seg_nr, seg_ext, offset_at_loop_start, lmsg):
+    "Make a key from everything that determines the bytes of a generated media segment."
+    reps = tuple((rep['id'], rep['content_type'], rep['timescale']) for rep in cfg.reps)
+    return (content_dir, cfg.content_name, cfg.rel_path, reps, vod_nr, seg_nr, seg_ext, offset_at_loop_start,
+            lmsg, cfg.seg_duration, cfg.scte35_per_minute, mediasegmentfilter.KEEP_SIDX)
+
+
+def make_segment_etag(segment_key):
+    "Make an ETag for the segment with segment_key. Equal keys give equal bytes, so no hashing of the data is needed."
+    return make_etag(repr(segment_key))
+
+
+class SegmentCache(object):
+    """Byte-bounded cache of (segment_data, tfdt_value) with expiry times in the (possibly simulated) time.
+
+    segment_data is a string or a ChunkedPayload. The DashProvider adds whether the segment is chunked
+    to the key from make_segment_key."""
+
+    def __init__(self, max_bytes=SEGMENT_CACHE_MAX_BYTES):
+        self.lru = LRUCache(max_bytes)
+
+    def get(self, key, now):
+        "Get (segment_data, tfdt_value) for key or None if not present or expired at now."
+        return self.lru.get(key, now)
+
+    def put(self, key, data, tfdt_value, expires=None):
+        "Store a generated segment until expires (None means only evicted when out of space)."
+        self.lru.put(key, (data, tfdt_value), len(data), expires)
+
+    def remove_expired(self, now):
+        "Remove all segments that have expired at now."
+        self.lru.remove_expired(now)
+
+    def clear(self):
+        "Remove all segments and reset counters."
+        self.lru.clear()
+
+    def stats(self):
+        "Get counters and size for the cache."
+        return self.lru.stats()
+
+
+SEGMENT_CACHE = SegmentCache()
@@ -163,14 +163,17 @@ class MediaSegmentStructure(MP4Filter):
             path = boxtype
         else:
             path = "%s.%s" % (path, boxtype)
-        output = ""
         if path in ("moof", "moof.traf"): # Go deeper
-            output += data[:8]
+            children = [data[:8]]
+            output_size = 8
             pos = 8
             while pos < len(data):
                 size, boxtype = self.check_box(data[pos:pos+8])
-                output += self.filter_box(boxtype, data[pos:pos+size], file_pos + len(output), path)
+                child = self.filter_box(boxtype, data[pos:pos+size], file_pos + output_size, path)
+                children.append(child)
+                output_size += len(child)
                 pos += size
+            output = "".join(children)
         else:
             output = data
         return output
@@ -0,0 +1,311 @@
+"""Precomputed patch plans for media segments.
+
+The MediaSegmentFilter parses every box of a segment for each request, although only a few
+fields change: the styp brands (lmsg), the mfhd sequence number, the tfdt baseMediaDecodeTime and,
+when the tfdt must grow to 64 bits, the moof, traf and tfdt sizes and the trun data offsets.
+A SegmentPatchPlan finds these positions once per VoD segment and prepares the moof both with a 32-bit
+and a 64-bit tfdt, so that producing a live segment is a matter of copying the moof, writing two
+integers and concatenating the parts.
+
+The output is byte-identical to that of the MediaSegmentFilter. It can also be produced as a
+ChunkedPayload, where the boxes after moof (normally just mdat) are a memoryview into the source data
+or, if the source cache is disabled, a region of the source file. Segments with a layout that the plan
+does not handle (e.g. several moof or traf boxes, or TTML) are left to the MediaSegmentFilter.
+
+A plan does not keep the source data, which is owned by the source cache. The plan cache thus only
+holds the parts made by the plans, and its size does not depend on the size of the segments.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+
+from .lrucache import LRUCache
+from .mediasegmentfilter import get_styp_brands, make_styp, create_scte35box
+from . import mediasegmentfilter
+from . import sourcecache
+from . import phasetimer
+from .payload import ChunkedPayload, FileRegion
+from .structops import str_to_uint32, uint32_to_str, str_to_sint32, sint32_to_str, str_to_uint64, uint64_to_str
+
+PATCH_PLAN_CACHE_MAX_BYTES = 16*1024*1024 # Plans hold the moof variants, the source data is in the source cache
+
+MAX_TFDT_32 = 4294967296
+
+
+class SegmentPatchPlanError(Exception):
+    "The segment has a layout that cannot be handled by a patch plan."
+
+
+def _iter_boxes(data, start, end):
+    "Iterate over (pos, size, boxtype) for the boxes in data[start:end]."
+    pos = start
+    while pos < end:
+        if end - pos < 8:
+            raise SegmentPatchPlanError("Truncated box header at %d" % pos)
+        size = str_to_uint32(data[pos:pos+4])
+        if size < 8 or pos + size > end:
+            raise SegmentPatchPlanError("Bad box size %d at %d" % (size, pos))
+        yield (pos, size, data[pos+4:pos+8])
+        pos += size
+
+
+class SegmentPatchPlan(object):
+    "Positions and precomputed moof variants for producing live versions of one VoD media segment."
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, data, path=None):
+        self.path = path # Used to read the tail from the file if no data is given when applying the plan
+        self.head = "" # Boxes before styp
+        self.brands = None # styp brands without lmsg. None if no styp
+        self.middle = "" # Boxes between styp and moof (sidx removed)
+        self.has_sidx = False
+        self.tail_offset = None # Start of the verbatim boxes after moof
+        self.tail_size = None
+        self.seq_nr_pos = None # Position of mfhd sequence_number in moof
+        self.tfdt_pos = None # Position of baseMediaDecodeTime in moof
+        self.base_media_decode_time = None
+        self.moof_32 = None # moof with 32-bit tfdt. None if source tfdt is 64-bit
+        self.moof_64 = None # moof with 64-bit tfdt
+        self.parse(data)
+
+    def parse(self, data):
+        "Parse the top-level boxes and the moof."
+        moof = None
+        for (pos, size, boxtype) in _iter_boxes(data, 0, len(data)):
+            if moof is not None:
+                if boxtype in ("styp", "sidx", "moof"):
+                    raise SegmentPatchPlanError("Unsupported %s box after moof" % boxtype)
+                continue
+            box = data[pos:pos+size]
+            if boxtype == "styp":
+                if self.brands is not None:
+                    raise SegmentPatchPlanError("More than one styp box")
+                self.brands = get_styp_brands(box)
+            elif boxtype == "sidx":
+                self.has_sidx = True
+            elif boxtype == "moof":
+                moof = box
+                self.tail_offset = pos + size
+                self.tail_size = len(data) - self.tail_offset
+            elif self.brands is None:
+                self.head += box
+            else:
+                self.middle += box
+        if moof is None:
+            raise SegmentPatchPlanError("No moof box")
+        self.parse_moof(moof)
+
+    def parse_moof(self, moof):
+        "Find mfhd, traf and tfdt in moof and make the 32-bit and 64-bit variants."
+        traf_pos = None
+        for (pos, size, boxtype) in _iter_boxes(moof, 8, len(moof)):
+            if boxtype == "mfhd":
+                if size != 16:
+                    raise SegmentPatchPlanError("Unexpected mfhd size %d" % size)
+                self.seq_nr_pos = pos + 12
+            elif boxtype == "traf":
+                if traf_pos is not None:
+                    raise SegmentPatchPlanError("More than one traf box")
+                traf_pos = pos
+        if traf_pos is None:
+            raise SegmentPatchPlanError("No traf box")
+        traf_end = traf_pos + str_to_uint32(moof[traf_pos:traf_pos+4])
+        tfdt_pos = None
+        trun_positions = []
+        for (pos, size, boxtype) in _iter_boxes(moof, traf_pos + 8, traf_end):
+            if boxtype == "tfdt":
+                if tfdt_pos is not None:
+                    raise SegmentPatchPlanError("More than one tfdt box")
+                tfdt_pos = pos
+            elif boxtype == "trun" and tfdt_pos is not None:
+                trun_positions.append(pos)
+        if tfdt_pos is None:
+            raise SegmentPatchPlanError("No tfdt box")
+        self.tfdt_pos = tfdt_pos + 12
+        version = ord(moof[tfdt_pos+8])
+        if version == 1:
+            self.base_media_decode_time = str_to_uint64(moof[tfdt_pos+12:tfdt_pos+20])
+            self.moof_64 = moof
+            return
+        self.base_media_decode_time = str_to_uint32(moof[tfdt_pos+12:tfdt_pos+16])
+        self.moof_32 = moof
+        self.moof_64 = self.make_moof_64(moof, traf_pos, tfdt_pos, trun_positions)
+
+    def make_moof_64(self, moof, traf_pos, tfdt_pos, trun_positions):
+        "Make a moof with the 32-bit tfdt at tfdt_pos changed to 64-bit, as the MediaSegmentFilter does."
+        # pylint: disable=no-self-use
+        def grow_size(box_pos):
+            "Get size field of box at box_pos increased by 4."
+            return uint32_to_str(str_to_uint32(moof[box_pos:box_pos+4]) + 4)
+
+        parts = [grow_size(0), moof[4:traf_pos], grow_size(traf_pos), moof[traf_pos+4:tfdt_pos],
+                 grow_size(tfdt_pos), moof[tfdt_pos+4:tfdt_pos+8], chr(1), moof[tfdt_pos+9:tfdt_pos+12],
+                 uint64_to_str(self.base_media_decode_time)]
+        pos = tfdt_pos + 16
+        for trun_pos in trun_positions:
+            flags = str_to_uint32(moof[trun_pos+8:trun_pos+12]) & 0xffffff
+            if flags & 0x1: # Data offset present
+                parts.append(moof[pos:trun_pos+16])
+                parts.append(sint32_to_str(str_to_sint32(moof[trun_pos+16:trun_pos+20]) + 4))
+                pos = trun_pos + 20
+        parts.append(moof[pos:])
+        return "".join(parts)
+
+    # pylint: disable=too-many-arguments
+    def apply(self, data, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute):
+        """Produce the live segment from the source data. Return (data, tfdt_value) like the MediaSegmentFilter would.
+
+        If data is None, the boxes after moof are read from the file."""
+        header, tfdt_value = self.make_header(seg_nr, seg_duration, offset, lmsg, track_timescale,
+                                              scte35_per_minute)
+        if data is not None:
+            tail = data[self.tail_offset:]
+        else:
+            tail = FileRegion(self.path, self.tail_offset, self.tail_size).read_all()
+        return (header + tail, tfdt_value)
+
+    def apply_chunks(self, data, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute):
+        "Produce the live segment as (ChunkedPayload, tfdt_value) without copying the data after moof."
+        header, tfdt_value = self.make_header(seg_nr, seg_duration, offset, lmsg, track_timescale,
+                                              scte35_per_minute)
+        if data is not None:
+            tail = memoryview(data)[self.tail_offset:]
+        else:
+            tail = FileRegion(self.path, self.tail_offset, self.tail_size)
+        return (ChunkedPayload([header, tail]), tfdt_value)
+
+    def make_header(self, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute):
+        "Make all output up to and including moof. Return (header, tfdt_value)."
+        if track_timescale is not None:
+            tfdt_offset = offset*track_timescale
+        else:
+            tfdt_offset = 0
+        tfdt_value = self.base_media_decode_time + tfdt_offset
+        if self.moof_32 is not None and tfdt_value < MAX_TFDT_32:
+            moof = bytearray(self.moof_32)
+            moof[self.tfdt_pos:self.tfdt_pos+4] = uint32_to_str(tfdt_value)
+        else:
+            moof = bytearray(self.moof_64)
+            moof[self.tfdt_pos:self.tfdt_pos+8] = uint64_to_str(tfdt_value)
+        if seg_nr is not None:
+            moof[self.seq_nr_pos:self.seq_nr_pos+4] = uint32_to_str(seg_nr)
+        parts = [self.head]
+        if self.brands is not None:
+            parts.append(make_styp(self.brands, lmsg))
+            parts.append(create_scte35box(seg_nr, seg_duration, scte35_per_minute))
+        parts.append(self.middle)
+        parts.append(str(moof))
+        return ("".join(parts), tfdt_value)
+
+    def plan_size(self):
+        "Approximate number of bytes held by the plan (the source data is not kept)."
+        return len(self.head) + len(self.middle) + len(self.moof_32 or "") + len(self.moof_64) + 256
+
+
+class SegmentPatchPlanCache(object):
+    """Cache of patch plans per segment file.
+
+    A plan is validated against the mtime and size of the file. With the source cache enabled, these are
+    the ones of the cached data, so reloading a changed file also results in a new plan."""
+
+    def __init__(self, max_bytes=PATCH_PLAN_CACHE_MAX_BYTES):
+        self.lru = LRUCache(max_bytes)
+
+    def get_plan(self, path):
+        """Get (plan, data) for the segment at path. plan is None if the segment cannot be handled by a plan.
+
+        data is the source data from the source cache, or None if the source cache is disabled."""
+        if sourcecache.SOURCE_CACHE_ENABLED:
+            data, signature = sourcecache.read_file_with_signature(path)
+        else:
+            data = None
+            signature = _file_signature(path)
+        entry = self.lru.get(path)
+        if entry is not None and entry[0] == signature:
+            return (entry[1], data)
+        source = data
+        if source is None:
+            with phasetimer.phase('read'):
+                with open(path, "rb") as ifh:
+                    source = ifh.read()
+        try:
+            plan = SegmentPatchPlan(source, path)
+            size = plan.plan_size()
+        except SegmentPatchPlanError:
+            plan = None
+            size = 256
+        self.lru.put(path, (signature, plan), size)
+        return (plan, data)
+
+    def clear(self):
+        "Remove all plans."
+        self.lru.clear()
+
+    def stats(self):
+        "Get counters and size for the cache."
+        return self.lru.stats()
+
+
+PATCH_PLAN_CACHE = SegmentPatchPlanCache()
+
+
+def _file_signature(path):
+    "Get (mtime, size) for path."
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+
+def _get_usable_plan(path):
+    "Get (plan, data) for path, with plan None if it cannot be used with the current settings."
+    plan, data = PATCH_PLAN_CACHE.get_plan(path)
+    if plan is not None and plan.has_sidx and mediasegmentfilter.KEEP_SIDX:
+        plan = None
+    return (plan, data)
+
+
+# pylint: disable=too-many-arguments
+def patch_media_segment(path, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute):
+    """Produce a live media segment from the VoD segment at path using a patch plan.
+
+    Return (data, tfdt_value) or None if the MediaSegmentFilter must be used instead."""
+    plan, data = _get_usable_plan(path)
+    if plan is None:
+        return None
+    return plan.apply(data, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute)
+
+
+def patch_media_segment_chunks(path, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute):
+    """Like patch_media_segment, but return (ChunkedPayload, tfdt_value) or None."""
+    plan, data = _get_usable_plan(path)
+    if plan is None:
+        return None
+    return plan.apply_chunks(data, seg_nr, seg_duration, offset, lmsg, track_timescale, scte35_per_minute)
@@ -0,0 +1,272 @@
+"""Index of segment durations for SegmentTimeline generation.
+
+The .dat file of a content (see vodanalyzer) has one SEGTIMEFORMAT entry per run of equal-duration
+segments. It is loaded once into arrays, together with precomputed end times and cumulative
+segment counts, and shared by all requests (and by worker processes forked after loading).
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import bisect
+import os
+import time
+from array import array
+from struct import calcsize, unpack_from
+
+from .configprocessor import SEGTIMEFORMAT, SegTimeEntry, VOD_CONFIG_REVALIDATE_INTERVAL_IN_S
+
+WRAP_DURATION_IN_S = 3600 # The VoD content is looped every hour
+
+ENTRY_SIZE = calcsize(SEGTIMEFORMAT)
+
+_indexes = {} # dat_file_path -> [signature, last_check_time, index]
+
+
+class SegmentTimelineIndexError(Exception):
+    "Error in segment timeline index."
+
+
+def render_s_element(start_time, duration, repeat):
+    "Render one S element exactly as the ElementTree serialization of it."
+    attribs = ' d="%s"' % duration
+    if repeat > 0:
+        attribs += ' r="%s"' % repeat
+    if start_time is not None:
+        attribs += ' t="%s"' % start_time
+    return '<S%s />\n' % attribs
+
+
+class SegmentTimelineIndex(object):
+    "Array-backed table of segment runs with start times in the timescale of the track."
+
+    def __init__(self, dat_file_path):
+        self.dat_file_path = dat_file_path
+        with open(dat_file_path, "rb") as ifh:
+            data = ifh.read()
+        if len(data) % ENTRY_SIZE != 0:
+            raise SegmentTimelineIndexError("Bad size %d of %s" % (len(data), dat_file_path))
+        self.start_nrs = array('L')
+        self.repeats = array('L')
+        self.start_times = array('L') # Start time of each run relative to the wrap start
+        self.durations = array('L')
+        self.end_times = array('L') # End time of each run relative to the wrap start
+        self.segment_counts = array('L') # Number of segments before each run
+        nr_segments = 0
+        for pos in range(0, len(data), ENTRY_SIZE):
+            start_nr, repeats, start_time, duration = unpack_from(SEGTIMEFORMAT, data, pos)
+            self.start_nrs.append(start_nr)
+            self.repeats.append(repeats)
+            self.start_times.append(start_time)
+            self.durations.append(duration)
+            self.end_times.append(start_time + (repeats + 1)*duration)
+            self.segment_counts.append(nr_segments)
+            nr_segments += repeats + 1
+        self.nr_segments = nr_segments
+        self._rendered_wrap = None # (text, offsets) with the S elements of all runs. Made when first needed
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def entry(self, index):
+        "Get entry number index as a SegTimeEntry."
+        return SegTimeEntry(self.start_nrs[index], self.repeats[index], self.start_times[index],
+                            self.durations[index])
+
+    def find_latest_starting_before(self, act_time, wrap_duration):
+        """Find the latest segment starting before act_time. Return (index, repeats, nr_wraps).
+
+        A segment ending exactly at act_time is counted as the latest one. In a gap after a run,
+        repeats is one more than the repeats of the run."""
+        nr_wraps = act_time // wrap_duration
+        if nr_wraps < 0:
+            return (None, None, None)# This is before AST
+        rel_time = act_time - nr_wraps * wrap_duration
+        index = bisect.bisect(self.start_times, rel_time) - 1
+        (repeats, remainder) = divmod(rel_time - self.start_times[index], self.durations[index])
+        if remainder == 0:
+            repeats -= 1
+        return (index, max(repeats, 0), nr_wraps)
+
+    def find_repeats_ending_before(self, act_time, index, nr_wraps, wrap_duration):
+        "Find the repeats of the latest segment in entry index ending before act_time. Limited to the run."
+        rel_time = act_time - nr_wraps * wrap_duration
+        repeats = (rel_time - self.start_times[index]) // self.durations[index] - 1
+        return min(max(repeats, 0), self.repeats[index])
+
+    def timeline_window(self, now, tsbd, timescale):
+        """Find the first and last segment of a SegmentTimeline covering [now-tsbd, now].
+
+        The first segment is the latest starting before now-tsbd and the last is the latest ending before now.
+        Returns (start_pos, start_repeats, end_pos, end_repeats) where a position is nr_wraps*len(self) + index,
+        or None if no segment has ended yet."""
+        start = max(now - tsbd, 0)*timescale
+        end = now*timescale
+        wrap_duration = WRAP_DURATION_IN_S*timescale
+        (end_index, end_repeats, end_wraps) = self.find_latest_starting_before(end, wrap_duration)
+        if end_index is None:
+            return None
+        if end_repeats > 0:
+            end_repeats -= 1  # Just move one segment back in the repeat
+        else:
+            if end_index > 0:
+                end_index -= 1
+            else:
+                end_wraps -= 1
+                if end_wraps < 0:
+                    return None
+                end_index = len(self) - 1
+            end_repeats = self.find_repeats_ending_before(end, end_index, end_wraps, wrap_duration)
+        end_pos = end_wraps*len(self) + end_index
+
+        (start_index, start_repeats, start_wraps) = self.find_latest_starting_before(start, wrap_duration)
+        start_pos = start_wraps*len(self) + start_index
+        if start_repeats > self.repeats[start_index]: # In a gap. Start with the next run
+            start_pos += 1
+            start_repeats = 0
+        if (start_pos, start_repeats) > (end_pos, end_repeats): # Window shorter than a segment
+            (start_pos, start_repeats) = (end_pos, end_repeats)
+        return (start_pos, start_repeats, end_pos, end_repeats)
+
+    def first_entry(self, window, timescale):
+        "Get the (start_time, duration, repeat) entry for the first run of window."
+        (start_pos, start_repeats, end_pos, end_repeats) = window
+        (nr_wraps, index) = divmod(start_pos, len(self))
+        duration = self.durations[index]
+        start_time = nr_wraps*WRAP_DURATION_IN_S*timescale + self.start_times[index] + start_repeats*duration
+        if start_pos == end_pos:
+            return (start_time, duration, end_repeats - start_repeats)
+        return (start_time, duration, self.repeats[index] - start_repeats)
+
+    def timeline_entries(self, now, tsbd, timescale):
+        """Get the S entries for a SegmentTimeline covering [now-tsbd, now].
+
+        Returns a list of (start_time, duration, repeat) where start_time is only set (not None) for the
+        first entry."""
+        window = self.timeline_window(now, tsbd, timescale)
+        if window is None:
+            return []
+        (start_pos, _, end_pos, end_repeats) = window
+        entries = [self.first_entry(window, timescale)]
+        for pos in range(start_pos + 1, end_pos):
+            index = pos % len(self)
+            entries.append((None, self.durations[index], self.repeats[index]))
+        if end_pos > start_pos:
+            entries.append((None, self.durations[end_pos % len(self)], end_repeats))
+        return entries
+
+    def render_timeline(self, now, tsbd, timescale):
+        """Get the S elements for a SegmentTimeline covering [now-tsbd, now] as text.
+
+        Only the first and the last run depend on the window. The runs in between are sliced out of the
+        rendered wrap, so the work per request does not grow with the number of runs in the window."""
+        window = self.timeline_window(now, tsbd, timescale)
+        if window is None:
+            return ""
+        (start_pos, _, end_pos, end_repeats) = window
+        parts = [render_s_element(*self.first_entry(window, timescale))]
+        if end_pos > start_pos:
+            parts.extend(self.rendered_runs(start_pos + 1, end_pos))
+            parts.append(render_s_element(None, self.durations[end_pos % len(self)], end_repeats))
+        return "".join(parts)
+
+    def rendered_runs(self, first_pos, end_pos):
+        "Get the rendered S elements of the full runs at positions [first_pos, end_pos) as a list of strings."
+        if self._rendered_wrap is None:
+            offsets = array('L', [0])
+            texts = []
+            for index in range(len(self)):
+                texts.append(render_s_element(None, self.durations[index], self.repeats[index]))
+                offsets.append(offsets[-1] + len(texts[-1]))
+            self._rendered_wrap = ("".join(texts), offsets)
+        (wrap_text, offsets) = self._rendered_wrap
+        (first_wraps, first_index) = divmod(first_pos, len(self))
+        (end_wraps, end_index) = divmod(end_pos, len(self))
+        if first_wraps == end_wraps:
+            return [wrap_text[offsets[first_index]:offsets[end_index]]]
+        return [wrap_text[offsets[first_index]:], wrap_text*(end_wraps - first_wraps - 1),
+                wrap_text[:offsets[end_index]]]
+
+    def segments_in_window(self, start, end, timescale):
+        """Find the segments covering the window [start, end] (in timescale units).
+
+        Returns a list of runs (start_time, duration, nr_segments) with absolute start times.
+        The first run starts with the segment containing start and the last run ends with
+        the segment containing end."""
+        if end < start:
+            return []
+        wrap_duration = WRAP_DURATION_IN_S*timescale
+        (index, repeats, nr_wraps) = self.find_latest_starting_before(max(start, 0), wrap_duration)
+        if index is None:
+            return []
+        runs = []
+        while True:
+            duration = self.durations[index]
+            run_start = nr_wraps*wrap_duration + self.start_times[index] + repeats*duration
+            if run_start > end:
+                break
+            nr_segments = self.repeats[index] + 1 - repeats
+            if nr_segments > 0:
+                last_needed = (end - run_start)//duration + 1
+                runs.append((run_start, duration, min(nr_segments, last_needed)))
+                if last_needed <= nr_segments:
+                    break
+            index += 1
+            repeats = 0
+            if index == len(self):
+                index = 0
+                nr_wraps += 1
+        return runs
+
+
+def get_timeline_index(dat_file_path):
+    "Get the shared index for dat_file_path. Load it if it is new or the file has changed."
+    entry = _indexes.get(dat_file_path)
+    now = time.time()
+    if entry is not None:
+        if now - entry[1] < VOD_CONFIG_REVALIDATE_INTERVAL_IN_S:
+            return entry[2]
+        if entry[0] == _file_signature(dat_file_path):
+            entry[1] = now
+            return entry[2]
+    signature = _file_signature(dat_file_path)
+    index = SegmentTimelineIndex(dat_file_path)
+    _indexes[dat_file_path] = [signature, now, index]
+    return index
+
+
+def clear_timeline_indexes():
+    "Remove all loaded indexes."
+    _indexes.clear()
+
+
+def _file_signature(path):
+    "Get (mtime, size) for path."
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
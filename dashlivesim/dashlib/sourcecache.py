@@ -0,0 +1,116 @@
+"""Cache of source file bytes.
+
+Near the live edge, many clients fetch the same VoD segment within a few seconds. The MP4 filters
+read their input through this cache, which keeps recently used files in memory within a byte budget
+and invalidates them when the mtime or size of the file changes.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import time
+
+from .lrucache import LRUCache
+from . import phasetimer
+
+SOURCE_CACHE_ENABLED = True
+SOURCE_CACHE_MAX_BYTES = 256*1024*1024
+SOURCE_CACHE_REVALIDATE_INTERVAL_IN_S = 1.0 # How often a cached file is checked against the file on disk
+
+
+class SourceFileCache(object):
+    "Read-through cache of file contents with LRU eviction and mtime-based invalidation."
+
+    def __init__(self, max_bytes=SOURCE_CACHE_MAX_BYTES, revalidate_interval=SOURCE_CACHE_REVALIDATE_INTERVAL_IN_S):
+        self.revalidate_interval = revalidate_interval
+        self.lru = LRUCache(max_bytes)
+        self.invalidations = 0
+
+    def read(self, path):
+        "Get the contents of the file at path."
+        return self.read_with_signature(path)[0]
+
+    def read_with_signature(self, path):
+        "Get (contents, (mtime, size)) for the file at path. The signature is that of the cached contents."
+        now = time.time()
+        entry = self.lru.get(path)
+        if entry is not None:
+            signature, last_check, data = entry
+            if now - last_check < self.revalidate_interval:
+                return (data, signature)
+            if _file_signature(path) == signature:
+                self.lru.put(path, (signature, now, data), len(data))
+                return (data, signature)
+            self.invalidations += 1
+            self.lru.remove(path)
+        signature = _file_signature(path)
+        with open(path, "rb") as ifh:
+            data = ifh.read()
+        self.lru.put(path, (signature, now, data), len(data))
+        return (data, signature)
+
+    def is_cached(self, path):
+        "Check if path is in the cache (without revalidating)."
+        return path in self.lru
+
+    def clear(self):
+        "Remove all cached files and reset counters."
+        self.lru.clear()
+        self.invalidations = 0
+
+    def stats(self):
+        "Get counters and size for the cache."
+        stats = self.lru.stats()
+        stats['invalidations'] = self.invalidations
+        return stats
+
+
+def _file_signature(path):
+    "Get (mtime, size) for path."
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+
+SOURCE_FILE_CACHE = SourceFileCache()
+
+
+def read_file_with_signature(path):
+    "Read the file at path through the source cache. Return (data, (mtime, size))."
+    with phasetimer.phase('read'):
+        return SOURCE_FILE_CACHE.read_with_signature(path)
+
+
+def read_file(path):
+    "Read the file at path, through the source cache if enabled."
+    with phasetimer.phase('read'):
+        if SOURCE_CACHE_ENABLED:
+            return SOURCE_FILE_CACHE.read(path)
+        with open(path, "rb") as ifh:
+            return ifh.read()
@@ -30,6 +30,7 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 
 HTTP_PARTIAL_CONTENT = 206
+HTTP_NOT_MODIFIED = 304
 
 from os.path import splitext
 from time import time
@@ -40,6 +41,11 @@ try:
 except ImportError:
     pass
 
+from ..dashlib import accesslog
+from ..dashlib.payload import ChunkedPayload
+from ..dashlib.httpcaching import cache_headers, is_not_modified
+from ..dashlib.byteranges import get_range_response, handle_byte_range #pylint: disable=unused-import
+
 #pylint: disable=too-many-branches
 def dash_handler(req, server_agent, request_handler):
     "This is the mod_python handler."
@@ -53,37 +59,65 @@ def dash_handler(req, server_agent, request_handler):
 
     now = time()
     success = True
+    error_reason = None
+    access_log_file = req.get_options().get('ACCESS_LOG_FILE')
+    if access_log_file and not accesslog.ACCESS_LOG.running:
+        accesslog.start(access_log_file)
+    log_info = None
+    if accesslog.ACCESS_LOG.running:
+        log_info = {}
+
+    def log_error(message):
+        "Put message in the access log record, or in the Apache error log if there is no access log."
+        if log_info is not None:
+            accesslog.add_message(log_info, message)
+        else:
+            req.log_error(message)
+
+    def log_access(nr_bytes):
+        "Add the access log record for the request."
+        if log_info is not None:
+            accesslog.ACCESS_LOG.log(accesslog.make_record(url, req.status, nr_bytes, now, path_parts[2:], log_info,
+                                                           error_reason))
+
     if req.args:
         args = cgi.parse_qs(req.args)
-        req.log_error("mod_dash_handler: %s" % args.__str__())
+        log_error("mod_dash_handler: %s" % args.__str__())
     else:
         args = {}
     try:
-        response = request_handler(req.hostname, path_parts, args, now, req)
-        if isinstance(response, basestring):
+        response = request_handler(req.hostname, path_parts, args, now, req, log_info)
+        if isinstance(response, (basestring, ChunkedPayload)):
             payload_in = response
             if not payload_in:
                 success = False
         else:
             if not response["ok"]:
                 success = False
+                error_reason = response.get("reason")
             payload_in = response["pl"]
     #pylint: disable=broad-except
     except Exception, exc:
         success = False
-        req.log_error("mod_dash_handler request error: %s" % exc)
+        log_error("mod_dash_handler request error: %s" % exc)
         payload_in = "DASH Proxy Error: %s\n URL=%s" % (exc, url)
         req.content_type = "text/plain"
         req.status = apache.HTTP_NOT_FOUND
 
-    set_out_headers(req, server_agent)
+    set_out_headers(req, server_agent, success and payload_in or None)
+
+    if success and is_not_modified(payload_in, req.headers_in.get('if-none-match'),
+                                   req.headers_in.get('if-modified-since')):
+        req.status = HTTP_NOT_MODIFIED
+        log_access(0)
+        return apache.OK
 
     if not success:
         if payload_in == "":
-            req.log_error("dash_proxy error: No body!")
+            log_error("dash_proxy error: No body!")
             payload_in = "Not found (now)"
         elif payload_in is None:
-            req.log_error("dash_proxy: No content found")
+            log_error("dash_proxy: No content found")
             payload_in = "Not found (now)"
         req.status = apache.HTTP_NOT_FOUND
         req.content_type = "text/plain"
@@ -92,15 +126,23 @@ def dash_handler(req, server_agent, request_handler):
 
     if req.status != apache.HTTP_NOT_FOUND:
         if range_line:
-            payload_out, range_out = handle_byte_range(payload_in, range_line)
-            if range_out != "": # OK
-                req.headers_out['Content-Range'] = range_out
+            payload_out, range_headers = get_range_response(payload_in, range_line, req.content_type)
+            if range_headers is not None: # OK
+                if 'Content-Type' in range_headers:
+                    req.content_type = range_headers['Content-Type']
+                else:
+                    req.headers_out['Content-Range'] = range_headers['Content-Range']
                 req.status = HTTP_PARTIAL_CONTENT
             else: # Bad range, drop it.
-                req.log_error("mod_dash_handler: Bad range %s" % (range_line))
+                log_error("mod_dash_handler: Bad range %s" % (range_line))
 
     req.headers_out['Content-Length'] = "%d" % len(payload_out)
-    req.write(payload_out)
+    log_access(len(payload_out))
+    if isinstance(payload_out, ChunkedPayload):
+        for block in payload_out:
+            req.write(block)
+    else:
+        req.write(payload_out)
     return apache.OK
 
 def set_mime_type(req, ext):
@@ -113,46 +155,14 @@ def set_mime_type(req, ext):
     elif ext == ".mp4":
         req.content_type = "video/mp4"
 
-def set_out_headers(req, server_agent):
-    "Set the response headers."
+def set_out_headers(req, server_agent, payload=None):
+    "Set the response headers. The caching headers are taken from the payload (no-cache if not cacheable)."
     req.headers_out['Accept-Ranges'] = 'bytes'
-    req.headers_out['Pragma'] = 'no-cache'
-    req.headers_out['Cache-Control'] = 'no-cache'
-    req.headers_out['Expires'] = '-1'
+    for (key, value) in cache_headers(payload).items():
+        req.headers_out[key] = value
     req.headers_out['DASH-Live-Simulator'] = server_agent
     req.headers_out['Access-Control-Allow-Headers'] = 'origin,range,accept-encoding,referer'
     req.headers_out['Access-Control-Allow-Methods'] = 'GET,HEAD,OPTIONS'
     req.headers_out['Access-Control-Allow-Origin'] = '*'
-    req.headers_out['Access-Control-Expose-Headers'] = 'Server,range,Content-Length,Content-Range,Date'
-
-def handle_byte_range(payload, range_line):
-    """Handle byte range and return data and range-header value.
-
-    If range is strange, return empty string."""
-    range_parts = range_line.split("=")[-1]
-    ranges = range_parts.split(",")
-    if len(ranges) > 1:
-        return (payload, None)
-    length = len(payload)
-    range_interval = ranges[0]
-    range_start, range_end = range_interval.split("-")
-    bad_range = False
-    if range_start == "" and range_end != "":
-        # This is the rangeStart lasts bytes
-        range_start = length - int(range_end)
-        range_end = length -1
-    elif range_start != "":
-        range_start = int(range_start)
-        if range_end != "":
-            range_end = min(int(range_end), length-1)
-        else:
-            range_end = length-1
-    else:
-        bad_range = True
-    if range_end < range_start:
-        bad_range = True
-    if bad_range:
-        return (payload, "")
-    ranged_payload = payload[range_start: range_end+1]
-    range_response = "bytes %d-%d/%d" % (range_start, range_end, len(payload))
-    return (ranged_payload, range_response)
+    req.headers_out['Access-Control-Expose-Headers'] = ('Server,range,Content-Length,Content-Range,Date,'
+                                                        'ETag,Last-Modified')
@@ -102,15 +102,17 @@ and multiplexed.
 from .. import SERVER_AGENT
 VOD_CONF_DIR = "/var/www/dash-live/vod_configs"
 CONTENT_ROOT = "/var/www/dash-live/content"
+STREAMING_RESPONSES = True # Write media segments chunk by chunk instead of as one string
 
 
 from .dashlive_handler import dash_handler
 from ..dashlib import dash_proxy
 
-def handle_request(hostname, path_parts, args, now, req):
-    "Fill in parameters and call the dash_proxy."
+def handle_request(hostname, path_parts, args, now, req, log_info=None):
+    "Fill in parameters and call the dash_proxy. log_info is updated for the access log if it is a dict."
     is_https = req.is_https()
-    return dash_proxy.handle_request(hostname, path_parts[1:], args, VOD_CONF_DIR, CONTENT_ROOT, now, req, is_https)
+    return dash_proxy.handle_request(hostname, path_parts[1:], args, VOD_CONF_DIR, CONTENT_ROOT, now, req, is_https,
+                                     STREAMING_RESPONSES, log_info)
 
 def handler(req):
     "This is the mod_python handler."
@@ -0,0 +1,531 @@
+"""Event-driven HTTP/1.1 server for running the WSGI application stand-alone.
+
+Connections are handled by an asyncore event loop, so many concurrent keep-alive connections can be
+served by one thread. The WSGI application itself is called in a bounded pool of worker threads,
+so that segment generation does not block the event loop. The response body is then written
+by the event loop as the socket becomes writable. Bodies that are not lists of strings may read
+from disk while iterated (e.g. file regions), so their chunks are also taken in the worker threads,
+one at a time as the previous chunk has been sent.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import asynchat
+import asyncore
+import httplib
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import Queue
+from collections import deque
+from cStringIO import StringIO
+from email.utils import formatdate
+from urllib import unquote
+
+SERVER_SOFTWARE = "DashLiveSimAsyncServer/1.0"
+DEFAULT_NR_THREADS = 8
+KEEP_ALIVE_TIMEOUT_IN_S = 15
+SHUTDOWN_TIMEOUT_IN_S = 10
+MAX_HEADER_SIZE = 65536
+MAX_PENDING_REQUESTS = 16 # Max number of pipelined requests per connection
+LOOP_TIMEOUT_IN_S = 0.5
+NO_BODY_STATUSES = (204, 304)
+
+
+class ThreadPool(object):
+    "A fixed number of worker threads that run jobs from a queue."
+
+    def __init__(self, nr_threads=DEFAULT_NR_THREADS):
+        self.jobs = Queue.Queue()
+        self.threads = []
+        for i in range(nr_threads):
+            thread = threading.Thread(target=self._work, name="dashlivesim-worker-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self):
+        "Run jobs until a None job is received."
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            func, args, callback = job
+            try:
+                result = func(*args)
+            except Exception: #pylint: disable=broad-except
+                result = None
+                traceback.print_exc()
+            callback(result)
+
+    def submit(self, func, args, callback):
+        "Run func(*args) in a worker thread and then call callback with the result (None if exception)."
+        self.jobs.put((func, args, callback))
+
+    def shutdown(self):
+        "Stop all threads after the queued jobs are done."
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+class LoopTrigger(asyncore.dispatcher):
+    "Wake up the event loop from other threads and run callbacks in the event loop thread."
+
+    def __init__(self, socket_map):
+        self.reader, self.writer = socket.socketpair()
+        asyncore.dispatcher.__init__(self, self.reader, socket_map)
+        self.callbacks = deque()
+        self.lock = threading.Lock()
+
+    def call_soon(self, callback, *args):
+        "Schedule callback(*args) to be run by the event loop. Can be called from any thread."
+        with self.lock:
+            self.callbacks.append((callback, args))
+        self.wake()
+
+    def wake(self):
+        "Wake up the event loop. Takes no lock, so it can be used from signal handlers."
+        try:
+            self.writer.send("x")
+        except socket.error:
+            pass
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(4096)
+        except socket.error:
+            pass
+        with self.lock:
+            callbacks = list(self.callbacks)
+            self.callbacks.clear()
+        for (callback, args) in callbacks:
+            callback(*args)
+
+    def handle_close(self):
+        self.close()
+        self.writer.close()
+
+
+class ResponseBody(object):
+    "The state of a WSGI response body that is being sent."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, iterable, keep_alive):
+        self.iterable = iterable
+        self.iterator = iter(iterable)
+        self.keep_alive = keep_alive # Keep the connection open when the body has been sent
+        self.reading = False # A worker thread is getting the next chunk
+        self.waiting_for_drain = False # The next chunk is read when the output buffer is empty
+
+
+def next_chunk(iterator):
+    "Get the next non-empty string from iterator, or '' at the end. Run in a worker thread."
+    for chunk in iterator:
+        if chunk:
+            return chunk
+    return ""
+
+
+def close_iterable(iterable):
+    "Call close() on a WSGI response iterable if it has one."
+    close = getattr(iterable, 'close', None)
+    if close is not None:
+        close()
+
+
+class HttpRequest(object):
+    "A parsed HTTP request."
+    #pylint: disable=too-few-public-methods
+
+    def __init__(self, method, uri, version, headers):
+        self.method = method
+        self.uri = uri
+        self.version = version
+        self.headers = headers # Dictionary with lower-case keys
+        self.body = ""
+
+    def keep_alive(self):
+        "Check if the connection should be kept open after this request."
+        connection = self.headers.get('connection', '').lower()
+        if self.version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+
+def parse_request_head(head):
+    "Parse the request line and headers. Return an HttpRequest or None if malformed."
+    lines = head.split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key in headers:
+            headers[key] += ", " + value
+        else:
+            headers[key] = value
+    return HttpRequest(parts[0].upper(), parts[1], parts[2], headers)
+
+
+class HttpConnection(asynchat.async_chat):
+    "One client connection. Requests are handled one at a time, in order."
+
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, server.socket_map)
+        self.server = server
+        self.set_terminator("\r\n\r\n")
+        self.in_data = []
+        self.in_size = 0
+        self.request = None # Request being read
+        self.pending = deque() # Requests read but not yet handled
+        self.busy = False
+        self.discarding = False # After an error, incoming data is ignored until the connection is closed
+        self.body = None # ResponseBody being sent
+        self.last_activity = time.time()
+
+    def readable(self):
+        return len(self.pending) < MAX_PENDING_REQUESTS and not self.server.shutting_down
+
+    def collect_incoming_data(self, data):
+        if self.discarding:
+            return
+        self.last_activity = time.time()
+        self.in_data.append(data)
+        self.in_size += len(data)
+        if self.request is None and self.in_size > MAX_HEADER_SIZE:
+            self.send_error(httplib.BAD_REQUEST)
+
+    def found_terminator(self):
+        data = "".join(self.in_data)
+        self.in_data = []
+        self.in_size = 0
+        if self.request is None:
+            if not data.strip(): # Empty lines between requests
+                return
+            request = parse_request_head(data.lstrip("\r\n"))
+            if request is None:
+                self.send_error(httplib.BAD_REQUEST)
+                return
+            try:
+                content_length = int(request.headers.get('content-length', 0))
+            except ValueError:
+                self.send_error(httplib.BAD_REQUEST)
+                return
+            if content_length > 0:
+                self.request = request
+                self.set_terminator(content_length)
+                return
+        else:
+            request = self.request
+            request.body = data
+            self.request = None
+            self.set_terminator("\r\n\r\n")
+        self.pending.append(request)
+        self.handle_next_request()
+
+    def handle_next_request(self):
+        "Start handling the next pending request if no request is in progress."
+        if self.busy or not self.pending:
+            return
+        self.busy = True
+        request = self.pending.popleft()
+        environ = self.server.make_environ(request, self.addr)
+        self.server.pool.submit(call_application, (self.server.application, environ),
+                                lambda result: self.server.trigger.call_soon(self.send_response, request, result))
+
+    def send_response(self, request, result):
+        "Write the response to the client. Called in the event loop thread."
+        if not self.connected: # The client has gone away
+            if result is not None:
+                close_iterable(result[2])
+            return
+        if result is None:
+            result = ("500 Internal Server Error", [('Content-Type', 'text/plain')], ["Internal Server Error\n"], [])
+        status, headers, iterable, first_chunks = result
+        keep_alive = request.keep_alive() and not self.server.shutting_down
+        header_names = set(name.lower() for (name, _) in headers)
+        status_code = int(status.split()[0])
+        has_body = request.method != "HEAD" and status_code not in NO_BODY_STATUSES
+        if has_body and 'content-length' not in header_names:
+            keep_alive = False # The end of the body is signalled by closing the connection
+        lines = ["HTTP/1.1 %s" % status]
+        lines.extend("%s: %s" % (name, value) for (name, value) in headers)
+        if 'date' not in header_names:
+            lines.append("Date: %s" % formatdate(usegmt=True))
+        if 'server' not in header_names:
+            lines.append("Server: %s" % SERVER_SOFTWARE)
+        lines.append("Connection: %s" % (keep_alive and "keep-alive" or "close"))
+        self.push("\r\n".join(lines) + "\r\n\r\n")
+        for chunk in first_chunks:
+            if has_body and chunk:
+                self.push(chunk)
+        if has_body and isinstance(iterable, (list, tuple)): # Already in memory
+            for chunk in iterable:
+                if chunk:
+                    self.push(chunk)
+        elif has_body:
+            self.body = ResponseBody(iterable, keep_alive)
+            self.read_next_chunk()
+            return
+        close_iterable(iterable)
+        self.finish_response(keep_alive)
+
+    def finish_response(self, keep_alive):
+        "Go on with the next request, or close when everything is sent."
+        self.last_activity = time.time()
+        self.busy = False
+        if keep_alive:
+            self.handle_next_request()
+        else:
+            self.pending.clear()
+            self.close_when_done()
+
+    def read_next_chunk(self):
+        "Get the next chunk of the body in a worker thread, so that disk reads do not block the event loop."
+        body = self.body
+        body.reading = True
+        self.server.pool.submit(next_chunk, (body.iterator,),
+                                lambda chunk: self.server.trigger.call_soon(self.chunk_ready, body, chunk))
+
+    def chunk_ready(self, body, chunk):
+        "Send a chunk read by read_next_chunk. Called in the event loop thread."
+        body.reading = False
+        if body is not self.body: # The connection has been closed
+            close_iterable(body.iterable)
+            return
+        if chunk is None: # Exception while iterating. The body cannot be completed
+            self.body = None
+            close_iterable(body.iterable)
+            self.close()
+            return
+        if not chunk:
+            self.body = None
+            close_iterable(body.iterable)
+            self.finish_response(body.keep_alive)
+            return
+        self.last_activity = time.time()
+        body.waiting_for_drain = True
+        self.push(chunk)
+
+    def initiate_send(self):
+        asynchat.async_chat.initiate_send(self)
+        body = self.body
+        if body is not None and body.waiting_for_drain and not self.producer_fifo:
+            body.waiting_for_drain = False
+            self.read_next_chunk()
+
+    def send_error(self, code):
+        "Send an error response and close the connection."
+        body = "%d %s\n" % (code, httplib.responses[code])
+        self.push("HTTP/1.1 %d %s\r\nContent-Type: text/plain\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+                  % (code, httplib.responses[code], len(body), body))
+        self.pending.clear()
+        self.in_data = []
+        self.discarding = True
+        self.set_terminator(None)
+        self.close_when_done()
+
+    def is_idle(self):
+        "Check if nothing is being processed or written."
+        return not self.busy and not self.pending and not self.producer_fifo
+
+    def handle_close(self):
+        self.close()
+
+    def close(self):
+        asynchat.async_chat.close(self)
+        self.server.connections.discard(self)
+        body = self.body
+        self.body = None
+        if body is not None and not body.reading: # Otherwise closed in chunk_ready
+            close_iterable(body.iterable)
+
+    def handle_error(self):
+        traceback.print_exc()
+        self.close()
+
+
+def call_application(application, environ):
+    """Call the WSGI application. Run in a worker thread.
+
+    Return (status, headers, iterable, first_chunks), where first_chunks are chunks that had to be
+    taken from the iterable to get the application to call start_response."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        "WSGI start_response."
+        if exc_info is not None and response:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        response['status'] = status
+        response['headers'] = headers
+
+    iterable = application(environ, start_response)
+    first_chunks = []
+    if 'status' not in response:
+        iterator = iter(iterable)
+        for chunk in iterator:
+            first_chunks.append(chunk)
+            if 'status' in response:
+                break
+    return (response['status'], response['headers'], iterable, first_chunks)
+
+
+class AsyncWsgiServer(asyncore.dispatcher):
+    "HTTP/1.1 server with keep-alive, calling a WSGI application in a thread pool."
+    #pylint: disable=too-many-instance-attributes
+
+    def __init__(self, application, host, port, nr_threads=DEFAULT_NR_THREADS, sock=None):
+        self.socket_map = {}
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
+        self.application = application
+        if sock is None:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+            self.bind((host, port))
+            self.listen(1024)
+        else:
+            sock.setblocking(0)
+            self.set_socket(sock, self.socket_map)
+            self.accepting = True
+        self.server_name = host
+        self.server_port = self.socket.getsockname()[1]
+        self.pool = ThreadPool(nr_threads)
+        self.trigger = LoopTrigger(self.socket_map)
+        self.connections = set()
+        self.shutting_down = False
+        self.stopped = threading.Event()
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        sock, _ = pair
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections.add(HttpConnection(sock, self))
+
+    def handle_error(self):
+        traceback.print_exc()
+
+    def make_environ(self, request, client_address):
+        "Make the WSGI environment for a request."
+        path, _, query = request.uri.partition("?")
+        environ = {'REQUEST_METHOD' : request.method,
+                   'SCRIPT_NAME' : '',
+                   'PATH_INFO' : unquote(path),
+                   'QUERY_STRING' : query,
+                   'SERVER_NAME' : self.server_name,
+                   'SERVER_PORT' : str(self.server_port),
+                   'SERVER_PROTOCOL' : request.version,
+                   'SERVER_SOFTWARE' : SERVER_SOFTWARE,
+                   'REMOTE_ADDR' : client_address and client_address[0] or '',
+                   'wsgi.version' : (1, 0),
+                   'wsgi.url_scheme' : 'http',
+                   'wsgi.input' : StringIO(request.body),
+                   'wsgi.errors' : sys.stderr,
+                   'wsgi.multithread' : True,
+                   'wsgi.multiprocess' : False,
+                   'wsgi.run_once' : False}
+        for (key, value) in request.headers.items():
+            if key == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif key == 'content-length':
+                environ['CONTENT_LENGTH'] = value
+            else:
+                environ['HTTP_' + key.upper().replace('-', '_')] = value
+        return environ
+
+    def close_idle_connections(self, timeout):
+        "Close connections that have been idle for more than timeout seconds."
+        now = time.time()
+        for connection in list(self.connections):
+            if connection.is_idle() and now - connection.last_activity > timeout:
+                connection.close()
+
+    def serve_forever(self):
+        "Run the event loop until shutdown() is called and the connections are finished."
+        try:
+            while not self.shutting_down:
+                asyncore.loop(LOOP_TIMEOUT_IN_S, False, self.socket_map, 1)
+                self.close_idle_connections(KEEP_ALIVE_TIMEOUT_IN_S)
+            self.close() # Stop accepting new connections
+            deadline = time.time() + SHUTDOWN_TIMEOUT_IN_S
+            while time.time() < deadline and any(not c.is_idle() for c in self.connections):
+                asyncore.loop(LOOP_TIMEOUT_IN_S/5, False, self.socket_map, 1)
+            for connection in list(self.connections):
+                connection.close()
+            self.pool.shutdown()
+            self.trigger.handle_close()
+        finally:
+            self.stopped.set()
+
+    def shutdown(self, wait=False):
+        """Stop accepting connections, finish in-flight requests and stop.
+
+        Can be called from any thread and from signal handlers (without wait)."""
+        self.shutting_down = True
+        self.trigger.wake()
+        if wait:
+            self.stopped.wait()
+
+
+def serve(application, host, port, nr_threads=DEFAULT_NR_THREADS, sock=None):
+    """Serve application until SIGINT or SIGTERM, and then shut down gracefully.
+
+    If sock is given, it is an already listening socket (shared by pre-forked workers)."""
+    server = AsyncWsgiServer(application, host, port, nr_threads, sock)
+    install_signal_handlers(server)
+    server.serve_forever()
+
+
+def install_signal_handlers(server):
+    "Shut down server gracefully on SIGINT and SIGTERM."
+
+    def stop(signum, frame): #pylint: disable=unused-argument
+        "Signal handler."
+        server.shutdown()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
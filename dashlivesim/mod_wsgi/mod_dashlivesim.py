@@ -31,29 +31,55 @@
 
 # Note that VOD_CONF_DIR and CONTENT_ROOT directories must be set in environment
 # For Apache mod_wsgi, this is done using setEnv
+# Setting PREGENERATE_SEGMENTS in the environment generates live segments ahead of their availability time
+# Setting EXPOSE_METRICS in the environment counts requests and serves the counters at /metrics,
+# the segment request lateness histograms at /lateness, the latest access log records at /accesslog
+# and the top functions of the profiled requests at /profile
+# Setting ACCESS_LOG_FILE in the environment writes a JSON lines access log to that file
+# Setting PROFILE_EVERY_N or PROFILE_SLOWER_THAN_MS profiles a sample of the requests (see dashlib.profiler),
+# with pstats files written to PROFILE_DIR if set
 
 from dashlivesim import SERVER_AGENT
 import httplib
+import json
+import os
 from os.path import splitext
+from urlparse import parse_qs
 from time import time
+from dashlivesim.dashlib import accesslog
 from dashlivesim.dashlib import dash_proxy
+from dashlivesim.dashlib import lateness
+from dashlivesim.dashlib import metrics
+from dashlivesim.dashlib import preload
+from dashlivesim.dashlib import phasetimer
+from dashlivesim.dashlib import pregenerator
+from dashlivesim.dashlib import profiler
+from dashlivesim.mod_wsgi import asyncserver
+from dashlivesim.mod_wsgi import prefork
+from dashlivesim.dashlib.payload import ChunkedPayload, BLOCK_SIZE
+from dashlivesim.dashlib.httpcaching import cache_headers, is_not_modified, NO_CACHE_HEADERS
+from dashlivesim.dashlib.byteranges import get_range_response, handle_byte_range #pylint: disable=unused-import
+
+STREAMING_RESPONSES = True # Write media segments chunk by chunk instead of as one string
 
 # Helper for HTTP responses
 #pylint: disable=dangerous-default-value
-def reply(code, resp, body='', headers={}):
-    "Create reply."
+def reply(code, resp, body='', headers={}, file_wrapper=None):
+    """Create reply.
+
+    body can be a string or a ChunkedPayload. A payload that is just a file region is sent
+    using file_wrapper (wsgi.file_wrapper) if available."""
     status = str(code) + ' ' + httplib.responses[code]
 
     # Add default headers to all requests
     headers['Accept-Ranges'] = 'bytes'
-    headers['Pragma'] = 'no-cache'
-    headers['Cache-Control'] = 'no-cache'
-    headers['Expires'] = '-1'
+    if 'Cache-Control' not in headers:
+        headers.update(NO_CACHE_HEADERS)
     headers['DASH-Live-Simulator'] = SERVER_AGENT
     headers['Access-Control-Allow-Headers'] = 'origin,range,accept-encoding,referer'
     headers['Access-Control-Allow-Methods'] = 'GET,HEAD,OPTIONS'
     headers['Access-Control-Allow-Origin'] = '*'
-    headers['Access-Control-Expose-Headers'] = 'Server,range,Content-Length,Content-Range,Date'
+    headers['Access-Control-Expose-Headers'] = 'Server,range,Content-Length,Content-Range,Date,ETag,Last-Modified'
 
     if body:
         headers['Content-Length'] = str(len(body))
@@ -61,8 +87,22 @@ def reply(code, resp, body='', headers={}):
             headers['Content-Type'] = 'text/plain'
 
     resp(status, headers.items())
+    if isinstance(body, ChunkedPayload):
+        region = body.file_region()
+        if region is not None and file_wrapper is not None:
+            return file_wrapper(region.open(), BLOCK_SIZE)
+        return body
     return [body]
 
+
+def get_count(query, default, maximum):
+    "Get the n query parameter as an int clamped to [0, maximum]. Return None if it is not a number."
+    try:
+        count = int(query.get('n', [str(default)])[0])
+    except ValueError:
+        return None
+    return max(0, min(count, maximum))
+
 #pylint: disable=too-many-branches, too-many-locals
 def application(environment, start_response):
     "WSGI Entrypoint"
@@ -72,11 +112,47 @@ def application(environment, start_response):
     url = environment['REQUEST_URI']
     vod_conf_dir = environment['VOD_CONF_DIR']
     content_root = environment['CONTENT_ROOT']
+    if environment.get('PREGENERATE_SEGMENTS') and not pregenerator.SCHEDULER.running:
+        pregenerator.start(dash_proxy.pregenerate_segment) # Started here to get one scheduler per (forked) process
+    access_log_file = environment.get('ACCESS_LOG_FILE')
+    if access_log_file and not accesslog.ACCESS_LOG.running:
+        accesslog.start(access_log_file)
+    if not profiler.SAMPLER.enabled and (environment.get('PROFILE_EVERY_N') or
+                                         environment.get('PROFILE_SLOWER_THAN_MS')):
+        configure_profiler(environment)
+    expose_metrics = environment.get('EXPOSE_METRICS')
+    if expose_metrics:
+        path = url.split("?", 1)[0]
+        if path == metrics.METRICS_PATH:
+            return reply(httplib.OK, start_response, metrics.METRICS.render(),
+                         {'Content-Type' : metrics.CONTENT_TYPE})
+        if path == lateness.LATENESS_PATH:
+            with_buckets = parse_qs(environment.get('QUERY_STRING', '')).get('buckets') == ['1']
+            report = json.dumps(lateness.LATENESS.report(with_buckets), sort_keys=True)
+            return reply(httplib.OK, start_response, report, {'Content-Type' : 'application/json'})
+        if path == accesslog.ACCESS_LOG_PATH:
+            query = parse_qs(environment.get('QUERY_STRING', ''))
+            nr_records = get_count(query, 100, accesslog.ACCESS_LOG.records.maxlen)
+            if nr_records is None:
+                return reply(httplib.BAD_REQUEST, start_response, "Bad value for n\n")
+            records = "".join(json.dumps(record, sort_keys=True) + "\n"
+                              for record in accesslog.ACCESS_LOG.last(nr_records))
+            return reply(httplib.OK, start_response, records, {'Content-Type' : 'application/x-ndjson'})
+        if path == profiler.PROFILE_PATH:
+            query = parse_qs(environment.get('QUERY_STRING', ''))
+            nr_functions = get_count(query, 20, profiler.MAX_TOP_FUNCTIONS)
+            if nr_functions is None:
+                return reply(httplib.BAD_REQUEST, start_response, "Bad value for n\n")
+            top = profiler.SAMPLER.top(query.get('ext', ['.m4s'])[0], nr_functions,
+                                       query.get('sort', [profiler.DEFAULT_SORT])[0])
+            return reply(httplib.OK, start_response, top)
     is_https = environment.get('HTTPS', 0)
     path_parts = url.split('/')
     ext = splitext(path_parts[-1])[1]
     args = None
-    now = time()
+    now = environment.get('dashlivesim.now') # Simulated time set by in-process load generation
+    if now is None:
+        now = time()
     range_line = None
     if 'HTTP_RANGE' in environment:
         range_line = environment['HTTP_RANGE']
@@ -92,53 +168,92 @@ def application(environment, start_response):
     mimetype = get_mime_type(ext)
     status = httplib.OK
     payload_in = None
+    error_reason = None
+    log_info = None
+    if access_log_file or expose_metrics:
+        log_info = {}
+
+    def log_error(message):
+        "Put message in the access log record, or print it if there is no access log."
+        if log_info is not None:
+            accesslog.add_message(log_info, message)
+        else:
+            print message
 
+    if phasetimer.PHASE_TIMING_ENABLED:
+        phasetimer.begin_request()
     try:
         response = dash_proxy.handle_request(hostname, path_parts[1:], args, vod_conf_dir, content_root, now, None,
-                                             is_https)
-        if isinstance(response, basestring):
+                                             is_https, STREAMING_RESPONSES, log_info)
+        if isinstance(response, (basestring, ChunkedPayload)):
             payload_in = response
             if not payload_in:
                 success = False
         else:
             if not response['ok']:
                 success = False
+                error_reason = response.get('reason')
 
             payload_in = response['pl']
 
     #pylint: disable=broad-except
     except Exception, exc:
         success = False
-        print "mod_dash_handler request error: %s" % exc
+        log_error("mod_dash_handler request error: %s" % exc)
         payload_in = "DASH Proxy Error: %s\n URL=%s" % (exc, url)
 
 
     if not success:
         if payload_in == "":
-            print "dash_proxy error: No body!"
+            log_error("dash_proxy error: No body!")
             payload_in = "Now found (now)"
         elif payload_in is None:
-            print "dash_proxy: No content found"
+            log_error("dash_proxy: No content found")
             payload_in = "Not found (now)"
 
         status = httplib.NOT_FOUND
         mimetype = "text/plain"
+        if error_reason is None:
+            error_reason = dash_proxy.OTHER_ERROR
 
     payload_out = payload_in
 
     # Setup response headers
     headers = {'Content-Type':mimetype}
-
-    if status != httplib.NOT_FOUND:
+    timer = phasetimer.end_request(ext)
+    if timer is not None:
+        headers['Server-Timing'] = timer.server_timing()
+        headers['Timing-Allow-Origin'] = '*'
+    if success:
+        headers.update(cache_headers(payload_in))
+        if is_not_modified(payload_in, environment.get('HTTP_IF_NONE_MATCH'),
+                           environment.get('HTTP_IF_MODIFIED_SINCE')):
+            status = httplib.NOT_MODIFIED
+            payload_out = ''
+
+    if status == httplib.OK:
         if range_line:
-            payload_out, range_out = handle_byte_range(payload_in, range_line)
-            if range_out != "": # OK
-                headers['Content-Range'] = range_out
+            payload_out, range_headers = get_range_response(payload_in, range_line, mimetype)
+            if range_headers is not None: # OK
+                headers.update(range_headers)
                 status = httplib.PARTIAL_CONTENT
             else: # Bad range, drop it
-                print "mod_dash_handler: Bad range %s" % (range_line)
-
-    return reply(status, start_response, payload_out, headers)
+                log_error("mod_dash_handler: Bad range %s" % (range_line))
+
+    if expose_metrics:
+        metrics.METRICS.record_request(path_parts[2:], ext, len(payload_out), error_reason)
+    if log_info is not None:
+        accesslog.ACCESS_LOG.log(accesslog.make_record(url, status, len(payload_out), now, path_parts[2:], log_info,
+                                                       error_reason, timer))
+    return reply(status, start_response, payload_out, headers, environment.get('wsgi.file_wrapper'))
+
+def configure_profiler(environment):
+    "Configure the sampling profiler from the environment."
+    slower_than = environment.get('PROFILE_SLOWER_THAN_MS')
+    if slower_than is not None:
+        slower_than = float(slower_than)
+    profiler.SAMPLER.configure(int(environment.get('PROFILE_EVERY_N') or 0), slower_than,
+                               environment.get('PROFILE_DIR'))
 
 def get_mime_type(ext):
     "Get mime-type depending on extension."
@@ -152,37 +267,6 @@ def get_mime_type(ext):
     return "text/plain"
 
 
-def handle_byte_range(payload, range_line):
-    """Handle byte range and return data and range-header value.
-    If range is strange, return empty string."""
-    range_parts = range_line.split("=")[-1]
-    ranges = range_parts.split(",")
-    if len(ranges) > 1:
-        return (payload, None)
-    length = len(payload)
-    range_interval = ranges[0]
-    range_start, range_end = range_interval.split("-")
-    bad_range = False
-    if range_start == "" and range_end != "":
-        # This is the rangeStart lasts bytes
-        range_start = length - int(range_end)
-        range_end = length -1
-    elif range_start != "":
-        range_start = int(range_start)
-        if range_end != "":
-            range_end = min(int(range_end), length-1)
-        else:
-            range_end = length-1
-    else:
-        bad_range = True
-    if range_end < range_start:
-        bad_range = True
-    if bad_range:
-        return (payload, "")
-    ranged_payload = payload[range_start: range_end+1]
-    range_response = "bytes %d-%d/%d" % (range_start, range_end, len(payload))
-    return (ranged_payload, range_response)
-
 #
 # Local wsgi server for testing
 #
@@ -197,6 +281,27 @@ def main():
                         help="content root directory", required=True)
     parser.add_argument("--host", dest="host", type=str, help="IPv4 host", default="0.0.0.0")
     parser.add_argument("--port", dest="port", type=int, help="IPv4 port", default=8059)
+    parser.add_argument("--threads", dest="threads", type=int, help="number of request handling threads",
+                        default=asyncserver.DEFAULT_NR_THREADS)
+    parser.add_argument("--wsgiref", dest="wsgiref", action="store_true",
+                        help="use the single-threaded wsgiref server instead of the keep-alive server")
+    parser.add_argument("--workers", dest="workers", type=int, default=0,
+                        help="number of pre-forked worker processes sharing the preloaded content (0 for none)")
+    parser.add_argument("--pregenerate", dest="pregenerate", action="store_true",
+                        help="generate live segments ahead of their availability time")
+    parser.add_argument("--access-log", dest="access_log", type=str,
+                        help="write a JSON lines access log to this file (with the pid added for each worker)")
+    parser.add_argument("--profile-every", dest="profile_every_n", type=int, default=0,
+                        help="profile every Nth request (0 for none)")
+    parser.add_argument("--profile-slower-than", dest="profile_slower_than_ms", type=float,
+                        help="profile the request after one slower than this number of ms (for the same extension)")
+    parser.add_argument("--profile-dir", dest="profile_dir", type=str,
+                        help="directory for pstats files of the profiled requests")
+    parser.add_argument("--metrics", dest="metrics", action="store_true",
+                        help="count requests and serve the counters at %s, and the segment request lateness, "
+                        "latest access log records and profiles at %s, %s and %s" %
+                        (metrics.METRICS_PATH, lateness.LATENESS_PATH, accesslog.ACCESS_LOG_PATH,
+                         profiler.PROFILE_PATH))
     args = parser.parse_args()
 
 
@@ -205,16 +310,37 @@ def main():
         env['REQUEST_URI'] = env['PATH_INFO'] # Set REQUEST_URI from PATH_INFO
         env['VOD_CONF_DIR'] = args.vod_conf_dir
         env['CONTENT_ROOT'] = args.content_dir
+        env['PREGENERATE_SEGMENTS'] = args.pregenerate
+        env['EXPOSE_METRICS'] = args.metrics
+        env['PROFILE_EVERY_N'] = args.profile_every_n
+        env['PROFILE_SLOWER_THAN_MS'] = args.profile_slower_than_ms
+        env['PROFILE_DIR'] = args.profile_dir
+        if args.access_log:
+            env['ACCESS_LOG_FILE'] = args.workers > 0 and "%s.%d" % (args.access_log, os.getpid()) or args.access_log
         return application(env, resp)
 
     def run_local_webserver(wrapper, host, port):
         "Local webserver."
-        from wsgiref.simple_server import make_server
         print 'Waiting for requests at "{0}:{1}"'.format(host, port)
-        httpd = make_server(host, port, wrapper)
-        httpd.serve_forever()
+        if args.wsgiref:
+            from wsgiref.simple_server import make_server
+            httpd = make_server(host, port, wrapper)
+            httpd.serve_forever()
+        else:
+            asyncserver.serve(wrapper, host, port, args.threads)
+            print "Server stopped"
+
+    def preload_content():
+        "Preload configs, MPD templates and init segments."
+        counts = preload.preload(args.vod_conf_dir, args.content_dir)
+        print "Preloaded %(configs)d configs, %(mpds)d MPDs and %(init_segments)d init segments" % counts
 
-    run_local_webserver(application_wrapper, args.host, args.port)
+    if args.workers > 0 and not args.wsgiref:
+        prefork.serve(application_wrapper, args.host, args.port, args.workers, args.threads, preload_content)
+        print "Server stopped"
+    else:
+        preload_content()
+        run_local_webserver(application_wrapper, args.host, args.port)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,160 @@
+"""Pre-fork mode for the stand-alone server.
+
+The parent process creates one listening socket and preloads the shared state (content configs,
+compiled MPD templates and init segments). It then forks a number of worker processes, which all
+run an AsyncWsgiServer on the inherited socket. Since the preloaded state is created before the
+fork, it is shared copy-on-write by the workers. The parent supervises the workers, restarts
+workers that die, and forwards SIGTERM and SIGINT to them for a graceful shutdown.
+"""
+
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import errno
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from dashlivesim.mod_wsgi import asyncserver
+
+LISTEN_BACKLOG = 1024
+MIN_WORKER_LIFETIME_IN_S = 1.0 # Workers dying faster than this are restarted with a delay
+
+
+def make_listening_socket(host, port, backlog=LISTEN_BACKLOG):
+    "Create a listening socket to share between worker processes. SO_REUSEPORT is set if available."
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except socket.error:
+            pass # Defined, but not supported by the kernel
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def freeze_shared_state():
+    """Prepare preloaded objects for being shared copy-on-write.
+
+    A collection before forking avoids that the workers collect (and thereby write to) the same garbage.
+    Where available, gc.freeze() moves all objects to a permanent generation that is never collected."""
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze() #pylint: disable=no-member
+
+
+class PreforkServer(object):
+    "Fork and supervise worker processes serving a WSGI application on a shared socket."
+
+    def __init__(self, application, host, port, nr_workers, nr_threads=asyncserver.DEFAULT_NR_THREADS):
+        self.application = application
+        self.host = host
+        self.nr_workers = nr_workers
+        self.nr_threads = nr_threads
+        self.sock = make_listening_socket(host, port)
+        self.server_port = self.sock.getsockname()[1]
+        self.workers = {} # pid -> (worker_nr, start_time)
+        self.stopping = False
+
+    def spawn_worker(self, worker_nr):
+        "Fork a worker process. Returns the pid in the parent and never returns in the worker."
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN) # The parent forwards SIGINT as SIGTERM
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                asyncserver.serve(self.application, self.host, self.server_port, self.nr_threads, self.sock)
+            except Exception: #pylint: disable=broad-except
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code) #pylint: disable=protected-access
+        self.workers[pid] = (worker_nr, time.time())
+        print "Started worker %d (pid %d)" % (worker_nr, pid)
+        sys.stdout.flush()
+        return pid
+
+    def stop(self, signum=None, frame=None): #pylint: disable=unused-argument
+        "Stop the workers gracefully. Can be used as signal handler."
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def run(self):
+        "Start the workers and supervise them until stop() is called and all workers have exited."
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for worker_nr in range(self.nr_workers):
+            self.spawn_worker(worker_nr)
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                elif err.errno == errno.ECHILD:
+                    break
+                raise
+            if pid not in self.workers:
+                continue
+            worker_nr, start_time = self.workers.pop(pid)
+            if self.stopping:
+                continue
+            print "Worker %d (pid %d) died with status %d. Restarting it." % (worker_nr, pid, status)
+            if time.time() - start_time < MIN_WORKER_LIFETIME_IN_S:
+                time.sleep(MIN_WORKER_LIFETIME_IN_S)
+                if self.stopping:
+                    continue
+            self.spawn_worker(worker_nr)
+        self.sock.close()
+
+
+def serve(application, host, port, nr_workers, nr_threads=asyncserver.DEFAULT_NR_THREADS, preload=None):
+    """Preload shared state, fork nr_workers workers and supervise them until SIGINT or SIGTERM.
+
+    preload is a function without arguments that is called in the parent before forking."""
+    server = PreforkServer(application, host, port, nr_workers, nr_threads)
+    if preload is not None:
+        preload()
+    freeze_shared_state()
+    print 'Waiting for requests at "{0}:{1}"'.format(host, server.server_port)
+    sys.stdout.flush()
+    server.run()
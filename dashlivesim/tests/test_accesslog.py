@@ -0,0 +1,140 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from dash_test_util import *
+from ..dashlib import accesslog
+from ..dashlib import segmentcache
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestAccessLog(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def testRingBuffer(self):
+        access_log = accesslog.AccessLog(3)
+        for i in range(5):
+            access_log.log({'nr' : i})
+        self.assertEqual(access_log.last(2), [{'nr' : 3}, {'nr' : 4}])
+        self.assertEqual(access_log.last(10), [{'nr' : 2}, {'nr' : 3}, {'nr' : 4}])
+
+    def testWriterRotates(self):
+        path = os.path.join(self.log_dir, "access_log_test.jsonl")
+        access_log = accesslog.AccessLog(100)
+        access_log.start(path, max_bytes=200, nr_backups=2)
+        for i in range(10):
+            access_log.log({'nr' : i, 'url' : "/livesim/testpic/V1/%d.m4s" % i})
+        access_log.stop()
+        self.assertFalse(access_log.running)
+        lines = []
+        for name in (path + ".2", path + ".1", path):
+            with open(name) as ifh:
+                lines.extend(ifh.read().splitlines())
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['nr'] for record in records][-3:], [7, 8, 9])
+        self.assertEqual(access_log.nr_dropped, 0)
+
+    def testUndecodableUrl(self):
+        record = accesslog.make_record("/livesim/\xff.m4s", 404, 0, 100, ['\xff.m4s'], {}, 'bad_url')
+        self.assertEqual(record['url'], u"/livesim/\ufffd.m4s")
+        json.dumps(record)
+
+    def testWriterSurvivesBadRecord(self):
+        path = os.path.join(self.log_dir, "access_log_bad_record.jsonl")
+        access_log = accesslog.AccessLog(100)
+        access_log.start(path)
+        access_log.log({'nr' : 0, 'url' : "/livesim/\xff.m4s"})
+        access_log.log({'nr' : 1})
+        access_log.stop()
+        with open(path) as ifh:
+            records = [json.loads(line) for line in ifh.read().splitlines()]
+        self.assertEqual(records, [{'nr' : 1}])
+        self.assertEqual(access_log.nr_failed, 1)
+
+    def testDropsWhenWriterIsBehind(self):
+        access_log = accesslog.AccessLog(2)
+        access_log.filename = "not_started"
+        for i in range(5):
+            access_log.log({'nr' : i})
+        self.assertEqual(access_log.nr_dropped, 3)
+
+
+class TestAccessLogEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE.clear()
+
+    def request(self, path, query=''):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'dashlivesim.now' : 72008.5, 'EXPOSE_METRICS' : True,
+               'QUERY_STRING' : query}
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+        body = "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], body
+
+    def testSegmentRecord(self):
+        _, segment = self.request("/livesim/testpic/V1/12000.m4s")
+        self.request("/livesim/testpic/V1/12001.m4s")
+        status, body = self.request("/accesslog", "n=2")
+        self.assertEqual(status, "200 OK")
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 2)
+        record = records[0]
+        self.assertEqual(record['content'], 'testpic')
+        self.assertEqual(record['rep'], 'V1')
+        self.assertEqual(record['seg_nr'], 12000)
+        self.assertAlmostEqual(record['lateness'], 2.5)
+        self.assertEqual(record['bytes'], len(segment))
+        self.assertEqual(record['cache'], 'miss')
+        self.assertEqual(record['status'], 200)
+        self.assertTrue('filter' in record['phases'])
+        self.assertEqual(records[1]['reason'], 'too_early')
+        self.assertTrue('too early' in records[1]['message'])
+        self.assertFalse('message' in records[0])
+        self.assertEqual(records[1]['status'], 404)
+
+    def testBadCount(self):
+        status, _ = self.request("/accesslog", "n=abc")
+        self.assertEqual(status, "400 Bad Request")
+        self.request("/livesim/testpic/V1/12000.m4s")
+        status, body = self.request("/accesslog", "n=100000000")
+        self.assertEqual(status, "200 OK")
+        self.assertTrue(len(body.splitlines()) <= accesslog.RING_SIZE)
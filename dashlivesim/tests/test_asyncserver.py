@@ -0,0 +1,167 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import signal
+import unittest
+import httplib
+import threading
+import time
+
+from dash_test_util import *
+from ..mod_wsgi import asyncserver
+from ..mod_wsgi import mod_dashlivesim
+
+
+def slow_app(environ, start_response):
+    "Sleep the number of milliseconds given in the path and return the path."
+    time.sleep(int(environ['PATH_INFO'].split("/")[-1])/1000.0)
+    body = environ['PATH_INFO']
+    start_response("200 OK", [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+READ_THREADS = []
+
+def streaming_app(environ, start_response):
+    "Return 20 chunks of 64 kB from a generator that records the threads it runs in."
+    start_response("200 OK", [('Content-Type', 'text/plain'), ('Content-Length', str(20*65536))])
+
+    def generate():
+        for i in range(20):
+            READ_THREADS.append(threading.current_thread().name)
+            yield chr(ord('a') + i)*65536
+    return generate()
+
+
+def dashlivesim_app(environ, start_response):
+    "The dashlivesim application with the test content."
+    environ['REQUEST_URI'] = environ['PATH_INFO']
+    environ['VOD_CONF_DIR'] = VOD_CONFIG_DIR
+    environ['CONTENT_ROOT'] = CONTENT_ROOT
+    return mod_dashlivesim.application(environ, start_response)
+
+
+class TestAsyncServer(unittest.TestCase):
+
+    def start(self, application, nr_threads=4):
+        self.server = asyncserver.AsyncWsgiServer(application, "127.0.0.1", 0, nr_threads)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        return self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown(wait=True)
+        self.thread.join()
+
+    def testKeepAlive(self):
+        port = self.start(dashlivesim_app)
+        conn = httplib.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/pdash/all_1/testpic/V1/12000.m4s")
+        resp = conn.getresponse()
+        segment = resp.read()
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(len(segment), int(resp.getheader('content-length')))
+        sock = conn.sock
+        conn.request("GET", "/pdash/all_1/testpic/V1/init.mp4", headers={'Range' : 'bytes=0-7'})
+        resp = conn.getresponse()
+        self.assertEqual(resp.status, 206)
+        self.assertEqual(resp.read()[4:8], "ftyp")
+        self.assertTrue(conn.sock is sock)
+        conn.request("HEAD", "/pdash/all_1/testpic/V1/12000.m4s")
+        resp = conn.getresponse()
+        self.assertEqual(resp.read(), "")
+        self.assertEqual(int(resp.getheader('content-length')), len(segment))
+        conn.close()
+
+    def testBodyIsReadInWorkerThreads(self):
+        del READ_THREADS[:]
+        port = self.start(streaming_app)
+        conn = httplib.HTTPConnection("127.0.0.1", port)
+        for _ in range(2):
+            conn.request("GET", "/stream")
+            body = conn.getresponse().read()
+            self.assertEqual(body, "".join(chr(ord('a') + i)*65536 for i in range(20)))
+        conn.close()
+        self.assertEqual(len(READ_THREADS), 40)
+        self.assertTrue(all(name.startswith("dashlivesim-worker-") for name in READ_THREADS))
+
+    def testConcurrentRequests(self):
+        port = self.start(slow_app, nr_threads=4)
+        results = []
+
+        def fetch():
+            conn = httplib.HTTPConnection("127.0.0.1", port)
+            conn.request("GET", "/slow/300")
+            results.append(conn.getresponse().read())
+            conn.close()
+
+        start = time.time()
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["/slow/300"]*4)
+        self.assertTrue(time.time() - start < 1.0)
+
+    def testGracefulShutdown(self):
+        port = self.start(slow_app)
+        conn = httplib.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/slow/300")
+        time.sleep(0.1)
+        self.server.shutdown()
+        resp = conn.getresponse()
+        self.assertEqual(resp.read(), "/slow/300")
+        self.assertEqual(resp.getheader('connection'), "close")
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+
+    def testSignalWhileTriggerIsLocked(self):
+        self.start(slow_app)
+        handlers = (signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM))
+        asyncserver.install_signal_handlers(self.server)
+        lock = self.server.trigger.lock
+        lock.acquire() # As in handle_read, on the thread that gets the signal
+        releaser = threading.Timer(2, lock.release) # Ends a deadlock, so that the test fails instead of hanging
+        releaser.start()
+        try:
+            start = time.time()
+            os.kill(os.getpid(), signal.SIGTERM)
+            time.sleep(0.01) # The handler runs between bytecodes of the main thread
+            self.assertTrue(self.server.shutting_down)
+            self.assertTrue(time.time() - start < 1)
+        finally:
+            releaser.cancel()
+            signal.signal(signal.SIGINT, handlers[0])
+            signal.signal(signal.SIGTERM, handlers[1])
+            if lock.locked():
+                lock.release()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
@@ -0,0 +1,76 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import byteranges
+from ..dashlib.payload import ChunkedPayload
+
+
+def parse_multipart(data, boundary):
+    "Parse a multipart/byteranges body into a list of (content_range, body)."
+    parts = []
+    for part in data.split("\r\n--%s" % boundary)[1:-1]:
+        head, body = part.split("\r\n\r\n", 1)
+        content_range = [line for line in head.split("\r\n") if line.startswith("Content-Range")][0]
+        parts.append((content_range.split(": ")[1], body))
+    return parts
+
+
+class TestParseRanges(unittest.TestCase):
+
+    def testRanges(self):
+        self.assertEqual(byteranges.parse_ranges("bytes=0-4, 8-, -3", 10), [(0, 4), (8, 9), (7, 9)])
+        self.assertEqual(byteranges.parse_ranges("bytes=-20", 10), [(0, 9)])
+        self.assertEqual(byteranges.parse_ranges("bytes=12-14", 10), [])
+        self.assertEqual(byteranges.parse_ranges("bytes=a-b", 10), None)
+        self.assertEqual(byteranges.parse_ranges("bytes=-", 10), None)
+
+
+class TestMultipartRanges(unittest.TestCase):
+
+    def testMultipart(self):
+        data = "0123456789" * 100
+        payload = ChunkedPayload([data[:500], memoryview(data)[500:]])
+        payload_out, headers = byteranges.get_range_response(payload, "bytes=0-9,495-504,-5", "video/mp4")
+        boundary = headers['Content-Type'].split("boundary=")[1]
+        parts = parse_multipart(payload_out.join(), boundary)
+        self.assertEqual(parts, [("bytes 0-9/1000", data[0:10]), ("bytes 495-504/1000", data[495:505]),
+                                 ("bytes 995-999/1000", data[995:])])
+
+    def testSingleRange(self):
+        payload_out, headers = byteranges.get_range_response("0123456789", "bytes=2-4", "video/mp4")
+        self.assertEqual(payload_out, "234")
+        self.assertEqual(headers, {'Content-Range' : "bytes 2-4/10"})
+
+    def testBadRange(self):
+        payload_out, headers = byteranges.get_range_response("0123456789", "bytes=20-30", "video/mp4")
+        self.assertEqual(payload_out, "0123456789")
+        self.assertTrue(headers is None)
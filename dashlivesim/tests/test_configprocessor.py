@@ -39,3 +39,64 @@ class TestConfigProcessor(unittest.TestCase):
         ifh = open(cfg_file, "rb")
         vod_cfg = configprocessor.VodConfig()
         vod_cfg.read_config(cfg_file)
+
+
+class TestVodConfigCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = configprocessor.VodConfigCatalog(revalidate_interval=0)
+
+    def testSecondLookupIsAHit(self):
+        cfg_file = os.path.join(VOD_CONFIG_DIR, 'testpic.cfg')
+        vod_cfg1 = self.catalog.get(cfg_file)
+        vod_cfg2 = self.catalog.get(cfg_file)
+        self.assertTrue(vod_cfg1 is vod_cfg2)
+        self.assertEqual(self.catalog.stats(), {'hits' : 1, 'misses' : 1, 'entries' : 1})
+        self.assertEqual(vod_cfg1.segment_duration_s, 6)
+
+    def testChangedFileIsReread(self):
+        cfg_file = os.path.join(OUT_DIR, 'catalog_test.cfg')
+        src_data = open(os.path.join(VOD_CONFIG_DIR, 'testpic.cfg'), 'rb').read()
+        write_data_to_outfile(src_data, 'catalog_test.cfg')
+        self.assertEqual(self.catalog.get(cfg_file).default_tsbd_secs, 300)
+        write_data_to_outfile(src_data.replace("default_tsbd_secs = 300", "default_tsbd_secs = 3000"),
+                              'catalog_test.cfg')
+        self.assertEqual(self.catalog.get(cfg_file).default_tsbd_secs, 3000)
+        self.assertEqual(self.catalog.stats()['misses'], 2)
+        rm_outfile('catalog_test.cfg')
+
+
+class TestUrlOptions(unittest.TestCase):
+
+    def process(self, url_parts, now):
+        cfg_processor = configprocessor.ConfigProcessor(VOD_CONFIG_DIR, "http://streamtest.eu/livesim/")
+        cfg_processor.process_url(url_parts, now)
+        return cfg_processor.getconfig()
+
+    def testOptionsAreReusedPerPrefix(self):
+        options1 = configprocessor.get_url_options(['tsbd_30', 'utc_head', 'testpic', 'Manifest.mpd'])
+        options2 = configprocessor.get_url_options(['tsbd_30', 'utc_head', 'testpic', 'A1', '1.m4s'])
+        self.assertTrue(options1 is options2)
+        self.assertEqual(options1.nr_parts, 2)
+        self.assertEqual(options1.settings, (('timeshift_buffer_depth_in_s', 30), ('utc_timing_methods', ('head',))))
+
+    def testOptionsAreImmutable(self):
+        options = configprocessor.get_url_options(['baseurl_u10_d20', 'testpic', 'Manifest.mpd'])
+        self.assertRaises(AttributeError, setattr, options, 'nr_parts', 3)
+        cfg = self.process(['baseurl_u10_d20', 'testpic', 'Manifest.mpd'], 0)
+        cfg.multi_url.append("d10_u20")
+        self.assertEqual(self.process(['baseurl_u10_d20', 'testpic', 'Manifest.mpd'], 0).multi_url, ["u10_d20"])
+
+    def testTimeDependentValuesAreUpdated(self):
+        cfg1 = self.process(['cont_1', 'testpic', 'Manifest.mpd'], 72061)
+        cfg2 = self.process(['cont_1', 'testpic', 'Manifest.mpd'], 82061)
+        self.assertEqual(cfg1.availability_start_time_in_s, 72054)
+        self.assertEqual(cfg2.availability_start_time_in_s, 82050)
+        cfg3 = self.process(['modulo_10', 'testpic', 'Manifest.mpd'], 600*100 + 590)
+        self.assertEqual(cfg3.availability_start_time_in_s, 600*101)
+
+    def testBadOptionsAreNotCached(self):
+        url_parts = ['start_1', 'modulo_1', 'testpic', 'Manifest.mpd']
+        self.assertRaises(configprocessor.ConfigProcessorError, self.process, url_parts, 0)
+        self.assertRaises(configprocessor.ConfigProcessorError, self.process, url_parts, 0)
+        self.assertRaises(configprocessor.ConfigProcessorError, self.process, ['snr_-2', 'testpic', 'Manifest.mpd'], 0)
@@ -0,0 +1,128 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import httpcaching
+from ..dashlib.payload import ChunkedPayload
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    def testIfNoneMatch(self):
+        payload = ChunkedPayload(["abc"], '"x"', 1000, 10)
+        self.assertTrue(httpcaching.is_not_modified(payload, '"y", "x"', None))
+        self.assertTrue(httpcaching.is_not_modified(payload, '*', None))
+        self.assertFalse(httpcaching.is_not_modified(payload, '"y"', httpcaching.make_http_date(2000)))
+        self.assertFalse(httpcaching.is_not_modified("abc", '"x"', None))
+
+    def testIfModifiedSince(self):
+        payload = ChunkedPayload(["abc"], '"x"', 1000, 10)
+        self.assertTrue(httpcaching.is_not_modified(payload, None, httpcaching.make_http_date(1000)))
+        self.assertFalse(httpcaching.is_not_modified(payload, None, httpcaching.make_http_date(999)))
+        self.assertFalse(httpcaching.is_not_modified(payload, None, "garbage"))
+
+    def testCacheHeaders(self):
+        headers = httpcaching.cache_headers(ChunkedPayload(["abc"], '"x"', 0, 12.5))
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=12')
+        self.assertEqual(headers['Last-Modified'], 'Thu, 01 Jan 1970 00:00:00 GMT')
+        self.assertEqual(httpcaching.cache_headers("abc")['Cache-Control'], 'no-cache')
+
+
+class TestCachingInfo(unittest.TestCase):
+
+    def get(self, url_parts, now):
+        return dash_proxy.handle_request("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now,
+                                         streaming=True)
+
+    def testMediaSegment(self):
+        payload = self.get(['pdash', 'testpic', 'V1', '12000.m4s'], 72060)
+        self.assertEqual(payload.last_modified, 72006)
+        self.assertEqual(payload.max_age, 72006 + 6 + 300 - 72060)
+        self.assertEqual(payload.etag, self.get(['pdash', 'testpic', 'V1', '12000.m4s'], 72100).etag)
+        self.assertNotEqual(payload.etag, self.get(['pdash', 'testpic', 'A1', '12000.m4s'], 72060).etag)
+
+    def testInitSegment(self):
+        payload = self.get(['pdash', 'testpic', 'V1', 'init.mp4'], 72060)
+        self.assertEqual(payload.max_age, httpcaching.INIT_SEGMENT_MAX_AGE_IN_S)
+        self.assertEqual(payload.etag, httpcaching.make_etag(payload.join()))
+
+    def testMpd(self):
+        payload = self.get(['pdash', 'testpic', 'Manifest.mpd'], 72060)
+        self.assertEqual(payload.etag, httpcaching.make_etag(payload.join()))
+        payload = self.get(['pdash', 'mup_10', 'testpic', 'Manifest.mpd'], 72060)
+        self.assertEqual(payload.max_age, 5)
+
+    def testSegmentTimelineMpd(self):
+        for url_parts in (['pdash', 'segtimeline_1', 'testpic', 'Manifest.mpd'],
+                          ['pdash', 'start_60', 'mup_10', 'segtimeline_1', 'testpic', 'Manifest.mpd']):
+            payload = self.get(url_parts, 72060)
+            self.assertTrue('minimumUpdatePeriod="PT0S"' in payload.join())
+            self.assertEqual(payload.max_age, 0)
+
+    def testMultiPeriodMpd(self):
+        payload = self.get(['pdash', 'periods_60', 'testpic', 'Manifest.mpd'], 72060)
+        self.assertTrue('minimumUpdatePeriod="PT25S"' in payload.join())
+        self.assertEqual(payload.max_age, 12)
+
+    def testErrorIsNotWrapped(self):
+        response = self.get(['pdash', 'testpic', 'V1', '12000.m4s'], 72000)
+        self.assertTrue(isinstance(response, dict))
+
+
+class TestWsgiCaching(unittest.TestCase):
+
+    def request(self, path, extra_env=None):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT}
+        env.update(extra_env or {})
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        body = "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], response['headers'], body
+
+    def testNotModified(self):
+        path = "/pdash/all_1/testpic/V1/12000.m4s"
+        status, headers, _ = self.request(path)
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=300')
+        self.assertTrue('Pragma' not in headers)
+        status, headers, body = self.request(path, {'HTTP_IF_NONE_MATCH' : headers['ETag']})
+        self.assertEqual(status, "304 Not Modified")
+        self.assertEqual(body, "")
+
+    def testErrorIsNotCached(self):
+        status, headers, _ = self.request("/pdash/testpic/V1/1.m4s")
+        self.assertEqual(status, "404 Not Found")
+        self.assertEqual(headers['Cache-Control'], 'no-cache')
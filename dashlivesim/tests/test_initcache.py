@@ -0,0 +1,71 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import initcache
+from ..dashlib.initsegmentfilter import InitLiveFilter
+from ..dashlib.segmentmuxer import MultiplexInits
+
+V1_INIT = join(CONTENT_ROOT, "testpic/V1/init.mp4")
+A1_INIT = join(CONTENT_ROOT, "testpic/A1/init.mp4")
+
+
+class TestInitSegmentCache(unittest.TestCase):
+
+    def setUp(self):
+        initcache.INIT_SEGMENT_CACHE.clear()
+
+    def testSameAsFilter(self):
+        init_segment = initcache.get_init_segment((V1_INIT,))
+        self.assertEqual(init_segment.data, InitLiveFilter(V1_INIT).filter())
+        muxed = initcache.get_init_segment((V1_INIT, A1_INIT))
+        self.assertEqual(muxed.data, MultiplexInits(V1_INIT, A1_INIT).construct_muxed())
+        self.assertNotEqual(init_segment.etag, muxed.etag)
+
+    def testGeneratedOnce(self):
+        first = initcache.get_init_segment((V1_INIT,))
+        self.assertTrue(initcache.get_init_segment((V1_INIT,)) is first)
+        self.assertEqual(initcache.INIT_SEGMENT_CACHE.stats()['misses'], 1)
+
+    def testPreload(self):
+        nr_init_segments = initcache.preload(VOD_CONFIG_DIR, CONTENT_ROOT)
+        self.assertTrue(nr_init_segments >= 3)
+        self.assertEqual(len(initcache.INIT_SEGMENT_CACHE), nr_init_segments)
+        initcache.get_init_segment((V1_INIT,))
+        self.assertEqual(initcache.INIT_SEGMENT_CACHE.stats()['misses'], nr_init_segments)
+
+    def testMuxedRequest(self):
+        urlParts = ['pdash', 'testpic', 'V1__A1', 'init.mp4']
+        dp = dash_proxy.DashProvider("streamtest.eu", urlParts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now=0)
+        data = dp.handle_request()
+        self.assertEqual(data, MultiplexInits(V1_INIT, A1_INIT).construct_muxed())
+        self.assertEqual(dp.etag, initcache.get_init_segment((V1_INIT, A1_INIT)).etag)
@@ -0,0 +1,110 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import unittest
+
+from dash_test_util import *
+from ..dashlib import lateness
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestBuckets(unittest.TestCase):
+
+    def testBucketsCoverAllValues(self):
+        previous_index = -1
+        for value in range(0, 1 << 16):
+            index = lateness.bucket_index(value)
+            lowest, highest = lateness.bucket_range(index)
+            self.assertTrue(lowest <= value <= highest)
+            self.assertTrue(index in (previous_index, previous_index + 1))
+            previous_index = index
+
+    def testRelativePrecision(self):
+        for value in (100, 1000, 65432, 10**7):
+            lowest, highest = lateness.bucket_range(lateness.bucket_index(value))
+            self.assertTrue(float(highest - lowest)/lowest < 0.07)
+
+    def testLargeValuesInLastBucket(self):
+        self.assertEqual(lateness.bucket_index(1 << 40), lateness.NR_BUCKETS - 1)
+
+
+class TestLatenessHistogram(unittest.TestCase):
+
+    def testSummary(self):
+        histogram = lateness.LatenessHistogram()
+        for offset in (-0.5, 0.1, 0.2, 0.3, 1.5, 2.0, 100):
+            histogram.record(offset)
+        summary = histogram.summary(True)
+        self.assertEqual(summary['count'], 7)
+        self.assertEqual(summary['too_early'], 1)
+        self.assertEqual(summary['min'], -0.5)
+        self.assertEqual(summary['max'], 100)
+        self.assertAlmostEqual(summary['p50'], 0.3, delta=0.01)
+        self.assertAlmostEqual(summary['p1'], -0.5, delta=0.02)
+        self.assertEqual(len(summary['buckets']), 7)
+        self.assertEqual(summary['buckets'][0][2], 1)
+
+    def testMaxNrHistograms(self):
+        histograms = lateness.LatenessHistograms()
+        for i in range(lateness.MAX_NR_HISTOGRAMS + 10):
+            histograms.record("content%d" % i, "V1", 1.0)
+        self.assertEqual(histograms.get(lateness.OTHER, lateness.OTHER).count, 10)
+
+
+class TestLatenessEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        lateness.LATENESS.clear()
+
+    def request(self, path, now=72010, query=''):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'dashlivesim.now' : now, 'EXPOSE_METRICS' : True,
+               'QUERY_STRING' : query}
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+        body = "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], body
+
+    def testSegmentRequestsAreRecorded(self):
+        self.request("/livesim/testpic/V1/12000.m4s", 72008.5)
+        self.request("/livesim/testpic/V1/12001.m4s", 72010)
+        self.request("/livesim/testpic/A1/12000.m4s", 72006.2)
+        status, body = self.request("/lateness", query="buckets=1")
+        self.assertEqual(status, "200 OK")
+        report = json.loads(body)
+        video = report['testpic']['V1']
+        self.assertEqual(video['count'], 2)
+        self.assertEqual(video['too_early'], 1)
+        self.assertAlmostEqual(video['min'], -2.0)
+        self.assertAlmostEqual(video['max'], 2.5)
+        self.assertEqual(len(video['buckets']), 2)
+        self.assertAlmostEqual(report['testpic']['A1']['max'], 0.2, places=3)
+        self.assertTrue('buckets' not in json.loads(self.request("/lateness")[1])['testpic']['A1'])
@@ -0,0 +1,67 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..benchmarks import loadgen
+
+START_TIME = 72006 # Live edge is segment 12000 which maps to the first VoD segment
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def testInProcessClientsFollowLiveEdge(self):
+        transport = loadgen.InProcessTransport(VOD_CONFIG_DIR, CONTENT_ROOT)
+        report = loadgen.run_load(4, 5, transport, START_TIME, ramp_up=1.0)
+        self.assertEqual(report['kinds']['mpd']['requests'], 4)
+        self.assertEqual(report['kinds']['init']['outcomes'], {'ok' : 8})
+        self.assertEqual(report['kinds']['segment']['outcomes'], {'ok' : 8})
+        self.assertEqual(report['rates']['error_rate'], 0)
+        self.assertTrue(report['kinds']['segment']['p99_ms'] >= report['kinds']['segment']['p50_ms'])
+
+    def testClockAheadGivesTooEarly(self):
+        transport = loadgen.InProcessTransport(VOD_CONFIG_DIR, CONTENT_ROOT)
+        players = [loadgen.VirtualPlayer(0, loadgen.DEFAULT_MPD_PATH, START_TIME, clock_offset=2.0)]
+        generator = loadgen.LoadGenerator(transport, players, START_TIME + 5)
+        generator.run_virtual()
+        report = generator.stats.report()
+        self.assertEqual(report['kinds']['segment']['outcomes'], {'ok' : 2, 'too_early' : 2})
+
+    def testMpdRefreshInterval(self):
+        player = loadgen.VirtualPlayer(0, loadgen.DEFAULT_MPD_PATH, START_TIME, max_mpd_interval=2.0)
+        transport = loadgen.InProcessTransport(VOD_CONFIG_DIR, CONTENT_ROOT)
+        generator = loadgen.LoadGenerator(transport, [player], START_TIME + 5)
+        generator.run_virtual()
+        self.assertEqual(generator.stats.report()['kinds']['mpd']['requests'], 3)
+
+    def testParseDuration(self):
+        self.assertEqual(loadgen.parse_duration("PT2S"), 2)
+        self.assertEqual(loadgen.parse_duration("P100Y"), None)
+        self.assertEqual(loadgen.parse_duration(None), None)
@@ -0,0 +1,109 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import unittest
+
+from dash_test_util import *
+from ..dashlib import metrics
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestShardedCounter(unittest.TestCase):
+
+    def testThreadsAreSummed(self):
+        counter = metrics.ShardedCounter("test_total", "Test.", ('kind',))
+
+        def count():
+            for _ in range(1000):
+                counter.inc(('a',))
+            counter.inc(('b',), 5)
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.values(), {('a',) : 4000, ('b',) : 20})
+        counter.clear()
+        self.assertEqual(counter.values(), {})
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        metrics.METRICS.clear()
+
+    def request(self, path, now=72010, expose_metrics=True):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'dashlivesim.now' : now, 'EXPOSE_METRICS' : expose_metrics}
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        body = "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], response['headers'], body
+
+    def testCounters(self):
+        _, _, segment = self.request("/livesim/testpic/V1/12000.m4s")
+        self.request("/livesim/testpic/V1/12000.m4s")
+        self.request("/livesim/testpic/Manifest.mpd")
+        self.request("/livesim/testpic/V1/12001.m4s")
+        self.request("/livesim/testpic/A1/1.m4s")
+        self.request("/livesim/testpic/A1/1.m4s", now=3)
+        status, headers, body = self.request("/metrics")
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers['Content-Type'], metrics.CONTENT_TYPE)
+        lines = body.split("\n")
+        self.assertTrue('dashlivesim_requests_total{ext=".m4s",content="testpic",rep="V1"} 3' in lines)
+        self.assertTrue('dashlivesim_requests_total{ext=".mpd",content="testpic",rep=""} 1' in lines)
+        self.assertTrue('dashlivesim_not_found_total{reason="too_early"} 1' in lines)
+        self.assertTrue('dashlivesim_not_found_total{reason="too_late"} 1' in lines)
+        self.assertTrue('dashlivesim_not_found_total{reason="before_first_segment"} 1' in lines)
+        bytes_lines = [line for line in lines if line.startswith('dashlivesim_response_bytes_total{ext=".m4s"}')]
+        self.assertEqual(len(bytes_lines), 1)
+        self.assertTrue(int(bytes_lines[0].split()[1]) > 2*len(segment))
+        self.assertTrue('# TYPE dashlivesim_phase_duration_seconds histogram' in lines)
+        self.assertTrue('# TYPE dashlivesim_pregeneration_failures_total counter' in lines)
+        self.assertTrue(any(line.startswith('dashlivesim_cache_hits_total{cache="segment"}') for line in lines))
+
+    def testUnknownExtensionsAreOther(self):
+        self.request("/livesim/testpic/V1/12000.abc")
+        self.request("/livesim/testpic/V1/12000.def")
+        _, _, body = self.request("/metrics")
+        ext_labels = set(line.split('ext="')[1].split('"')[0] for line in body.split("\n")
+                         if line.startswith('dashlivesim_requests_total{'))
+        self.assertEqual(ext_labels, set([metrics.OTHER]))
+
+    def testNotExposedByDefault(self):
+        status, _, _ = self.request("/metrics", expose_metrics=False)
+        self.assertEqual(status, "404 Not Found")
+
+    def testEscapeLabelValue(self):
+        self.assertEqual(metrics.format_labels(('a', 'b'), ('x"y', 'z\\')), '{a="x\\"y",b="z\\\\"}')
@@ -0,0 +1,105 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import re
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import mpdcache
+from ..dashlib.timeformatconversions import make_timestamp
+
+RE_PUBLISH_TIME = re.compile('publishTime="[^"]*"')
+
+URLS = (['livesim', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'start_1200', 'dur_600', 'dur_300', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'continuous_1', 'periods_10', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'segtimeline_1', 'tsbd_30', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'modulo_10', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'cont_1', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'testpic_stpp', 'Manifest_stpp.mpd'])
+
+
+class TestMpdCache(unittest.TestCase):
+    "Test the time-quantized MPD cache in DashProvider."
+
+    def setUp(self):
+        mpdcache.MPD_CACHE.clear()
+
+    def tearDown(self):
+        mpdcache.MPD_CACHE_ENABLED = True
+        mpdcache.MPD_CACHE.clear()
+
+    def get_mpd(self, url_parts, now):
+        dp = dash_proxy.DashProvider("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now=now)
+        return dp.handle_request(), dp.last_modified
+
+    def testSameContentAsUncached(self):
+        for url_parts in URLS:
+            for now in range(72010, 72041, 3) + range(73195, 73210):
+                mpdcache.MPD_CACHE_ENABLED = True
+                cached, bucket_start = self.get_mpd(url_parts, now)
+                mpdcache.MPD_CACHE_ENABLED = False
+                uncached = self.get_mpd(url_parts, bucket_start)[0]
+                self.assertEqual(RE_PUBLISH_TIME.sub("", cached), RE_PUBLISH_TIME.sub("", uncached),
+                                 "%s at %d" % (url_parts, now))
+
+    def testReusedInBucket(self):
+        url_parts = ['livesim', 'periods_10', 'testpic', 'Manifest.mpd']
+        mpd1 = self.get_mpd(url_parts, 72001)[0]
+        mpd2 = self.get_mpd(url_parts, 72003)[0]
+        mpd3 = self.get_mpd(url_parts, 72005.9)[0]
+        self.assertEqual(mpd1, mpd2)
+        self.assertEqual(mpd1, mpd3)
+        self.assertEqual(mpdcache.MPD_CACHE.stats()['hits'], 2)
+
+    def testPublishTimeChangesWithContent(self):
+        url_parts = ['livesim', 'segtimeline_1', 'testpic', 'Manifest.mpd']
+        mpd1, last_modified1 = self.get_mpd(url_parts, 72001.5)
+        mpd2, last_modified2 = self.get_mpd(url_parts, 72002)
+        mpd3, last_modified3 = self.get_mpd(url_parts, 72007.5)
+        self.assertEqual(mpd1, mpd2) # Same S entries
+        self.assertEqual(last_modified2, 72001)
+        self.assertNotEqual(mpd1, mpd3)
+        self.assertEqual(last_modified3, 72007)
+        self.assertTrue(mpd3.find('publishTime="%s"' % make_timestamp(72007)) > 0)
+
+    def testPublishTimeKeptWithoutChange(self):
+        url_parts = ['livesim', 'testpic', 'Manifest.mpd']
+        mpd1, last_modified1 = self.get_mpd(url_parts, 72001)
+        mpd2, last_modified2 = self.get_mpd(url_parts, 72100)
+        self.assertEqual(mpd1, mpd2)
+        self.assertEqual(last_modified1, last_modified2)
+        self.assertTrue(mpd2.find('publishTime="%s"' % make_timestamp(72000)) > 0)
+
+    def testDirectUtcTimingNotCached(self):
+        url_parts = ['livesim', 'utc_direct', 'testpic', 'Manifest.mpd']
+        self.get_mpd(url_parts, 72001)
+        self.get_mpd(url_parts, 72002)
+        self.assertEqual(mpdcache.MPD_CACHE.stats()['entries'], 0)
@@ -0,0 +1,85 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import mpdcache
+from ..dashlib import mpdprocessor
+from ..dashlib import mpdtemplate
+
+URLS = (['livesim', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'start_1200', 'dur_600', 'dur_300', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'continuous_1', 'periods_10', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'periods_0', 'peroff_1', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'periods_20', 'peroff_1', 'snr_-1', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'utc_head', 'scte35_2', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'segtimeline_1', 'tsbd_30', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'baseurl_u10_d20', 'baseurl_d10_u20', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'modulo_10', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'periods_60', 'xlink_30', 'testpic', 'Manifest.mpd'],
+        ['livesim', 'testpic_stpp', 'Manifest_stpp.mpd'])
+
+
+class TestMpdTemplate(unittest.TestCase):
+    "Test that compiled templates give the same MPDs as the MpdProcessor."
+
+    def setUp(self):
+        self.old_baseurl_state = mpdprocessor.SET_BASEURL
+        self.old_template_state = dash_proxy.USE_MPD_TEMPLATES
+        mpdcache.MPD_CACHE_ENABLED = False
+
+    def tearDown(self):
+        mpdprocessor.SET_BASEURL = self.old_baseurl_state
+        dash_proxy.USE_MPD_TEMPLATES = self.old_template_state
+        mpdcache.MPD_CACHE_ENABLED = True
+
+    def get_mpd(self, url_parts, now, use_templates):
+        dash_proxy.USE_MPD_TEMPLATES = use_templates
+        dp = dash_proxy.DashProvider("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now=now)
+        return dp.handle_request()
+
+    def testSameOutputAsMpdProcessor(self):
+        for set_baseurl in (True, False):
+            mpdprocessor.SET_BASEURL = set_baseurl
+            for now in (3603, 1356998460):
+                for url_parts in URLS:
+                    if not set_baseurl and url_parts[1].startswith('periods_60'):
+                        continue # xlink needs the BaseURL
+                    self.assertEqual(self.get_mpd(url_parts, now, False), self.get_mpd(url_parts, now, True),
+                                     "Different MPD for %s at %d" % ("/".join(url_parts), now))
+
+    def testTemplateIsReused(self):
+        mpdtemplate.clear_templates()
+        url_parts = ['livesim', 'testpic', 'Manifest.mpd']
+        mpd1 = self.get_mpd(url_parts, 3603, True)
+        mpd2 = self.get_mpd(url_parts, 7206, True)
+        self.assertEqual(len(mpdtemplate._templates), 1)
+        self.assertNotEqual(mpd1, mpd2) # publishTime differs
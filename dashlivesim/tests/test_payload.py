@@ -0,0 +1,160 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import segmentcache
+from ..dashlib import segmentpatcher
+from ..dashlib import sourcecache
+from ..dashlib.payload import ChunkedPayload, FileRegion
+from ..mod_wsgi import mod_dashlivesim
+from wsgiref.util import FileWrapper
+
+V1_1 = join(CONTENT_ROOT, "testpic/V1/1.m4s")
+
+
+class TestChunkedPayload(unittest.TestCase):
+
+    def testChunks(self):
+        data = open(V1_1, "rb").read()
+        payload = ChunkedPayload(["abc", "", memoryview(data)[100:90000], FileRegion(V1_1, 10, 1000)])
+        self.assertEqual(len(payload), 3 + 89900 + 1000)
+        blocks = list(payload)
+        self.assertTrue(max(len(block) for block in blocks) <= 65536)
+        self.assertEqual(payload.join(), "abc" + data[100:90000] + data[10:1010])
+        self.assertTrue(payload.file_region() is None)
+        self.assertTrue(ChunkedPayload([FileRegion(V1_1, 0, 8)]).file_region() is not None)
+
+    def testSlicing(self):
+        data = open(V1_1, "rb").read()
+        payload = ChunkedPayload(["abcdef", memoryview(data)[:1000], FileRegion(V1_1, 1000, 1000)])
+        expected = "abcdef" + data[:2000]
+        for (start, end) in ((0, 3), (2, 10), (6, 1006), (500, 1500), (1100, 1900), (0, 2006), (1990, 3000)):
+            self.assertEqual(payload[start:end].join(), expected[start:end])
+        region = payload[1100:1900].file_region()
+        self.assertEqual((region.offset, region.length), (1094, 800))
+
+    def testFileRegionReader(self):
+        reader = FileRegion(V1_1, 4, 4).open()
+        self.assertEqual(reader.read(100), "styp")
+        self.assertEqual(reader.read(100), "")
+        reader.close()
+
+
+class TestStreamingSegments(unittest.TestCase):
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE.clear()
+        segmentpatcher.PATCH_PLAN_CACHE.clear()
+
+    def tearDown(self):
+        sourcecache.SOURCE_CACHE_ENABLED = True
+        segmentpatcher.PATCH_PLAN_CACHE.clear()
+
+    def get_segment(self, url_parts, streaming):
+        return dash_proxy.handle_request("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, 72060,
+                                         streaming=streaming)
+
+    def testSameAsString(self):
+        for url_parts in (['pdash', 'testpic', 'V1', '12000.m4s'],
+                          ['pdash', 'testpic', 'V1__A1', '12000.m4s'],
+                          ['pdash', 'all_1', 'testpic_stpp', 'S1', '36000.m4s']):
+            payload = self.get_segment(url_parts, True)
+            self.assertTrue(isinstance(payload, ChunkedPayload))
+            self.assertEqual(payload.join(), self.get_segment(url_parts, False))
+
+    def testTailFromFile(self):
+        url_parts = ['pdash', 'testpic', 'V1', '12000.m4s']
+        expected = self.get_segment(url_parts, False)
+        segmentcache.SEGMENT_CACHE.clear()
+        sourcecache.SOURCE_CACHE_ENABLED = False
+        payload = self.get_segment(url_parts, True)
+        self.assertTrue(isinstance(payload.chunks[-1], FileRegion))
+        self.assertEqual(payload.join(), expected)
+
+
+class TestWsgiStreaming(unittest.TestCase):
+
+    def tearDown(self):
+        sourcecache.SOURCE_CACHE_ENABLED = True
+        segmentcache.SEGMENT_CACHE.clear()
+        segmentpatcher.PATCH_PLAN_CACHE.clear()
+
+    def request(self, path, range_line=None):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'wsgi.file_wrapper' : FileWrapper}
+        if range_line is not None:
+            env['HTTP_RANGE'] = range_line
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        body = mod_dashlivesim.application(env, start_response)
+        return response, body
+
+    def testSegmentIsStreamed(self):
+        response, body = self.request("/pdash/all_1/testpic/V1/12000.m4s")
+        self.assertEqual(response['status'], "200 OK")
+        self.assertTrue(isinstance(body, ChunkedPayload))
+        data = "".join(body)
+        self.assertEqual(int(response['headers']['Content-Length']), len(data))
+        self.assertEqual(data[4:8], "styp")
+
+    def testRangeRequest(self):
+        _, body = self.request("/pdash/all_1/testpic/V1/12000.m4s")
+        full = "".join(body)
+        for range_line in ("bytes=0-99", "bytes=1000-50999", "bytes=-200"):
+            response, body = self.request("/pdash/all_1/testpic/V1/12000.m4s", range_line)
+            self.assertEqual(response['status'], "206 Partial Content")
+            data = "".join(body)
+            start, end = [int(x) for x in response['headers']['Content-Range'].split(" ")[1].split("/")[0].split("-")]
+            self.assertEqual(data, full[start:end+1])
+            self.assertEqual(int(response['headers']['Content-Length']), len(data))
+
+    def testRangeInMdatUsesFileWrapper(self):
+        _, body = self.request("/pdash/all_1/testpic/V1/12000.m4s")
+        full = "".join(body)
+        segmentcache.SEGMENT_CACHE.clear()
+        sourcecache.SOURCE_CACHE_ENABLED = False
+        response, body = self.request("/pdash/all_1/testpic/V1/12000.m4s", "bytes=5000-9999")
+        self.assertTrue(isinstance(body, FileWrapper))
+        self.assertEqual("".join(body), full[5000:10000])
+
+    def testMultiRangeRequest(self):
+        _, body = self.request("/pdash/all_1/testpic/V1/12000.m4s")
+        full = "".join(body)
+        response, body = self.request("/pdash/all_1/testpic/V1/12000.m4s", "bytes=0-99,50000-50099")
+        self.assertEqual(response['status'], "206 Partial Content")
+        self.assertTrue(response['headers']['Content-Type'].startswith("multipart/byteranges; boundary="))
+        data = "".join(body)
+        self.assertEqual(int(response['headers']['Content-Length']), len(data))
+        self.assertTrue(data.find(full[50000:50100]) > 0)
+        self.assertTrue(len(data) < 1000)
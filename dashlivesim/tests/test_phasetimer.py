@@ -0,0 +1,125 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import unittest
+
+from dash_test_util import *
+from ..dashlib import phasetimer
+from ..dashlib import segmentcache
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def testNestedPhasesAreExclusive(self):
+        timer = phasetimer.PhaseTimer()
+        with timer.phase('outer'):
+            time.sleep(0.01)
+            with timer.phase('inner'):
+                time.sleep(0.03)
+        timer.finish()
+        self.assertEqual(timer.order, ['outer', 'inner'])
+        self.assertTrue(timer.durations['inner'] >= 0.03)
+        self.assertTrue(timer.durations['outer'] < 0.03)
+        self.assertTrue(timer.total >= timer.durations['inner'] + timer.durations['outer'])
+
+    def testServerTimingHeader(self):
+        timer = phasetimer.PhaseTimer()
+        timer.durations = {'cfg' : 0.0012, 'read' : 0.00005}
+        timer.order = ['cfg', 'read']
+        timer.total = 0.002
+        self.assertEqual(timer.server_timing(), "cfg;dur=1.200, read;dur=0.050, total;dur=2.000")
+
+    def testNoTimerIsNoOp(self):
+        phasetimer.end_request('.m4s')
+        with phasetimer.phase('read'):
+            pass
+        self.assertEqual(phasetimer.end_request('.m4s'), None)
+
+    def testHistogram(self):
+        stats = phasetimer.PhaseStats((1, 10))
+        for duration in (0.0005, 0.002, 0.02, 0.003):
+            timer = phasetimer.PhaseTimer()
+            timer.durations = {'filter' : duration}
+            stats.record('.m4s', timer)
+        histogram = stats.snapshot()['.m4s']['filter']
+        self.assertEqual(histogram['count'], 4)
+        self.assertAlmostEqual(histogram['sum_ms'], 25.5)
+        self.assertEqual(histogram['buckets'], [(1, 1), (10, 3), (None, 4)])
+
+    def testUnknownExtensions(self):
+        stats = phasetimer.PhaseStats((1, 10))
+        for ext in ('.m4s', '.x1', '.x2', ''):
+            timer = phasetimer.PhaseTimer()
+            timer.durations = {'filter' : 0.001}
+            stats.record(ext, timer)
+        snapshot = stats.snapshot()
+        self.assertEqual(sorted(snapshot), ['.m4s', phasetimer.OTHER_EXT])
+        self.assertEqual(snapshot[phasetimer.OTHER_EXT]['filter']['count'], 3)
+
+
+class TestServerTiming(unittest.TestCase):
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE.clear()
+        phasetimer.PHASE_STATS.clear()
+
+    def request(self, path, now):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : path, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'dashlivesim.now' : now}
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], response['headers']
+
+    def testMediaSegmentPhases(self):
+        status, headers = self.request("/livesim/testpic/V1/12000.m4s", 72010)
+        self.assertEqual(status, "200 OK")
+        phases = [entry.split(";")[0] for entry in headers['Server-Timing'].split(", ")]
+        self.assertEqual(phases[0], 'cfg')
+        for name in ('vodcfg', 'filter', 'read', 'total'):
+            self.assertTrue(name in phases, name)
+        self.assertEqual(headers['Timing-Allow-Origin'], '*')
+        stats = phasetimer.PHASE_STATS.snapshot()
+        self.assertEqual(stats['.m4s']['total']['count'], 1)
+
+    def testMpdPhases(self):
+        _, headers = self.request("/livesim/testpic/Manifest.mpd", 72010)
+        self.assertTrue('mpd;dur=' in headers['Server-Timing'])
+
+    def testDisabled(self):
+        phasetimer.PHASE_TIMING_ENABLED = False
+        try:
+            _, headers = self.request("/livesim/testpic/Manifest.mpd", 72010)
+        finally:
+            phasetimer.PHASE_TIMING_ENABLED = True
+        self.assertTrue('Server-Timing' not in headers)
@@ -0,0 +1,124 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import httplib
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from os.path import dirname
+
+from dash_test_util import *
+from ..dashlib import preload
+from ..mod_wsgi import prefork
+
+PACKAGE_ROOT = dirname(dirname(dirname(os.path.abspath(__file__))))
+
+
+class TestPreload(unittest.TestCase):
+
+    def testPreloadCounts(self):
+        counts = preload.preload(VOD_CONFIG_DIR, CONTENT_ROOT)
+        self.assertTrue(counts['configs'] > 0)
+        self.assertTrue(counts['mpds'] > 0)
+        self.assertTrue(counts['init_segments'] > 0)
+
+
+class TestListeningSocket(unittest.TestCase):
+
+    def testSharedSocket(self):
+        sock = prefork.make_listening_socket("127.0.0.1", 0)
+        try:
+            self.assertTrue(sock.getsockname()[1] > 0)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+        finally:
+            sock.close()
+
+
+class TestPreforkServer(unittest.TestCase):
+    "Run the stand-alone server with pre-forked workers as a separate process."
+
+    def setUp(self):
+        cmd = [sys.executable, "-u", "-m", "dashlivesim.mod_wsgi.mod_dashlivesim", "-d", VOD_CONFIG_DIR,
+               "-c", CONTENT_ROOT, "--host", "127.0.0.1", "--port", "0", "--workers", "2", "--threads", "2"]
+        self.proc = subprocess.Popen(cmd, cwd=PACKAGE_ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.port = None
+        self.worker_pids = {}
+        while len(self.worker_pids) < 2:
+            self.read_line()
+
+    def tearDown(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+
+    def read_line(self):
+        "Read one line of server output and record the port and worker pids."
+        line = self.proc.stdout.readline()
+        self.assertTrue(line, "Server exited unexpectedly")
+        mobj = re.search(r'Waiting for requests at ".*:(\d+)"', line)
+        if mobj:
+            self.port = int(mobj.group(1))
+        mobj = re.search(r"Started worker (\d+) \(pid (\d+)\)", line)
+        if mobj:
+            self.worker_pids[int(mobj.group(1))] = int(mobj.group(2))
+        return line
+
+    def get(self, path):
+        conn = httplib.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+        return resp.status, body
+
+    def testServeRestartAndStop(self):
+        for _ in range(4):
+            status, body = self.get("/livesim/testpic/Manifest.mpd")
+            self.assertEqual(status, 200)
+            self.assertTrue(body.find("<MPD") >= 0)
+        os.kill(self.worker_pids[0], signal.SIGKILL)
+        old_pid = self.worker_pids[0]
+        while self.worker_pids[0] == old_pid:
+            self.read_line()
+        for _ in range(4):
+            status, _ = self.get("/livesim/all_1/testpic/A1/12000.m4s")
+            self.assertEqual(status, 200)
+        self.proc.send_signal(signal.SIGTERM)
+        deadline = time.time() + 15
+        while self.proc.poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(self.proc.returncode, 0)
+        for pid in self.worker_pids.values():
+            self.assertRaises(OSError, os.kill, pid, 0)
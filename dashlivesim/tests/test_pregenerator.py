@@ -0,0 +1,131 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import time
+
+from dash_test_util import *
+from ..dashlib import accesslog
+from ..dashlib import dash_proxy
+from ..dashlib import pregenerator
+from ..dashlib import segmentcache
+
+
+class TestPregenerationScheduler(unittest.TestCase):
+    "Test the scheduling with a generate function that only records the calls."
+
+    def setUp(self):
+        self.calls = []
+        self.scheduler = pregenerator.PregenerationScheduler(self.generate)
+
+    def generate(self, host_name, url_parts, url_args, vod_conf_dir, content_dir, now, is_https, streaming):
+        self.calls.append((url_parts, now))
+        if url_parts[-1] == "12005.m4s":
+            raise IOError("Disk error")
+        return url_parts[-1] != "12003.m4s"
+
+    def register(self, seg_nr, now, key='key'):
+        request = ("streamtest.eu", None, VOD_CONFIG_DIR, CONTENT_ROOT, 0, False)
+        self.scheduler.register(key, request, ['pdash', 'testpic', 'V1'], "%d.m4s", seg_nr, 1, seg_nr,
+                                72006 + (seg_nr - 12000)*6, 6, now)
+
+    def testNextSegmentGeneratedBeforeAvailability(self):
+        self.register(12000, 72007)
+        wall_now = time.time()
+        self.assertAlmostEqual(self.scheduler.run_due_jobs(wall_now), wall_now + 4, delta=0.1)
+        self.assertEqual(self.calls, [])
+        self.scheduler.run_due_jobs(wall_now + 4.1)
+        self.assertEqual(self.calls, [(['pdash', 'testpic', 'V1', '12001.m4s'], 72012)])
+
+    def testOnlyOneSegmentAhead(self):
+        self.register(12000, 72007)
+        wall_now = time.time()
+        self.scheduler.run_due_jobs(wall_now + 10)
+        self.scheduler.run_due_jobs(wall_now + 10)
+        self.assertEqual(len(self.calls), 1)
+        self.register(12001, 72013)
+        self.scheduler.run_due_jobs(wall_now + 10)
+        self.assertEqual(self.calls[-1], (['pdash', 'testpic', 'V1', '12002.m4s'], 72018))
+        self.assertEqual(len(self.calls), 2)
+
+    def testFailedJobIsRemoved(self):
+        self.register(12002, 72019)
+        self.scheduler.run_due_jobs(time.time() + 10)
+        self.assertEqual(self.calls[-1][0][-1], "12003.m4s")
+        self.assertEqual(self.scheduler.jobs, {})
+
+    def testExceptionIsCountedAndLogged(self):
+        self.register(12004, 72031)
+        self.scheduler.run_due_jobs(time.time() + 10)
+        self.assertEqual(self.scheduler.nr_failed, 1)
+        self.assertEqual(self.scheduler.jobs, {})
+        record = accesslog.ACCESS_LOG.last(1)[0]
+        self.assertEqual(record['url'], "pdash/testpic/V1/12005.m4s")
+        self.assertEqual(record['message'], "Pregeneration failed: IOError: Disk error")
+
+    def testIdleJobIsRemoved(self):
+        self.register(12000, 72007)
+        self.scheduler.run_due_jobs(time.time() + pregenerator.JOB_IDLE_TIMEOUT_IN_S + 1)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.scheduler.jobs, {})
+
+
+class TestPregenerationInProxy(unittest.TestCase):
+    "Test that pregenerated segments end up in the segment cache without changing the availability."
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE.clear()
+        self.lead = pregenerator.PREGENERATION_LEAD_IN_S
+        pregenerator.PREGENERATION_LEAD_IN_S = 3
+        pregenerator.start(dash_proxy.pregenerate_segment)
+
+    def tearDown(self):
+        pregenerator.SCHEDULER.stop()
+        pregenerator.PREGENERATION_LEAD_IN_S = self.lead
+        segmentcache.SEGMENT_CACHE_ENABLED = True
+        segmentcache.SEGMENT_CACHE.clear()
+
+    def get_segment(self, seg_nr, now):
+        url_parts = ['pdash', 'testpic', 'V1', '%d.m4s' % seg_nr]
+        return dash_proxy.handle_request("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now)
+
+    def testSegmentIsPregenerated(self):
+        self.get_segment(12000, 72009.5) # Segment 12001 becomes available at 72012
+        deadline = time.time() + 10
+        while pregenerator.SCHEDULER.nr_generated == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pregenerator.SCHEDULER.nr_generated, 1)
+        self.assertEqual(segmentcache.SEGMENT_CACHE.stats()['entries'], 2)
+        too_early = self.get_segment(12001, 72011.9)
+        self.assertTrue(isinstance(too_early, dict) and not too_early['ok'])
+        hits = segmentcache.SEGMENT_CACHE.stats()['hits']
+        pregenerated = self.get_segment(12001, 72012.1)
+        self.assertEqual(segmentcache.SEGMENT_CACHE.stats()['hits'], hits + 1)
+        segmentcache.SEGMENT_CACHE_ENABLED = False
+        self.assertEqual(self.get_segment(12001, 72012.1), pregenerated)
@@ -0,0 +1,129 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import profiler
+from ..mod_wsgi import mod_dashlivesim
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.sampler = profiler.SAMPLER
+        self.sampler.clear()
+        self.profile_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.sampler.configure()
+        self.sampler.clear()
+        shutil.rmtree(self.profile_dir)
+
+    def get(self, url_parts, now=72010):
+        return dash_proxy.handle_request("streamtest.eu", ["livesim"] + url_parts, None, VOD_CONFIG_DIR,
+                                         CONTENT_ROOT, now)
+
+    def testDisabledByDefault(self):
+        self.assertFalse(self.sampler.enabled)
+        self.get(["testpic", "Manifest.mpd"])
+        self.assertEqual(self.sampler.nr_requests, 0)
+
+    def testEveryNthRequest(self):
+        self.sampler.configure(every_n=2)
+        for _ in range(4):
+            self.get(["testpic", "Manifest.mpd"])
+        self.get(["testpic", "V1", "12000.m4s"])
+        self.assertEqual(self.sampler.nr_samples(".mpd"), 2)
+        self.assertEqual(self.sampler.nr_samples(".m4s"), 0)
+        top = self.sampler.top(".mpd", 10, 'tottime')
+        self.assertTrue(top.startswith("2 profiled requests for '.mpd'"))
+        self.assertTrue("function calls" in top)
+
+    def testSlowRequestProfilesNext(self):
+        self.sampler.configure(slower_than_in_ms=0)
+        self.get(["testpic", "V1", "12000.m4s"])
+        self.assertEqual(self.sampler.nr_samples(".m4s"), 0)
+        self.get(["testpic", "V1", "12000.m4s"])
+        self.assertEqual(self.sampler.nr_samples(".m4s"), 1)
+        self.assertTrue("parse_url" in self.sampler.top(".m4s"))
+
+    def testStatsFile(self):
+        directory = os.path.join(self.profile_dir, "profiles")
+        self.sampler.configure(every_n=1, directory=directory)
+        self.get(["testpic", "V1", "init.mp4"])
+        stats = pstats.Stats(os.path.join(directory, "profile_mp4.pstats"))
+        self.assertTrue(any(func[2] == 'parse_url' for func in stats.stats))
+
+    def testEveryNthRequestInThreads(self):
+        self.sampler.configure(every_n=10)
+
+        def run_requests():
+            for _ in range(50):
+                self.sampler.run(".mpd", lambda: None)
+
+        threads = [threading.Thread(target=run_requests) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.sampler.nr_requests, 200)
+        self.assertEqual(self.sampler.nr_samples(".mpd"), 20)
+
+    def testUnknownExtensionsShareWindow(self):
+        self.sampler.configure(every_n=1)
+        self.get(["testpic", "V1", "12000.abc"])
+        self.get(["testpic", "V1", "12000.def"])
+        self.assertEqual(self.sampler.nr_samples(".abc"), 2)
+        self.assertEqual(sorted(self.sampler._windows), ['other']) #pylint: disable=protected-access
+
+    def testNoSamplesView(self):
+        self.assertEqual(self.sampler.top(".m4s"), "No profiled requests for '.m4s'\n")
+
+
+class TestProfileEndpoint(unittest.TestCase):
+
+    def request(self, query):
+        env = {'HTTP_HOST' : 'streamtest.eu', 'REQUEST_URI' : profiler.PROFILE_PATH, 'VOD_CONF_DIR' : VOD_CONFIG_DIR,
+               'CONTENT_ROOT' : CONTENT_ROOT, 'EXPOSE_METRICS' : True, 'QUERY_STRING' : query}
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+        body = "".join(mod_dashlivesim.application(env, start_response))
+        return response['status'], body
+
+    def testBadCount(self):
+        self.assertEqual(self.request("n=abc")[0], "400 Bad Request")
+        self.assertEqual(self.request("n=100000000")[0], "200 OK")
@@ -0,0 +1,82 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import segmentcache
+
+
+class TestSegmentCache(unittest.TestCase):
+    "Test caching of generated media segments in DashProvider."
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE.clear()
+
+    def tearDown(self):
+        segmentcache.SEGMENT_CACHE_ENABLED = True
+        segmentcache.SEGMENT_CACHE.clear()
+
+    def get_segment(self, url_parts, now):
+        dp = dash_proxy.DashProvider("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now=now)
+        return dp.handle_request(), dp.new_tfdt_value
+
+    def testRepeatedRequestIsCached(self):
+        url_parts = ['pdash', 'testpic', 'V1', '12000.m4s']
+        first = self.get_segment(url_parts, 72060)
+        second = self.get_segment(url_parts, 72061)
+        self.assertEqual(first, second)
+        stats = segmentcache.SEGMENT_CACHE.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def testSameAsUncached(self):
+        for url_parts in (['pdash', 'testpic', 'A1', '12000.m4s'],
+                          ['pdash', 'scte35_3', 'testpic', 'V1', '12000.m4s'],
+                          ['pdash', 'testpic', 'V1__A1', '12000.m4s']):
+            cached = self.get_segment(url_parts, 72060)
+            self.assertEqual(self.get_segment(url_parts, 72060), cached)
+            segmentcache.SEGMENT_CACHE_ENABLED = False
+            self.assertEqual(self.get_segment(url_parts, 72060), cached)
+            segmentcache.SEGMENT_CACHE_ENABLED = True
+
+    def testOptionsGiveDifferentEntries(self):
+        self.get_segment(['pdash', 'testpic', 'V1', '12000.m4s'], 72060)
+        self.get_segment(['pdash', 'scte35_3', 'testpic', 'V1', '12000.m4s'], 72060)
+        stats = segmentcache.SEGMENT_CACHE.stats()
+        self.assertEqual(stats['hits'], 0)
+        self.assertEqual(stats['entries'], 2)
+
+    def testExpiryAfterTimeShiftBuffer(self):
+        url_parts = ['pdash', 'testpic', 'V1', '12000.m4s']
+        self.get_segment(url_parts, 72060)
+        key = segmentcache.SEGMENT_CACHE.lru._entries.keys()[0]
+        self.assertTrue(segmentcache.SEGMENT_CACHE.get(key, 72006 + 6 + 300) is not None)
+        self.assertTrue(segmentcache.SEGMENT_CACHE.get(key, 72006 + 6 + 301) is None)
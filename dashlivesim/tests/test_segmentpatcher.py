@@ -0,0 +1,113 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import unittest
+
+from dash_test_util import *
+from ..dashlib import dash_proxy
+from ..dashlib import segmentpatcher
+from ..dashlib import segmentcache
+from ..dashlib.mediasegmentfilter import MediaSegmentFilter
+
+SEGMENTS = [(join(CONTENT_ROOT, "testpic/V1/1.m4s"), 90000),
+            (join(CONTENT_ROOT, "testpic/V1/350.m4s"), 90000),
+            (join(CONTENT_ROOT, "testpic/A1/1.m4s"), 48000),
+            (join(CONTENT_ROOT, "testpic/en/A1/350.m4s"), 48000)]
+
+
+class TestSegmentPatchPlan(unittest.TestCase):
+    "Check that patch plans give the same output as the MediaSegmentFilter."
+
+    def setUp(self):
+        segmentpatcher.PATCH_PLAN_CACHE.clear()
+
+    def compare(self, path, timescale, seg_nr, offset, lmsg, scte35_per_minute=0):
+        seg_filter = MediaSegmentFilter(path, seg_nr, 6, offset, lmsg, timescale, scte35_per_minute)
+        expected = seg_filter.filter()
+        result = segmentpatcher.patch_media_segment(path, seg_nr, 6, offset, lmsg, timescale, scte35_per_minute)
+        self.assertTrue(result is not None)
+        self.assertEqual(result[0], expected)
+        self.assertEqual(result[1], seg_filter.get_tfdt_value())
+
+    def testSmallOffset(self):
+        for (path, timescale) in SEGMENTS:
+            for lmsg in (False, True):
+                self.compare(path, timescale, 600, 3600, lmsg)
+
+    def testOffsetGivingLargeTfdt(self):
+        for (path, timescale) in SEGMENTS:
+            for lmsg in (False, True):
+                self.compare(path, timescale, 1800000, 10800000, lmsg)
+
+    def testScte35(self):
+        path = join(CONTENT_ROOT, "testpic/V1/1.m4s")
+        for seg_nr in (1800000, 1800001, 1800002):
+            self.compare(path, 90000, seg_nr, 10800000, False, 3)
+
+    def testPlanIsReused(self):
+        path = SEGMENTS[0][0]
+        plan = segmentpatcher.PATCH_PLAN_CACHE.get_plan(path)[0]
+        self.assertTrue(plan is segmentpatcher.PATCH_PLAN_CACHE.get_plan(path)[0])
+
+    def testPlanForSegmentLargerThanCacheIsReused(self):
+        path = SEGMENTS[0][0]
+        plan_cache = segmentpatcher.SegmentPatchPlanCache(os.path.getsize(path) - 1)
+        plan = plan_cache.get_plan(path)[0]
+        self.assertTrue(plan is not None)
+        self.assertTrue(plan is plan_cache.get_plan(path)[0])
+
+    def testUnsupportedLayout(self):
+        data = open(SEGMENTS[0][0], "rb").read()
+        self.assertRaises(segmentpatcher.SegmentPatchPlanError, segmentpatcher.SegmentPatchPlan, data + data)
+
+
+class TestSegmentPatchPlansInProxy(unittest.TestCase):
+    "Check that DashProvider output does not depend on the use of patch plans."
+
+    def setUp(self):
+        segmentcache.SEGMENT_CACHE_ENABLED = False
+
+    def tearDown(self):
+        dash_proxy.USE_SEGMENT_PATCH_PLANS = True
+        segmentcache.SEGMENT_CACHE_ENABLED = True
+
+    def get_segment(self, url_parts, now, use_plans):
+        dash_proxy.USE_SEGMENT_PATCH_PLANS = use_plans
+        dp = dash_proxy.DashProvider("streamtest.eu", url_parts, None, VOD_CONFIG_DIR, CONTENT_ROOT, now=now)
+        return dp.handle_request()
+
+    def testSameOutput(self):
+        now = 72000 + 60
+        for url_parts in (['pdash', 'testpic', 'V1', '12000.m4s'],
+                          ['pdash', 'testpic', 'A1', '12000.m4s'],
+                          ['pdash', 'scte35_3', 'testpic', 'V1', '12000.m4s'],
+                          ['pdash', 'testpic', 'V1__A1', '12000.m4s']):
+            expected = self.get_segment(url_parts, now, False)
+            self.assertEqual(self.get_segment(url_parts, now, True), expected)
@@ -34,6 +34,8 @@ from xml.etree import ElementTree
 from dash_test_util import *
 from ..dashlib import dash_proxy
 from ..dashlib import mpdprocessor
+from ..dashlib import segmenttimeline
+from ..dashlib.mpdtemplate import render_s_elements
 
 NAMESPACE = 'urn:mpeg:dash:schema:mpd:2011'
 
@@ -160,3 +162,71 @@ class TestMediaSegments(unittest.TestCase):
         nr_seg = dp.handle_request()
         self.assertEqual(len(time_seg), len(nr_seg))
         self.assertEqual(time_seg, nr_seg)
+
+
+class TestSegmentTimelineIndex(unittest.TestCase):
+    "Test the shared index of segment durations."
+
+    def setUp(self):
+        self.dat_file = join(VOD_CONFIG_DIR, 'testpic_audio.dat')
+        self.timescale = 48000
+        self.index = segmenttimeline.get_timeline_index(self.dat_file)
+
+    def testIndexIsShared(self):
+        self.assertTrue(segmenttimeline.get_timeline_index(self.dat_file) is self.index)
+
+    def testIndexContent(self):
+        self.assertEqual(len(self.index), 300)
+        self.assertEqual(self.index.nr_segments, 600)
+        self.assertEqual(self.index.entry(1), (2, 2, 288768, 288768))
+        self.assertEqual(self.index.end_times[-1], 3600*self.timescale)
+
+    def testSegmentsInWindow(self):
+        "A 30s window over the wrap-around at 2h should be covered by 6 segments in order."
+        start = (7200 - 13)*self.timescale
+        end = (7200 + 17)*self.timescale
+        runs = self.index.segments_in_window(start, end, self.timescale)
+        self.assertLessEqual(runs[0][0], start)
+        self.assertGreater(runs[0][0] + runs[0][1], start)
+        run_end = runs[0][0]
+        nr_segments = 0
+        for (run_start, duration, count) in runs:
+            self.assertGreaterEqual(run_start, run_end)
+            run_end = run_start + duration*count
+            nr_segments += count
+        self.assertGreaterEqual(run_end, end)
+        self.assertLess(run_end - runs[-1][1], end)
+        self.assertEqual(nr_segments, 6)
+
+    def testRepeatsByArithmetic(self):
+        "The second run starts at 288768 and has three segments of 288768."
+        wrap_duration = 3600*self.timescale
+        self.assertEqual(self.index.find_latest_starting_before(288768 + 2*288768 + 1, wrap_duration), (1, 2, 0))
+        self.assertEqual(self.index.find_latest_starting_before(288768 + 2*288768, wrap_duration), (1, 1, 0))
+        self.assertEqual(self.index.find_latest_starting_before(wrap_duration + 288768, wrap_duration), (1, 0, 1))
+        self.assertEqual(self.index.find_repeats_ending_before(288768 + 2*288768, 1, 0, wrap_duration), 1)
+        self.assertEqual(self.index.find_repeats_ending_before(wrap_duration, 1, 0, wrap_duration), 2)
+
+    def testGapBetweenRunsIsSkipped(self):
+        "now-tsbd = 6s is in the gap after the first run, so the timeline should start with the second run."
+        entries = self.index.timeline_entries(36, 30, self.timescale)
+        self.assertEqual(entries, [(288768, 288768, 2), (None, 287744, 0)])
+
+    def testLastSegmentBeforeWrap(self):
+        "Just after the wrap-around, the last segment should be the last one of the previous hour."
+        dat_file = join(VOD_CONFIG_DIR, 'testpic_video.dat')
+        index = segmenttimeline.get_timeline_index(dat_file)
+        entries = index.timeline_entries(3606, 30, 90000)
+        self.assertEqual(entries, [(3570*90000, 540000, 4)])
+
+    def testRenderedTimelineIsSameAsEntries(self):
+        for tsbd in (6, 30, 3600, 4*3600 + 17):
+            for now in (tsbd + 1, 7206, 7213, 6*3600 + 3):
+                text = self.index.render_timeline(now, tsbd, self.timescale)
+                self.assertEqual(text, render_s_elements(self.index.timeline_entries(now, tsbd, self.timescale)))
+
+    def testMultiHourTimeline(self):
+        "A 4h timeShiftBufferDepth ending just after a wrap-around covers exactly 4 loops of the 300 runs."
+        entries = self.index.timeline_entries(5*3600 + 3, 4*3600, self.timescale)
+        self.assertEqual(len(entries), 4*300)
+        self.assertEqual(sum(entry[2] + 1 for entry in entries), 4*600)
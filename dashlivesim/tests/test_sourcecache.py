@@ -0,0 +1,91 @@
+# The copyright in this software is being made available under the BSD License,
+# included below. This software may be subject to other third party and contributor
+# rights, including patent rights, and no such rights are granted under this license.
+#
+# Copyright (c) 2015, Dash Industry Forum.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#  * Redistributions of source code must retain the above copyright notice, this
+#  list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation and/or
+#  other materials provided with the distribution.
+#  * Neither the name of Dash Industry Forum nor the names of its
+#  contributors may be used to endorse or promote products derived from this software
+#  without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY
+#  EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+#  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+#  IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+#  INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+#  NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#  WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from dash_test_util import *
+from ..dashlib import lrucache
+from ..dashlib import sourcecache
+
+V1_1 = join(CONTENT_ROOT, "testpic/V1/1.m4s")
+A1_1 = join(CONTENT_ROOT, "testpic/A1/1.m4s")
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def testEvictionOfLeastRecentlyUsed(self):
+        cache = lrucache.LRUCache(10)
+        cache.put('a', 'aaaa', 4)
+        cache.put('b', 'bbbb', 4)
+        self.assertEqual(cache.get('a'), 'aaaa') # b is now least recently used
+        cache.put('c', 'cccc', 4)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 'cccc')
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['bytes'], stats['entries']), (1, 8, 2))
+
+    def testTooLargeValueIsNotStored(self):
+        cache = lrucache.LRUCache(10)
+        cache.put('a', 'a'*11, 11)
+        self.assertEqual(len(cache), 0)
+
+    def testExpiry(self):
+        cache = lrucache.LRUCache(10)
+        cache.put('a', 'aaaa', 4, expires=100)
+        self.assertEqual(cache.get('a', now=99), 'aaaa')
+        self.assertEqual(cache.get('a', now=101), None)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+class TestSourceFileCache(unittest.TestCase):
+
+    def testSecondReadIsAHit(self):
+        cache = sourcecache.SourceFileCache(max_bytes=1000000)
+        data = cache.read(V1_1)
+        self.assertEqual(data, open(V1_1, "rb").read())
+        self.assertTrue(cache.read(V1_1) is data)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+    def testByteBudget(self):
+        size_v = len(open(V1_1, "rb").read())
+        cache = sourcecache.SourceFileCache(max_bytes=size_v + 10)
+        cache.read(V1_1)
+        cache.read(A1_1)
+        self.assertFalse(cache.is_cached(V1_1))
+        self.assertLessEqual(cache.stats()['bytes'], size_v + 10)
+
+    def testChangedFileIsReread(self):
+        cache = sourcecache.SourceFileCache(max_bytes=1000, revalidate_interval=0)
+        write_data_to_outfile("first version", "source_cache_test.dat")
+        path = join(OUT_DIR, "source_cache_test.dat")
+        self.assertEqual(cache.read(path), "first version")
+        write_data_to_outfile("second, longer version", "source_cache_test.dat")
+        self.assertEqual(cache.read(path), "second, longer version")
+        self.assertEqual(cache.stats()['invalidations'], 1)
+        rm_outfile("source_cache_test.dat")